@@ -0,0 +1,133 @@
+"""
+Admission control for searches that need upstream work.
+
+Each worker runs at most MAX_IN_FLIGHT such searches at once. Up to
+ADMISSION_QUEUE more wait in arrival order, each for at most ADMISSION_WAIT
+seconds (or until its request deadline, if sooner). Anything beyond that is
+refused at once with Overloaded, which /search, /search/stream and
+/search/batch turn into a 503 with Retry-After: a fast refusal the client
+can retry beats a reply that arrives after it has given up, and keeps
+latency flat for the requests let in.
+
+Cache hits and searches joining one already in flight cost no upstream
+work and are not counted.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict
+
+from metrics import ADMISSIONS
+from upstream import time_left
+
+MAX_IN_FLIGHT = int(os.getenv("UPSUM_MAX_IN_FLIGHT", "16"))
+ADMISSION_QUEUE = int(os.getenv("UPSUM_ADMISSION_QUEUE", "16"))
+ADMISSION_WAIT = float(os.getenv("UPSUM_ADMISSION_WAIT", "0.5"))
+RETRY_AFTER = int(os.getenv("UPSUM_RETRY_AFTER", "1"))
+
+class Overloaded(Exception):
+    """Raised when a search is refused; retry_after is in seconds."""
+
+    def __init__(self, message: str, retry_after: int = RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class Admission:
+    """Bounded in-flight searches plus a short FIFO queue, for one worker."""
+
+    def __init__(self, max_in_flight: int = MAX_IN_FLIGHT, queue_size: int = ADMISSION_QUEUE,
+                 max_wait: float = ADMISSION_WAIT):
+        """
+        Args:
+            max_in_flight: Searches running at once (0 = no limit)
+            queue_size: Searches allowed to wait for a turn
+            max_wait: Longest wait in the queue (seconds)
+        """
+        self.max_in_flight = max_in_flight
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.in_flight = 0
+        self.admitted = 0
+        self.shed = 0
+        self.expired = 0
+        self.waited = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """
+        Hold a search turn for the duration of the block.
+
+        Raises:
+            Overloaded: queue full, or no turn within max_wait / the request deadline
+        """
+        if self.max_in_flight > 0 and (self._waiters or self.in_flight >= self.max_in_flight):
+            await self._wait()
+        else:
+            self.in_flight += 1
+            ADMISSIONS.inc('admitted')
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self._wake_next()
+
+    async def _wait(self) -> None:
+        """Queue for a turn; on return the turn is already counted in in_flight."""
+        if len(self._waiters) >= self.queue_size:
+            self.shed += 1
+            ADMISSIONS.inc('shed')
+            raise Overloaded("Too many searches in progress")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        timeout = self.max_wait
+        remaining = time_left()
+        if remaining is not None:
+            timeout = min(timeout, remaining)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self._give_up(future)
+            self.expired += 1
+            ADMISSIONS.inc('expired')
+            raise Overloaded("No search turn within the admission wait") from None
+        except asyncio.CancelledError:
+            self._give_up(future)
+            raise
+        self.waited += time.monotonic() - start
+        ADMISSIONS.inc('queued')
+
+    def _give_up(self, future: asyncio.Future) -> None:
+        """Leave the queue; a turn handed over just as the wait ended is passed on."""
+        if future.done() and not future.cancelled():
+            self.in_flight -= 1
+            self._wake_next()
+        elif future in self._waiters:
+            self._waiters.remove(future)
+
+    def _wake_next(self) -> None:
+        """Hand a free turn to the oldest waiter still waiting."""
+        while self._waiters and self.in_flight < self.max_in_flight:
+            future = self._waiters.popleft()
+            if not future.done():
+                # Counted now so a newcomer can't take the turn before the waiter resumes
+                self.in_flight += 1
+                future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for /health."""
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "admitted": self.admitted,
+            "shed": self.shed,
+            "expired": self.expired,
+            "mean_wait_ms": round(self.waited / self.admitted * 1000, 2) if self.admitted else 0.0
+        }
@@ -0,0 +1,202 @@
+"""
+Article summaries (intro extract + thumbnail) for many titles at once.
+
+Up to ARTICLE_BATCH titles are looked up with one MediaWiki
+prop=extracts|pageimages|info query. TextExtracts returns at most 20 intro
+extracts per call, so larger sets are split into chunks of EXTRACT_BATCH
+that go out concurrently: still one round trip.
+
+Summaries are cached per title. A fresh entry (ARTICLE_TTL) is served as
+is. A stale entry is also served, while one background prop=info call for
+all stale titles compares their current revision ids; only pages that
+changed are fetched again, the rest are just marked fresh. Revalidation
+runs at the governor's BACKGROUND priority.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+import httpx
+
+from cache import ResultCache
+from governor import background
+from upstream import UpstreamUnavailable
+
+ARTICLE_BATCH = 50
+EXTRACT_BATCH = 20
+THUMBNAIL_SIZE = 320
+EXTRACT_MAX_CHARS = 1000
+
+ARTICLE_CACHE_SIZE = int(os.getenv("UPSUM_ARTICLE_CACHE_SIZE", "8192"))
+ARTICLE_TTL = float(os.getenv("UPSUM_ARTICLE_TTL", "3600"))
+ARTICLE_STALE_TTL = float(os.getenv("UPSUM_ARTICLE_STALE_TTL", str(7 * 86400)))
+
+Summary = Dict[str, Any]
+Fetch = Callable[[Dict[str, Any]], Awaitable[httpx.Response]]
+
+def summary_params(titles: List[str]) -> Dict[str, Any]:
+    """MediaWiki parameters for extracts, thumbnails and revision ids."""
+    return {
+        'action': 'query',
+        'format': 'json',
+        'formatversion': 2,
+        'prop': 'extracts|pageimages|info',
+        'inprop': 'url',
+        'exintro': 1,
+        'explaintext': 1,
+        'exlimit': len(titles),
+        'piprop': 'thumbnail',
+        'pithumbsize': THUMBNAIL_SIZE,
+        'pilimit': len(titles),
+        'redirects': 1,
+        'titles': '|'.join(titles)
+    }
+
+def revision_params(titles: List[str]) -> Dict[str, Any]:
+    """MediaWiki parameters for current revision ids only."""
+    return {
+        'action': 'query',
+        'format': 'json',
+        'formatversion': 2,
+        'prop': 'info',
+        'redirects': 1,
+        'titles': '|'.join(titles)
+    }
+
+def truncate(text: str, max_chars: int = EXTRACT_MAX_CHARS) -> str:
+    """Cut text at a word boundary."""
+    text = ' '.join(text.split())
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars].rsplit(' ', 1)[0] + '…'
+
+def resolve_pages(data: Dict[str, Any], requested: List[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+    """Map each requested title to its page, following normalization and redirects."""
+    query = data.get('query', {})
+    renamed = {item['from']: item['to'] for item in query.get('normalized', [])}
+    renamed.update((item['from'], item['to']) for item in query.get('redirects', []))
+    pages = {page.get('title'): page for page in query.get('pages', [])}
+    resolved = {}
+    for title in requested:
+        current = title
+        for _ in range(3):  # normalized -> redirect target
+            if current in pages or current not in renamed:
+                break
+            current = renamed[current]
+        resolved[title] = pages.get(current)
+    return resolved
+
+def make_summary(requested: str, page: Optional[Dict[str, Any]]) -> Summary:
+    """Summary dict for a page (or a missing marker)."""
+    if page is None or page.get('missing') or page.get('invalid'):
+        return {"title": requested, "missing": True, "revid": 0}
+    thumbnail = page.get('thumbnail')
+    return {
+        "title": page['title'],
+        "extract": truncate(page.get('extract', '')),
+        "thumbnail": {
+            "url": thumbnail['source'],
+            "width": thumbnail.get('width'),
+            "height": thumbnail.get('height')
+        } if thumbnail else None,
+        "url": page.get('fullurl', ''),
+        "revid": page.get('lastrevid', 0)
+    }
+
+class ArticleSummaries:
+    """Per-title summary cache in front of batched MediaWiki queries."""
+
+    def __init__(self, fetch: Fetch, cache: Optional[ResultCache] = None):
+        """
+        Args:
+            fetch: Coroutine function sending MediaWiki query parameters upstream
+            cache: Summary cache (default: in-process, ARTICLE_* settings)
+        """
+        self.fetch = fetch
+        self.cache = cache or ResultCache(ARTICLE_CACHE_SIZE, ARTICLE_TTL, ARTICLE_STALE_TTL)
+        self.revalidated = 0
+        self.changed = 0
+        self._revalidating: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def _query(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        try:
+            response = await self.fetch(params)
+        except (httpx.HTTPError, UpstreamUnavailable) as e:
+            print(f"Wikipedia API error: {e}")
+            return {}
+        if response.status_code != 200:
+            return {}
+        return response.json()
+
+    async def _fetch_summaries(self, titles: List[str]) -> Dict[str, Summary]:
+        """Fetch and cache summaries, EXTRACT_BATCH titles per concurrent call."""
+        chunks = [titles[i:i + EXTRACT_BATCH] for i in range(0, len(titles), EXTRACT_BATCH)]
+        payloads = await asyncio.gather(*(self._query(summary_params(chunk)) for chunk in chunks))
+        summaries: Dict[str, Summary] = {}
+        for chunk, data in zip(chunks, payloads):
+            if not data:
+                continue  # Upstream failed: leave these uncached
+            for title, page in resolve_pages(data, chunk).items():
+                summaries[title] = make_summary(title, page)
+                self.cache.set(title, [summaries[title]])
+        return summaries
+
+    async def _revalidate(self, stale: Dict[str, Summary]) -> None:
+        """Compare revision ids of stale entries; refetch only pages that changed."""
+        titles = list(stale)
+        try:
+            data = await self._query(revision_params(titles))
+            if not data:
+                return
+            changed = []
+            for title, page in resolve_pages(data, titles).items():
+                revid = 0 if page is None or page.get('missing') else page.get('lastrevid', 0)
+                if revid == stale[title].get('revid'):
+                    self.cache.set(title, [stale[title]])
+                else:
+                    changed.append(title)
+            self.revalidated += len(titles)
+            self.changed += len(changed)
+            if changed:
+                await self._fetch_summaries(changed)
+        finally:
+            self._revalidating.difference_update(titles)
+
+    async def summaries(self, titles: List[str]) -> Dict[str, Summary]:
+        """
+        Summaries for up to ARTICLE_BATCH titles.
+
+        Args:
+            titles: Article titles as shown in search results
+
+        Returns:
+            Summary per title; titles whose lookup failed upstream are absent
+        """
+        found: Dict[str, Summary] = {}
+        missing: List[str] = []
+        stale: Dict[str, Summary] = {}
+        for title in dict.fromkeys(titles[:ARTICLE_BATCH]):
+            cached = self.cache.get(title)
+            if cached is None:
+                missing.append(title)
+                continue
+            (summary,), is_stale = cached
+            found[title] = summary
+            if is_stale and title not in self._revalidating:
+                stale[title] = summary
+
+        if stale:
+            self._revalidating.update(stale)
+            with background():
+                task = asyncio.create_task(self._revalidate(stale))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        if missing:
+            found.update(await self._fetch_summaries(missing))
+        return found
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for /health."""
+        return {**self.cache.stats(), "revalidated": self.revalidated, "changed": self.changed}
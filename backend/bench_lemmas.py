@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the lemma table (lemmas.py).
+
+Reports table size, heap used by loading it compared with an equivalent
+dict, lookup latency, and how many query variants normalize_swedish_query
+produces with the table versus DEFINITE_SUFFIXES guessing.
+
+Run with a real word list (form<TAB>lemma):
+    python bench_lemmas.py saldo-fullform.tsv
+or without arguments to use a generated noun paradigm list.
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+import normalizer
+from lemmas import LemmaTable, build_lemma_table, read_word_list
+
+# (indefinite, definite, plural, definite plural) endings per declension
+DECLENSIONS = [
+    ("", "en", "ar", "arna"),    # bil, bilen, bilar, bilarna
+    ("a", "an", "or", "orna"),   # flicka, flickan, flickor, flickorna
+    ("", "en", "er", "erna"),    # stad, staden, städer (approx.), städerna
+    ("", "et", "", "en"),        # hus, huset, hus, husen
+    ("e", "et", "en", "ena"),    # äpple, äpplet, äpplen, äpplena
+]
+
+def generated_word_list(stems: int = 40000, seed: int = 3) -> List[Tuple[str, str]]:
+    """Synthetic noun paradigms, including genitive forms."""
+    rng = random.Random(seed)
+    letters = "abdefghijklmnoprstuvyåäö"
+    pairs = []
+    for _ in range(stems):
+        stem = ''.join(rng.choice(letters) for _ in range(rng.randint(3, 8)))
+        endings = rng.choice(DECLENSIONS)
+        lemma = stem + endings[0]
+        for ending in endings:
+            pairs.append((stem + ending, lemma))
+            pairs.append((stem + ending + "s", lemma))
+    return pairs
+
+def main(argv: List[str]) -> None:
+    pairs = list(read_word_list(argv[1])) if len(argv) > 1 else generated_word_list()
+    forms = [form for form, _ in pairs]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "lemmas.bin")
+        start = time.perf_counter()
+        count = build_lemma_table(pairs, path)
+        build_time = time.perf_counter() - start
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        table = LemmaTable(path)
+        load_time = time.perf_counter() - start
+        table_heap = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        tracemalloc.start()
+        as_dict: Dict[str, List[str]] = {}
+        for form, lemma in pairs:
+            as_dict.setdefault(form.lower(), []).append(lemma.lower())
+        dict_heap = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del as_dict
+
+        print(f"Lemma table: {count} entries from {len(pairs)} pairs")
+        print(f"  build: {build_time:.2f} s, load (mmap): {load_time * 1e6:.0f} µs")
+        print(f"  file: {table.size_bytes / 1e6:.2f} MB ({table.size_bytes / count:.1f} B/entry, shared across workers)")
+        print(f"  heap after load: {table_heap / 1e3:.1f} kB (dict equivalent: {dict_heap / 1e6:.1f} MB)")
+
+        sample = random.Random(1).sample(forms, min(20000, len(forms)))
+        misses = [form + "xq" for form in sample]
+        for label, words in (("hit", sample), ("miss", misses)):
+            start = time.perf_counter()
+            for word in words:
+                table.lookup(word)
+            elapsed = time.perf_counter() - start
+            print(f"  lookup ({label}): {elapsed * 1e6 / len(words):.2f} µs")
+
+        queries = random.Random(2).sample(forms, min(5000, len(forms)))
+        lemmas = {lemma.lower() for _, lemma in pairs}
+        print()
+        print(f"Base-form variants per single-word query over {len(queries)} inflected forms")
+        for label, lemma_table in (("suffix guessing", None), ("lemma table", table)):
+            normalizer.set_lemma_table(lemma_table)
+            extra = good = 0
+            for query in queries:
+                # Skip the raw query and the capitalized copy, keep the base-form guesses
+                for variant in normalizer.normalize_swedish_query(query)[1:]:
+                    if variant == query.capitalize():
+                        continue
+                    extra += 1
+                    good += variant in lemmas
+            print(f"  {label:<16} {extra / len(queries):.2f} sent upstream, "
+                  f"{(extra - good) / len(queries):.2f} junk, {good / len(queries):.2f} real base forms")
+        normalizer.set_lemma_table(None)
+        table.close()
+
+if __name__ == "__main__":
+    main(sys.argv)
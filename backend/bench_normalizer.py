@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for normalizer.py.
+
+Compares the compiled normalizer (cold and memoized) against the original
+per-request implementation, kept below as legacy_normalize, and checks that
+both produce identical variants for every query in the corpus.
+
+Run: python bench_normalizer.py
+"""
+
+import random
+import re
+import time
+from typing import List
+
+import normalizer
+from normalizer import (COMPOUND_HINTS, DEFINITE_SUFFIXES, QUESTION_PATTERNS,
+                        SWEDISH_DEFINITENESS, normalize_batch)
+
+def legacy_normalize(query: str) -> List[str]:
+    """
+    Original normalize_swedish_query, kept as the reference implementation.
+    Returns multiple query variants for better search coverage.
+    
+    Args:
+        query: Raw Swedish query
+    
+    Returns:
+        List of normalized query variants
+    """
+    variants = [query]  # Always include original
+    normalized = query.lower().strip()
+    
+    # Remove question patterns (NIL - Natural Input Language)
+    for pattern, replacement in QUESTION_PATTERNS:
+        if re.match(pattern, normalized, re.IGNORECASE):
+            cleaned = re.sub(pattern, replacement, normalized, flags=re.IGNORECASE).strip()
+            if cleaned and cleaned not in variants:
+                variants.append(cleaned)
+            normalized = cleaned
+            break
+    
+    # Remove articles and definiteness markers
+    words = normalized.split()
+    if len(words) > 1:
+        # Remove leading articles
+        if words[0] in SWEDISH_DEFINITENESS:
+            article_removed = ' '.join(words[1:])
+            if article_removed not in variants:
+                variants.append(article_removed)
+    
+    # Handle definite forms (remove suffixes)
+    if len(words) == 1 and len(words[0]) > 4:
+        base_word = words[0]
+        for suffix in DEFINITE_SUFFIXES:
+            if base_word.endswith(suffix) and len(base_word) > len(suffix) + 2:
+                indefinite = base_word[:-len(suffix)]
+                if indefinite not in variants and len(indefinite) > 2:
+                    variants.append(indefinite)
+    
+    # Add compound word variants
+    for hint in COMPOUND_HINTS:
+        if hint in normalized and len(words) > 1:
+            without_hint = normalized.replace(hint, '').strip()
+            if without_hint and without_hint not in variants:
+                variants.append(without_hint)
+    
+    # Capitalize proper nouns (Swedish convention)
+    if len(words) > 0:
+        capitalized = ' '.join(word.capitalize() for word in words)
+        if capitalized not in variants:
+            variants.append(capitalized)
+    
+    return variants
+CORPUS = [
+    "Stockholm", "Vad är Stockholm?", "vem är Gustav Vasa", "Var ligger Kiruna",
+    "när grundades Sverige", "hur fungerar kärnkraft", "varför är himlen blå",
+    "beskriv Gamla stan", "förklara kvantfysik", "vad betyder lagom", "bilen",
+    "husen", "flickorna", "pojkarna", "äpplena", "en bil", "ett hus",
+    "den stora bilen", "det stora huset", "de stora bilarna", "Sveriges historia",
+    "Stockholm stad", "Sverige landet", "Gustav kung", "kungahuset", "Minecraft",
+    "Python programmeringsspråk", "VAD ÄR  Malmö", "  göteborg  ", "vad är",
+    "historia", "landet", "stadshuset i stockholm", "Vasa kung historia",
+]
+
+def random_queries(count: int, seed: int = 7) -> List[str]:
+    """Synthetic queries mixing question prefixes, articles, hints and suffixes."""
+    rng = random.Random(seed)
+    prefixes = [""] * 4 + ["vad är ", "vem är ", "Var ligger ", "förklara ", "VAD BETYDER "]
+    articles = [""] * 4 + list(SWEDISH_DEFINITENESS)
+    stems = ["bil", "hus", "stad", "flick", "pojk", "kung", "skol", "båt", "sjö", "väg"]
+    endings = [""] + DEFINITE_SUFFIXES
+    queries = []
+    for _ in range(count):
+        words = [rng.choice(stems) + rng.choice(endings) for _ in range(rng.randint(1, 3))]
+        if rng.random() < 0.3:
+            words.append(rng.choice(COMPOUND_HINTS))
+        article = rng.choice(articles)
+        queries.append(rng.choice(prefixes) + (article + " " if article else "") + " ".join(words))
+    return queries
+
+def measure(label: str, fn, queries: List[str], repeat: int = 5) -> float:
+    best = float('inf')
+    variants = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        variants = sum(len(fn(query)) for query in queries)
+        best = min(best, time.perf_counter() - start)
+    rate = variants / best
+    print(f"  {label:<22} {rate:>12,.0f} variants/s  ({best * 1e6 / len(queries):.2f} µs/query)")
+    return rate
+
+def compiled_cold(query: str) -> List[str]:
+    return list(normalizer._normalize.__wrapped__(query)[0])
+
+def main() -> None:
+    # The reference implementation only knows suffix guessing, and doesn't correct spelling
+    saved = normalizer.lemma_table, normalizer.spelling_index
+    normalizer.set_lemma_table(None)
+    normalizer.set_spelling_index(None)
+    try:
+        run()
+    finally:
+        normalizer.set_lemma_table(saved[0])
+        normalizer.set_spelling_index(saved[1])
+
+def run() -> None:
+    queries = CORPUS + random_queries(20000)
+
+    mismatches = [q for q in queries if legacy_normalize(q) != normalizer.normalize_swedish_query(q)]
+    assert not mismatches, f"Variant output differs for: {mismatches[:5]}"
+    assert normalize_batch(CORPUS) == [legacy_normalize(q) for q in CORPUS]
+    print(f"Identical variants for {len(queries)} queries")
+    print()
+
+    print("Normalizer throughput")
+    legacy = measure("legacy (per request)", legacy_normalize, queries)
+    cold = measure("compiled, cold", compiled_cold, queries)
+    # Memoized: a popular-query working set that fits the cache
+    working_set = queries[:normalizer.NORMALIZE_CACHE_SIZE]
+    normalize_batch(working_set)
+    warm = measure("compiled, memoized", normalizer.normalize_swedish_query, working_set)
+    print()
+    print(f"  speedup cold: {cold / legacy:.1f}x, memoized: {warm / legacy:.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Load/latency benchmark for the search endpoints.
+
+Starts fake_wikipedia.py and the backend (uvicorn, main:app) as local
+subprocesses, drives the backend with concurrent requests drawn from the
+fixture query mix, and reports throughput, p50/p95/p99 latency and upstream
+calls per query. Results are written as JSON so runs can be compared across
+commits.
+
+Examples:
+    python bench_search.py --requests 2000 --concurrency 32 --latency 0.05 --jitter 0.05
+    python bench_search.py --scenario search batch --no-cache --output bench_results/head.json
+    python bench_search.py --compare bench_results/base.json bench_results/head.json
+
+Scenarios:
+    search      GET /search, one query per request
+    revalidate  GET /search sending If-None-Match with the last ETag seen for the query
+    overload    GET /search with every query made unique, so none is a cache hit; run it with
+                a --concurrency above UPSUM_MAX_IN_FLIGHT to see 503 shedding and the
+                latency of the requests that were admitted
+    stream      GET /search/stream, also records time to first result
+    stream-revalidate
+                GET /search/stream sending If-None-Match with the last ETag seen, as the
+                frontend's browser cache does (only cache-answered streams carry one)
+    batch       POST /search/batch, --batch-size queries per request
+
+Each run starts from a clean slate: the backend gets no rule stats, query
+log, warm-up or cache snapshot, and a temporary governor directory, so runs
+are comparable and backend/data is left alone (--env can override these).
+
+Response bytes are counted as received on the wire (compressed, headers
+excluded), with httpx's default Accept-Encoding (gzip, plus br when
+brotli is installed).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_PATH = os.path.join(BACKEND_DIR, "fixtures", "wiki_api.json")
+SCENARIOS = ("search", "revalidate", "overload", "stream", "stream-revalidate", "batch")
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an unsorted list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def query_mix(count: int, seed: int) -> List[str]:
+    """Fixture queries with a Zipf-like popularity skew."""
+    with open(FIXTURES_PATH, encoding='utf-8') as f:
+        queries = json.load(f)["queries"]
+    weights = [1 / (rank + 1) for rank in range(len(queries))]
+    return random.Random(seed).choices(queries, weights=weights, k=count)
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                                       text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def start_process(args: List[str], env: Dict[str, str], port: int, ready_path: str) -> subprocess.Popen:
+    """Start a server subprocess and wait until ready_path answers."""
+    process = subprocess.Popen(args, cwd=BACKEND_DIR, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{args[1]} exited with {process.returncode}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}{ready_path}", timeout=1)
+            return process
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"{args[1]} did not start on port {port}")
+
+async def run_scenario(client: httpx.AsyncClient, fake: httpx.AsyncClient, scenario: str,
+                       queries: List[str], concurrency: int, batch_size: int) -> Dict[str, Any]:
+    """Drive one scenario and collect latency, throughput and upstream counts."""
+    await fake.post("/reset")
+    if scenario == "batch":
+        units = [queries[i:i + batch_size] for i in range(0, len(queries), batch_size)]
+    else:
+        units = [[q] for q in queries]
+
+    latencies: List[float] = []
+    admitted: List[float] = []
+    first_result: List[float] = []
+    errors = 0
+    statuses: Dict[str, int] = {}
+    etags: Dict[str, str] = {}
+    received = 0
+    next_unit = 0
+
+    async def worker() -> None:
+        nonlocal next_unit, errors, received
+        while next_unit < len(units):
+            unit = units[next_unit]
+            number = next_unit
+            next_unit += 1
+            start = time.perf_counter()
+            served = False
+            try:
+                if scenario == "batch":
+                    response = await client.post("/search/batch", json={"queries": unit, "stream": False})
+                elif scenario in ("stream", "stream-revalidate"):
+                    first = None
+                    headers = {}
+                    if scenario == "stream-revalidate" and unit[0] in etags:
+                        headers["If-None-Match"] = etags[unit[0]]
+                    async with client.stream("GET", "/search/stream", params={"q": unit[0]},
+                                             headers=headers) as response:
+                        async for line in response.aiter_lines():
+                            if first is None and line:
+                                first = time.perf_counter() - start
+                    if first is not None:
+                        first_result.append(first)
+                elif scenario == "overload":
+                    response = await client.get("/search", params={"q": f"{unit[0]} {number}"})
+                elif scenario == "revalidate" and unit[0] in etags:
+                    response = await client.get("/search", params={"q": unit[0]},
+                                                headers={"If-None-Match": etags[unit[0]]})
+                else:
+                    response = await client.get("/search", params={"q": unit[0]})
+                if "etag" in response.headers:
+                    etags[unit[0]] = response.headers["etag"]
+                received += response.num_bytes_downloaded
+                statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+                if response.status_code in (200, 304):
+                    served = True
+                elif response.status_code != 503:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+                statuses["exception"] = statuses.get("exception", 0) + 1
+            latencies.append(time.perf_counter() - start)
+            if served:
+                admitted.append(latencies[-1])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    upstream = (await fake.get("/stats")).json()
+
+    report = {
+        "requests": len(units),
+        "queries": len(queries),
+        "errors": errors,
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_qps": round(len(queries) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "max": round(max(latencies) * 1000, 2) if latencies else 0.0
+        },
+        "admitted_latency_ms": {
+            "p50": round(percentile(admitted, 50) * 1000, 2),
+            "p99": round(percentile(admitted, 99) * 1000, 2)
+        },
+        "shed": statuses.get("503", 0),
+        "upstream_calls": upstream.get("requests", 0),
+        "upstream_per_query": round(upstream.get("requests", 0) / len(queries), 3),
+        "upstream_errors": upstream.get("errors", 0),
+        "bytes_per_request": round(received / len(units), 1)
+    }
+    if first_result:
+        report["first_result_ms"] = {
+            "p50": round(percentile(first_result, 50) * 1000, 2),
+            "p95": round(percentile(first_result, 95) * 1000, 2)
+        }
+    return report
+
+async def run_all(args: argparse.Namespace, backend_url: str, fake_url: str) -> Dict[str, Any]:
+    queries = query_mix(args.requests, args.seed)
+    limits = httpx.Limits(max_connections=args.concurrency + 8)
+    results: Dict[str, Any] = {}
+    async with httpx.AsyncClient(base_url=backend_url, timeout=120, limits=limits) as client, \
+            httpx.AsyncClient(base_url=fake_url, timeout=10) as fake:
+        for scenario in args.scenario:
+            results[scenario] = await run_scenario(client, fake, scenario, queries,
+                                                   args.concurrency, args.batch_size)
+            print_report(scenario, results[scenario])
+    return results
+
+def print_report(scenario: str, report: Dict[str, Any]) -> None:
+    latency = report["latency_ms"]
+    line = (f"{scenario:<10} {report['throughput_qps']:>9.1f} q/s  "
+            f"p50 {latency['p50']:>8.2f} ms  p95 {latency['p95']:>8.2f} ms  p99 {latency['p99']:>8.2f} ms  "
+            f"upstream/query {report['upstream_per_query']:.3f}  bytes/req {report.get('bytes_per_request', 0):.0f}  "
+            f"errors {report['errors']}")
+    if report.get("shed"):
+        line += f"  shed {report['shed']}  admitted p99 {report['admitted_latency_ms']['p99']:.2f} ms"
+    if "first_result_ms" in report:
+        line += f"  first result p50 {report['first_result_ms']['p50']:.2f} ms"
+    print(line)
+
+def compare(base_path: str, head_path: str) -> None:
+    """Print metric changes between two saved runs."""
+    with open(base_path, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(head_path, encoding='utf-8') as f:
+        head = json.load(f)
+    print(f"{base['meta']['commit']} -> {head['meta']['commit']}")
+    for scenario, after in head["scenarios"].items():
+        before = base["scenarios"].get(scenario)
+        if before is None:
+            continue
+        metrics = [("throughput_qps", after["throughput_qps"], before["throughput_qps"]),
+                   ("upstream_per_query", after["upstream_per_query"], before["upstream_per_query"]),
+                   ("bytes_per_request", after.get("bytes_per_request", 0), before.get("bytes_per_request", 0))]
+        metrics += [(f"latency {p}", after["latency_ms"][p], before["latency_ms"][p]) for p in ("p50", "p95", "p99")]
+        for name, new, old in metrics:
+            change = (new - old) / old * 100 if old else 0.0
+            print(f"  {scenario:<10} {name:<20} {old:>10.2f} -> {new:>10.2f}  ({change:+.1f}%)")
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", nargs="+", choices=SCENARIOS, default=["search"])
+    parser.add_argument("--requests", type=int, default=1000, help="queries per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--batch-size", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.05, help="fake upstream base delay (s)")
+    parser.add_argument("--jitter", type=float, default=0.05, help="fake upstream extra random delay (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fake upstream 503 fraction")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the backend")
+    parser.add_argument("--no-cache", action="store_true", help="disable the result cache (UPSUM_CACHE_SIZE=0)")
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="extra environment for the backend")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "HEAD"), help="compare two saved runs and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    fake_port, backend_port = free_port(), free_port()
+    env = dict(os.environ)
+    fake = start_process(
+        [sys.executable, "fake_wikipedia.py", "--port", str(fake_port), "--latency", str(args.latency),
+         "--jitter", str(args.jitter), "--error-rate", str(args.error_rate), "--seed", str(args.seed)],
+        env, fake_port, "/stats"
+    )
+    env["UPSUM_WIKI_API"] = f"http://127.0.0.1:{fake_port}/w/api.php"
+    env.setdefault("UPSUM_CACHE_BACKEND", "memory")
+    # Nothing from backend/data may carry over between runs (or into it):
+    # no learned rule pruning, no query log or warm-up, no cache snapshot,
+    # and governor slots/buckets of our own
+    governor_dir = tempfile.mkdtemp(prefix="upsum-bench-governor-")
+    env.update(UPSUM_RULE_STATS_PATH="", UPSUM_QUERY_LOG_PATH="", UPSUM_WARMUP_TOP="0",
+               UPSUM_CACHE_SNAPSHOT="", UPSUM_GOVERNOR_DIR=governor_dir)
+    if args.no_cache:
+        env["UPSUM_CACHE_SIZE"] = "0"
+    for item in args.env:
+        name, _, value = item.partition("=")
+        env[name] = value
+    try:
+        backend = start_process(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(backend_port),
+             "--workers", str(args.workers), "--log-level", "warning"],
+            env, backend_port, "/health"
+        )
+    except RuntimeError:
+        fake.kill()
+        shutil.rmtree(governor_dir, ignore_errors=True)
+        raise
+
+    try:
+        scenarios = asyncio.run(run_all(args, f"http://127.0.0.1:{backend_port}", f"http://127.0.0.1:{fake_port}"))
+    finally:
+        backend.terminate()
+        fake.terminate()
+        backend.wait(10)
+        fake.wait(10)
+        shutil.rmtree(governor_dir, ignore_errors=True)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "meta": {
+                    "commit": git_commit(),
+                    "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                    "params": {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+                },
+                "scenarios": scenarios
+            }, f, indent=2)
+        print(f"Saved {args.output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the spelling index (spelling.py).
+
+Reports index size, heap used by loading it, lookup latency for known,
+misspelled and unknown words, and, replaying misspelled fixture queries
+against the recorded API answers (fixtures/wiki_api.json), how often a
+search finds nothing with list=search and falls through to opensearch,
+with and without correction.
+
+Run with a real dictionary (text<TAB>count, e.g. data/titles.tsv):
+    python bench_spelling.py data/titles.tsv
+or without arguments to use fixture titles plus generated filler words.
+"""
+
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Dict, List
+
+import normalizer
+from fake_wikipedia import FIXTURES_PATH, fixture_key
+from spelling import WORD_RE, SpellingIndex, build_spelling_index, read_term_counts
+
+LETTERS = "abcdefghijklmnoprstuvyåäö"
+
+def generated_counts(fixtures: Dict, filler: int = 100000, seed: int = 4) -> Dict[str, int]:
+    """Words from fixture titles (frequent) plus random filler words with Zipf-like counts."""
+    rng = random.Random(seed)
+    counts: Dict[str, int] = {}
+    for rank in range(1, filler + 1):
+        word = ''.join(rng.choice(LETTERS) for _ in range(rng.randint(3, 12)))
+        counts[word] = counts.get(word, 0) + max(1, 100000 // rank)
+    for hits in fixtures["search"].values():
+        for hit in hits:
+            for word in WORD_RE.findall(hit["title"].lower()):
+                counts[word] = counts.get(word, 0) + 50000
+    return counts
+
+def misspell(word: str, rng: random.Random, edits: int) -> str:
+    """Apply random deletions, insertions, substitutions or transpositions."""
+    for _ in range(edits):
+        i = rng.randrange(len(word))
+        kind = rng.choice("dist")
+        if kind == "d" and len(word) > 3:
+            word = word[:i] + word[i + 1:]
+        elif kind == "i":
+            word = word[:i] + rng.choice(LETTERS) + word[i:]
+        elif kind == "s":
+            word = word[:i] + rng.choice(LETTERS) + word[i + 1:]
+        elif i + 1 < len(word):
+            word = word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word
+
+def timed_lookups(index: SpellingIndex, words: List[str]) -> str:
+    times = []
+    for word in words:
+        start = time.perf_counter()
+        index.correct(word)
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return f"mean {sum(times) * 1e6 / len(times):.1f} µs, p99 {times[int(len(times) * 0.99)] * 1e6:.1f} µs"
+
+def main(argv: List[str]) -> None:
+    with open(FIXTURES_PATH, encoding='utf-8') as f:
+        fixtures = json.load(f)
+    counts = read_term_counts(argv[1]) if len(argv) > 1 else generated_counts(fixtures)
+    words = [word for word in counts if len(word) >= 4]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "spelling.bin")
+        start = time.perf_counter()
+        count = build_spelling_index(counts, path)
+        build_time = time.perf_counter() - start
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        index = SpellingIndex(path)
+        load_time = time.perf_counter() - start
+        index_heap = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        print(f"Spelling index: {count} terms, {index.delete_count} deletes "
+              f"(distance {index.max_distance}, prefix {index.prefix_length})")
+        print(f"  build: {build_time:.2f} s, load (mmap): {load_time * 1e6:.0f} µs")
+        print(f"  file: {index.size_bytes / 1e6:.2f} MB ({index.size_bytes / count:.1f} B/term, shared across workers)")
+        print(f"  heap after load: {index_heap / 1e3:.1f} kB")
+
+        rng = random.Random(1)
+        sample = rng.sample(words, min(5000, len(words)))
+        typos = [misspell(word, rng, rng.choice((1, 2))) for word in sample]
+        unknown = [''.join(rng.choice(LETTERS) for _ in range(rng.randint(5, 12))) for _ in sample]
+        for label, batch in (("known", sample), ("misspelled", typos), ("unknown", unknown)):
+            print(f"  lookup ({label}): {timed_lookups(index, batch)}")
+
+        # Every searched fixture term misspelled a few ways, plus the recorded query mix
+        found = {key for key, hits in fixtures["search"].items() if hits}
+        queries = list(fixtures["queries"])
+        for key in sorted(found):
+            if len(key) >= 5:
+                queries += [misspell(key, rng, 1) for _ in range(10)]
+        print()
+        print(f"Replaying {len(queries)} queries ({len(queries) - len(fixtures['queries'])} misspelled fixture terms)")
+        saved = normalizer.spelling_index
+        for label, spelling_index in (("no correction", None), ("spelling index", index)):
+            normalizer.set_spelling_index(spelling_index)
+            variants = fallback = unanswered = 0
+            for query in queries:
+                query_variants = normalizer.normalize_swedish_query(query)
+                variants += len(query_variants)
+                if not any(fixture_key(variant) in found for variant in query_variants):
+                    fallback += 1
+                    unanswered += fixture_key(query_variants[0]) not in fixtures["opensearch"]
+            print(f"  {label:<15} {variants / len(queries):.2f} variants/query, "
+                  f"list=search finds nothing (opensearch fallback) {fallback / len(queries):.1%}, "
+                  f"zero results {unanswered / len(queries):.1%}")
+        normalizer.set_spelling_index(saved)
+        index.close()
+
+if __name__ == "__main__":
+    main(sys.argv)
@@ -0,0 +1,191 @@
+"""
+In-process result cache for /search.
+
+Bounded LRU with a TTL and a stale-while-revalidate window: an entry is
+fresh for `ttl` seconds, then served as stale (while the caller refreshes
+it in the background) for another `stale_ttl` seconds, then dropped.
+"""
+
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+CACHE_SIZE = int(os.getenv("UPSUM_CACHE_SIZE", "2048"))
+CACHE_TTL = float(os.getenv("UPSUM_CACHE_TTL", "300"))
+CACHE_STALE_TTL = float(os.getenv("UPSUM_CACHE_STALE_TTL", "3600"))
+
+# "memory" (per worker) or "sqlite" (shared by all workers on the host, see shared_cache.py)
+CACHE_BACKEND = os.getenv("UPSUM_CACHE_BACKEND", "memory")
+COMPACT_INTERVAL = float(os.getenv("UPSUM_CACHE_COMPACT_INTERVAL", "60"))
+
+Results = List[Dict[str, str]]
+
+def cache_key(variants: List[str], limit: int) -> str:
+    """
+    Build a cache key from normalized query variants.
+
+    The raw query (always variants[0]) is left out when normalization
+    produced other forms, and the rest are case-folded with trailing
+    punctuation removed, so "Vad är Stockholm?" and "stockholm" share a key.
+
+    Args:
+        variants: Output of normalize_swedish_query
+        limit: Result limit the entry was fetched with
+
+    Returns:
+        Stable string key
+    """
+    forms = variants[1:] or variants
+    folded = {form.casefold().strip().rstrip('?!.').strip() for form in forms}
+    folded.discard('')
+    return f"{limit}|" + "\x1f".join(sorted(folded))
+
+class ResultCache:
+    """LRU + TTL cache of search results with stale-while-revalidate."""
+
+    def __init__(self, max_entries: int = CACHE_SIZE, ttl: float = CACHE_TTL,
+                 stale_ttl: float = CACHE_STALE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries: "OrderedDict[str, Tuple[float, Results]]" = OrderedDict()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: str) -> Optional[Tuple[Results, bool]]:
+        """
+        Look up an entry.
+
+        Returns:
+            (results, is_stale), or None on a miss
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, results = entry
+        age = time.monotonic() - stored_at
+        if age > self.ttl + self.stale_ttl:
+            del self._entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        if age > self.ttl:
+            self.stale_hits += 1
+            return results, True
+        self.hits += 1
+        return results, False
+
+    def set(self, key: str, results: Results) -> None:
+        """Store results, evicting least recently used entries past max_entries."""
+        self._entries[key] = (time.monotonic(), results)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        self._entries.clear()
+
+    def export(self, max_entries: int) -> List[Tuple[str, float, Results]]:
+        """
+        Most recently used live entries, for a snapshot.
+
+        Returns:
+            (key, age in seconds, results), most recently used first
+        """
+        now = time.monotonic()
+        entries = []
+        for key, (stored_at, results) in reversed(self._entries.items()):
+            if len(entries) >= max_entries:
+                break
+            if now - stored_at <= self.ttl + self.stale_ttl:
+                entries.append((key, now - stored_at, results))
+        return entries
+
+    def restore(self, entries: List[Tuple[str, float, Results]]) -> int:
+        """
+        Load exported entries, keeping their age (and so their TTL) and LRU order.
+
+        Returns:
+            Number of entries restored
+        """
+        now = time.monotonic()
+        restored = 0
+        for key, age, results in reversed(entries):
+            if age <= self.ttl + self.stale_ttl and key not in self._entries:
+                self._entries[key] = (now - age, results)
+                restored += 1
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return restored
+
+    def compact(self) -> int:
+        """
+        Remove entries past their stale window.
+
+        Returns:
+            Number of entries removed
+        """
+        cutoff = time.monotonic() - self.ttl - self.stale_ttl
+        expired = [key for key, (stored_at, _) in self._entries.items() if stored_at < cutoff]
+        for key in expired:
+            del self._entries[key]
+        self.expirations += len(expired)
+        return len(expired)
+
+    def close(self) -> None:
+        """Nothing to release for the in-process cache."""
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for /health."""
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "backend": "memory",
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0
+        }
+
+def create_cache(backend: str = CACHE_BACKEND):
+    """
+    Create the result cache selected by UPSUM_CACHE_BACKEND.
+
+    Args:
+        backend: "memory" or "sqlite"
+
+    Returns:
+        ResultCache or shared_cache.SharedResultCache
+    """
+    if backend == "sqlite":
+        from shared_cache import SharedResultCache
+        return SharedResultCache()
+    return ResultCache()
+
+async def run_compaction(cache, interval: float = COMPACT_INTERVAL) -> None:
+    """Periodically compact the cache until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if isinstance(cache, ResultCache):
+                removed = cache.compact()
+            else:
+                removed = await asyncio.to_thread(cache.compact)
+            if removed:
+                print(f"[Cache] Compacted {removed} entries")
+        except Exception as e:
+            print(f"Cache compaction error: {e}")
@@ -0,0 +1,60 @@
+"""
+Request coalescing (single-flight) for identical in-flight work.
+
+The first caller for a key starts the work as a task; callers arriving
+while it runs await the same task instead of starting their own. The task
+is shielded, so a disconnecting first caller does not cancel it for the
+others.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn() once per key at a time and share its result.
+
+        Args:
+            key: Identity of the work
+            fn: Zero-argument coroutine factory, only called by the first caller
+
+        Returns:
+            Result of the (possibly shared) call
+        """
+        self.calls += 1
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finish(key, t))
+        return await asyncio.shield(task)
+
+    def running(self, key: Hashable) -> bool:
+        """Whether work for key is in flight (a new caller would share it)."""
+        return key in self._inflight
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter went away
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for /health."""
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._inflight),
+            "coalesce_rate": round(self.coalesced / self.calls, 4) if self.calls else 0.0
+        }
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for sv.wikipedia.org/w/api.php, used by bench_search.py.
+
+Answers list=search and opensearch from recorded fixtures
+(fixtures/wiki_api.json), with configurable latency and error injection.
+Unknown searches return no hits, like a real miss. titles= queries
+(article summaries) get a synthetic page per title.
+
+Run: python fake_wikipedia.py --port 8765 --latency 0.08 --jitter 0.04 --error-rate 0.01
+Point the backend at it with UPSUM_WIKI_API=http://127.0.0.1:8765/w/api.php
+
+GET /stats returns request counts; POST /reset clears them.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+from collections import Counter
+from typing import Any, Dict
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+FIXTURES_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "wiki_api.json")
+
+def fixture_key(text: str) -> str:
+    """Fixture lookup key: case-folded, trailing punctuation removed."""
+    return text.casefold().strip().strip('?!.').strip()
+
+def create_app(fixtures_path: str = FIXTURES_PATH, latency: float = 0.0, jitter: float = 0.0,
+               error_rate: float = 0.0, seed: int = 0) -> FastAPI:
+    """
+    Build the fake API.
+
+    Args:
+        fixtures_path: JSON with "search" and "opensearch" maps keyed by fixture_key
+        latency: Base delay per request (seconds)
+        jitter: Extra uniformly distributed delay up to this many seconds
+        error_rate: Fraction of requests answered with HTTP 503
+        seed: Random seed for jitter and errors
+    """
+    with open(fixtures_path, encoding='utf-8') as f:
+        fixtures = json.load(f)
+    rng = random.Random(seed)
+    counts: Counter = Counter()
+    app = FastAPI(title="Fake MediaWiki API")
+
+    @app.get("/w/api.php")
+    async def api(request: Request):
+        params = request.query_params
+        if params.get('action') == 'opensearch':
+            kind = 'opensearch'
+        else:
+            kind = 'articles' if 'titles' in params else 'search'
+        counts['requests'] += 1
+        counts[kind] += 1
+
+        delay = latency + rng.uniform(0, jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        if rng.random() < error_rate:
+            counts['errors'] += 1
+            return JSONResponse({"error": {"code": "maxlag", "info": "Injected error"}}, status_code=503)
+
+        if kind == 'opensearch':
+            search = params.get('search', '')
+            limit = int(params.get('limit', 10))
+            data = fixtures['opensearch'].get(fixture_key(search), [search, [], [], []])
+            return JSONResponse([data[0]] + [column[:limit] for column in data[1:]])
+
+        if kind == 'articles':
+            pages = []
+            for title in params.get('titles', '').split('|'):
+                page: Dict[str, Any] = {
+                    "title": title,
+                    "lastrevid": 1000 + sum(map(ord, title)),
+                    "fullurl": f"https://sv.wikipedia.org/wiki/{title.replace(' ', '_')}"
+                }
+                if 'extracts' in params.get('prop', ''):
+                    page["extract"] = f"{title} är en artikel på svenska Wikipedia."
+                pages.append(page)
+            return JSONResponse({"batchcomplete": True, "query": {"pages": pages}})
+
+        limit = int(params.get('srlimit', 10))
+        hits = fixtures['search'].get(fixture_key(params.get('srsearch', '')), [])
+        body: Dict[str, Any] = {
+            "batchcomplete": "",
+            "query": {"searchinfo": {"totalhits": len(hits)}, "search": hits[:limit]}
+        }
+        return JSONResponse(body)
+
+    @app.get("/stats")
+    async def stats():
+        return JSONResponse(dict(counts))
+
+    @app.post("/reset")
+    async def reset():
+        counts.clear()
+        return JSONResponse({"ok": True})
+
+    return app
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--fixtures', default=FIXTURES_PATH)
+    parser.add_argument('--latency', type=float, default=0.0, help='base delay per request (s)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random delay up to (s)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction answered with 503')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    app = create_app(args.fixtures, args.latency, args.jitter, args.error_rate, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning')
+
+if __name__ == "__main__":
+    main()
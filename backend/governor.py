@@ -0,0 +1,376 @@
+"""
+Upstream governor: one budget for the MediaWiki calls of every worker on a host.
+
+Before a call is sent it needs
+- a concurrency slot: at most UPSTREAM_CONCURRENCY calls in flight on the host;
+- a token from a bucket refilled at UPSTREAM_RATE per second (up to UPSTREAM_BURST).
+
+Workers coordinate through files in GOVERNOR_DIR. Each slot is a lock file
+held with flock while the call runs (the kernel releases it if the worker
+dies), and the bucket is a 16-byte state file updated under flock. Without
+fcntl (Windows) or with UPSUM_GOVERNOR_DIR set to "", the limits apply per
+worker.
+
+Waiting calls are served by priority, then arrival:
+  PRIMARY     first query variant of a user search
+  SECONDARY   further variants, article summaries
+  FALLBACK    the opensearch fallback
+  BACKGROUND  stale-cache refreshes, warm-up, summary revalidation
+Code run under `with background():` is never above BACKGROUND. A call still
+queued when its request deadline passes fails with UpstreamBusy.
+
+A hedge (upstream.py's duplicate of a slow call) needs a slot and a token
+of its own, but never queues for them: with none free right away, or calls
+already waiting, the call simply isn't hedged.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import random
+import struct
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set, Tuple
+
+from metrics import UPSTREAM_IN_FLIGHT, UPSTREAM_QUEUE_DEPTH, UPSTREAM_QUEUE_WAIT
+from upstream import UpstreamUnavailable, time_left
+
+try:
+    import fcntl
+except ImportError:  # Windows: limits are per worker
+    fcntl = None
+
+UPSTREAM_CONCURRENCY = int(os.getenv("UPSUM_UPSTREAM_CONCURRENCY", "16"))
+UPSTREAM_RATE = float(os.getenv("UPSUM_UPSTREAM_RATE", "50"))  # calls per second, 0 = no rate limit
+UPSTREAM_BURST = float(os.getenv("UPSUM_UPSTREAM_BURST", "20"))
+GOVERNOR_DIR = os.getenv("UPSUM_GOVERNOR_DIR", os.path.join(os.path.dirname(__file__), "data", "governor"))
+
+# Longest sleep between attempts while other workers hold every slot
+POLL_INTERVAL = 0.01
+
+PRIMARY, SECONDARY, FALLBACK, BACKGROUND = range(4)
+PRIORITY_NAMES = ('primary', 'secondary', 'fallback', 'background')
+
+# Bucket state file: tokens, time.time() of the last update
+BUCKET = struct.Struct('<dd')
+
+_floor: ContextVar[int] = ContextVar("upsum_priority_floor", default=PRIMARY)
+
+class UpstreamBusy(UpstreamUnavailable):
+    """Raised when a call is still waiting for the governor at its request deadline."""
+
+@contextmanager
+def background() -> Iterator[None]:
+    """Run upstream calls started inside the block (and tasks it spawns) at BACKGROUND priority."""
+    token = _floor.set(BACKGROUND)
+    try:
+        yield
+    finally:
+        _floor.reset(token)
+
+class HostLimits:
+    """Concurrency slots and a token bucket, shared by all workers through lock files."""
+
+    def __init__(self, concurrency: int = UPSTREAM_CONCURRENCY, rate: float = UPSTREAM_RATE,
+                 burst: float = UPSTREAM_BURST, directory: Optional[str] = GOVERNOR_DIR):
+        """
+        Args:
+            concurrency: Calls in flight on the host
+            rate: Calls started per second (0 = no rate limit)
+            burst: Bucket size
+            directory: Directory for the shared state files (None or "" = per worker)
+        """
+        self.concurrency = max(1, concurrency)
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.directory = directory if fcntl is not None else None
+        self.shared = bool(self.directory)
+        self._pid: Optional[int] = None
+        self._slot_fds: List[int] = []
+        self._bucket_fd: Optional[int] = None
+        self._held: Set[int] = set()
+        self._tokens = self.burst
+        self._stamp = time.time()
+        # The blocking search path takes slots from threads
+        self._lock = threading.Lock()
+
+    def _open(self) -> None:
+        """Open the state files once per process (after gunicorn has forked)."""
+        if not self.shared or self._pid == os.getpid():
+            return
+        # Descriptors inherited across a fork share their locks; never reuse them
+        self._slot_fds, self._bucket_fd, self._held = [], None, set()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._slot_fds = [os.open(os.path.join(self.directory, f"slot-{i}.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+                              for i in range(self.concurrency)]
+            self._bucket_fd = os.open(os.path.join(self.directory, "bucket"), os.O_RDWR | os.O_CREAT, 0o644)
+            self._pid = os.getpid()
+        except OSError as e:
+            print(f"[Governor] {self.directory} unavailable, limiting per worker: {e}")
+            self.shared = False
+
+    def _take_slot(self) -> Optional[int]:
+        free = [slot for slot in range(self.concurrency) if slot not in self._held]
+        if not self.shared:
+            slot = free[0] if free else None
+        else:
+            # Random start so workers don't all contend for slot 0
+            offset = random.randrange(len(free)) if free else 0
+            slot = None
+            for candidate in free[offset:] + free[:offset]:
+                try:
+                    fcntl.flock(self._slot_fds[candidate], fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    continue
+                slot = candidate
+                break
+        if slot is not None:
+            self._held.add(slot)
+        return slot
+
+    def _spend(self, tokens: float, stamp: float) -> Tuple[float, float]:
+        """(tokens left, seconds to wait) after refilling since stamp and taking one."""
+        tokens = min(self.burst, tokens + max(0.0, time.time() - stamp) * self.rate)
+        if tokens >= 1:
+            return tokens - 1, 0.0
+        return tokens, (1 - tokens) / self.rate
+
+    def _take_token(self) -> float:
+        """0 if a token was taken, else seconds until one is available."""
+        if self.rate <= 0:
+            return 0.0
+        if not self.shared:
+            self._tokens, wait = self._spend(self._tokens, self._stamp)
+            self._stamp = time.time()
+            return wait
+        fd = self._bucket_fd
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            raw = os.pread(fd, BUCKET.size, 0)
+            tokens, stamp = BUCKET.unpack(raw) if len(raw) == BUCKET.size else (self.burst, time.time())
+            tokens, wait = self._spend(tokens, stamp)
+            os.pwrite(fd, BUCKET.pack(tokens, time.time()), 0)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        return wait
+
+    def try_acquire(self) -> Tuple[Optional[int], float]:
+        """
+        Take a slot and a token without blocking.
+
+        Returns:
+            (slot, 0.0) when a call may start, else (None, seconds before it is worth retrying)
+        """
+        with self._lock:
+            self._open()
+            slot = self._take_slot()
+            if slot is None:
+                return None, POLL_INTERVAL
+            wait = self._take_token()
+            if wait > 0:
+                self._release(slot)
+                return None, wait
+            return slot, 0.0
+
+    def _release(self, slot: int) -> None:
+        self._held.discard(slot)
+        if self.shared and slot < len(self._slot_fds):
+            fcntl.flock(self._slot_fds[slot], fcntl.LOCK_UN)
+
+    def release(self, slot: int) -> None:
+        """Give back a slot from try_acquire."""
+        with self._lock:
+            self._release(slot)
+
+    @contextmanager
+    def blocking(self, timeout: float) -> Iterator[None]:
+        """Hold a slot for a blocking call, sleeping until one is free (up to timeout seconds)."""
+        deadline = time.monotonic() + timeout
+        while True:
+            slot, wait = self.try_acquire()
+            if slot is not None:
+                break
+            if time.monotonic() + wait > deadline:
+                raise UpstreamBusy("No upstream slot free before the timeout")
+            time.sleep(wait)
+        try:
+            yield
+        finally:
+            self.release(slot)
+
+class Governor:
+    """Priority queue in front of HostLimits for this worker's async upstream calls."""
+
+    def __init__(self, limits: Optional[HostLimits] = None):
+        self.limits = limits or HostLimits()
+        self.in_flight = 0
+        self.queued = [0] * len(PRIORITY_NAMES)
+        self.admitted = [0] * len(PRIORITY_NAMES)
+        self.expired = [0] * len(PRIORITY_NAMES)
+        self.waited = [0.0] * len(PRIORITY_NAMES)
+        self.hedged = 0
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._order = itertools.count()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIMARY) -> AsyncIterator[None]:
+        """
+        Hold an upstream slot for the duration of the block.
+
+        Args:
+            priority: PRIMARY..BACKGROUND; lowered to BACKGROUND under background()
+
+        Raises:
+            UpstreamBusy: still queued when the request deadline passed
+        """
+        priority = max(priority, _floor.get())
+        start = time.monotonic()
+        slot = await self._acquire(priority)
+        waited = time.monotonic() - start
+        UPSTREAM_QUEUE_WAIT.observe(waited, PRIORITY_NAMES[priority])
+        self.admitted[priority] += 1
+        self.waited[priority] += waited
+        self.in_flight += 1
+        UPSTREAM_IN_FLIGHT.inc()
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            UPSTREAM_IN_FLIGHT.dec()
+            self._release(slot)
+
+    @contextmanager
+    def spare_slot(self) -> Iterator[bool]:
+        """
+        Hold a slot for an optional extra call (a hedge) only if one is free now.
+        
+        Never waits and never goes ahead of queued calls, so hedges count
+        against the same budget without delaying anything.
+        
+        Yields:
+            Whether a slot is held
+        """
+        self._bind_loop()
+        slot = None
+        if not self._queue:
+            slot, _ = self.limits.try_acquire()
+        if slot is None:
+            yield False
+            return
+        self.hedged += 1
+        self.in_flight += 1
+        UPSTREAM_IN_FLIGHT.inc()
+        try:
+            yield True
+        finally:
+            self.in_flight -= 1
+            UPSTREAM_IN_FLIGHT.dec()
+            self._release(slot)
+
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            # New event loop (tests, app restart): waiters of the old one are gone
+            self._loop = loop
+            self._wake = asyncio.Event()
+            self._dispatcher = None
+            for priority, _, _ in self._queue:
+                self._dequeued(priority)
+            self._queue = []
+        return loop
+
+    async def _acquire(self, priority: int) -> int:
+        loop = self._bind_loop()
+        if not self._queue:
+            slot, _ = self.limits.try_acquire()
+            if slot is not None:
+                return slot
+
+        future = loop.create_future()
+        entry = (priority, next(self._order), future)
+        heapq.heappush(self._queue, entry)
+        self.queued[priority] += 1
+        UPSTREAM_QUEUE_DEPTH.inc(PRIORITY_NAMES[priority])
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        self._wake.set()
+
+        try:
+            done, _ = await asyncio.wait({future}, timeout=time_left())
+        except asyncio.CancelledError:
+            self._abandon(entry)
+            raise
+        if not done:
+            self._abandon(entry)
+            self.expired[priority] += 1
+            raise UpstreamBusy("Request deadline passed while waiting for an upstream slot")
+        return future.result()
+
+    def _dequeued(self, priority: int) -> None:
+        self.queued[priority] -= 1
+        UPSTREAM_QUEUE_DEPTH.dec(PRIORITY_NAMES[priority])
+
+    def _abandon(self, entry: Tuple[int, int, asyncio.Future]) -> None:
+        """Leave the queue; a slot granted in the meantime is given back."""
+        future = entry[2]
+        if future.done() and not future.cancelled():
+            self._release(future.result())
+            return
+        future.cancel()
+        if entry in self._queue:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            self._dequeued(entry[0])
+
+    def _release(self, slot: int) -> None:
+        self.limits.release(slot)
+        if self._wake is not None:
+            self._wake.set()
+
+    async def _dispatch(self) -> None:
+        """Hand slots to waiters in priority order while any are queued."""
+        try:
+            while self._queue:
+                slot, wait = self.limits.try_acquire()
+                if slot is not None:
+                    priority, _, future = heapq.heappop(self._queue)
+                    self._dequeued(priority)
+                    if future.done():
+                        self.limits.release(slot)
+                    else:
+                        future.set_result(slot)
+                    continue
+                # Woken early by a release; otherwise retry when a token is due
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if self._dispatcher is asyncio.current_task():
+                self._dispatcher = None
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for /health."""
+        return {
+            "shared": self.limits.shared,
+            "concurrency": self.limits.concurrency,
+            "rate": self.limits.rate,
+            "in_flight": self.in_flight,
+            "queued": dict(zip(PRIORITY_NAMES, self.queued)),
+            "admitted": dict(zip(PRIORITY_NAMES, self.admitted)),
+            "expired": dict(zip(PRIORITY_NAMES, self.expired)),
+            "hedged": self.hedged,
+            "mean_wait_ms": {
+                name: round(self.waited[p] / self.admitted[p] * 1000, 2) if self.admitted[p] else 0.0
+                for p, name in enumerate(PRIORITY_NAMES)
+            }
+        }
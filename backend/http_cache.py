@@ -0,0 +1,162 @@
+"""
+HTTP caching and compression for JSON endpoints.
+
+json_response() serializes a payload once (orjson when installed) and
+passes it to cached_response(), which also takes prebuilt bodies (e.g. a
+complete NDJSON stream answered from the result cache). It tags the body
+with a strong ETag, answers a matching If-None-Match with 304 and
+otherwise sends the body compressed with brotli (when installed and
+accepted) or gzip. Compressed bodies are kept in a small LRU
+by ETag, so a popular result is compressed once per worker.
+
+The ETag of a compressed body carries an encoding suffix ("<hash>-br"),
+as each representation needs its own strong validator; If-None-Match
+ignores the suffix, so a client holding any encoding of the same payload
+gets a 304.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Cache-Control for cacheable /search responses (seconds)
+SEARCH_MAX_AGE = int(os.getenv("UPSUM_SEARCH_MAX_AGE", "60"))
+SEARCH_STALE_WHILE_REVALIDATE = int(os.getenv("UPSUM_SEARCH_STALE_WHILE_REVALIDATE", "600"))
+
+# Bodies smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = 512
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+COMPRESSED_CACHE_SIZE = 1024
+
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+_compressed: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+
+def dumps(payload: Any) -> bytes:
+    """Compact UTF-8 JSON, via orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def body_etag(body: bytes) -> str:
+    """Strong ETag for a response body."""
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def cache_control(max_age: int = SEARCH_MAX_AGE, stale_while_revalidate: int = SEARCH_STALE_WHILE_REVALIDATE) -> str:
+    """Cache-Control value for a cacheable response."""
+    return f"public, max-age={max_age}, stale-while-revalidate={stale_while_revalidate}"
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Preferred supported encoding listed in Accept-Encoding (q=0 excluded)."""
+    accepted = set()
+    for item in accept_encoding.lower().split(','):
+        name, _, params = item.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        accepted.add(name.strip())
+    for encoding in ENCODINGS:
+        if encoding in accepted:
+            return encoding
+    return None
+
+def compress(body: bytes, encoding: str, etag: str) -> bytes:
+    """Compressed body, memoized by (etag, encoding)."""
+    key = (etag, encoding)
+    data = _compressed.get(key)
+    if data is not None:
+        _compressed.move_to_end(key)
+        return data
+    if encoding == 'br':
+        data = brotli.compress(body, quality=BROTLI_QUALITY)
+    else:
+        data = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    _compressed[key] = data
+    if len(_compressed) > COMPRESSED_CACHE_SIZE:
+        _compressed.popitem(last=False)
+    return data
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison, encoding suffix ignored)."""
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag.strip('"')
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        if candidate == opaque or candidate.rsplit('-', 1)[0] == opaque:
+            return True
+    return False
+
+def json_response(request: Request, payload: Any, cacheable: bool = True,
+                  max_age: int = SEARCH_MAX_AGE,
+                  stale_while_revalidate: int = SEARCH_STALE_WHILE_REVALIDATE) -> Response:
+    """
+    JSON response with ETag, conditional GET, Cache-Control and compression.
+
+    Args:
+        request: Incoming request (If-None-Match, Accept-Encoding)
+        payload: JSON-serializable body
+        cacheable: False sends Cache-Control: no-store (e.g. partial results)
+        max_age: Seconds shared and browser caches may reuse the response
+        stale_while_revalidate: Further seconds a stale copy may be served while revalidating
+
+    Returns:
+        200 with the (possibly compressed) body, or 304
+    """
+    return cached_response(request, dumps(payload), "application/json", cacheable, max_age,
+                           stale_while_revalidate)
+
+def cached_response(request: Request, body: bytes, media_type: str, cacheable: bool = True,
+                    max_age: int = SEARCH_MAX_AGE,
+                    stale_while_revalidate: int = SEARCH_STALE_WHILE_REVALIDATE) -> Response:
+    """
+    Complete body with ETag, conditional GET, Cache-Control and compression.
+
+    Args:
+        request: Incoming request (If-None-Match, Accept-Encoding)
+        body: Encoded response body
+        media_type: Content-Type of body
+        cacheable: False sends Cache-Control: no-store
+        max_age: Seconds shared and browser caches may reuse the response
+        stale_while_revalidate: Further seconds a stale copy may be served while revalidating
+
+    Returns:
+        200 with the (possibly compressed) body, or 304
+    """
+    etag = body_etag(body)
+    encoding = None
+    if len(body) >= COMPRESS_MIN_SIZE:
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    headers: Dict[str, str] = {
+        "ETag": f'{etag[:-1]}-{encoding}"' if encoding else etag,
+        "Cache-Control": cache_control(max_age, stale_while_revalidate) if cacheable else "no-store",
+        "Vary": "Accept-Encoding"
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    if encoding:
+        body = compress(body, encoding, etag)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
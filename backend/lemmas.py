@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Compact Swedish lemma table (inflected form -> base forms).
+
+Build from a tab-separated inflection word list, one "form<TAB>lemma" per
+line (extra columns and '#' comments are ignored), e.g. an export of the
+SALDO full-form lexicon:
+    python lemmas.py build saldo-fullform.tsv data/lemmas.bin
+
+The binary file is memory-mapped, so loading is constant time and all
+gunicorn workers share the same pages:
+    header        b"UPLM", version, entry count, blob size (4 x uint32)
+    hashes        uint64[n]  sorted 64-bit BLAKE2b hashes of lower-cased forms
+    offsets       uint32[n]  lemma offsets into the blob
+    lengths       uint16[n]  lemma byte lengths
+    blob          unique lemmas, UTF-8, concatenated
+
+A form with several lemmas has one entry per lemma, adjacent after sorting.
+Forms are identified by their 64-bit hash only; collisions are negligible
+at word-list sizes.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MAGIC = b"UPLM"
+VERSION = 1
+HEADER = struct.Struct('<4sIII')
+
+LEMMA_PATH = os.getenv("UPSUM_LEMMA_PATH", os.path.join(os.path.dirname(__file__), "data", "lemmas.bin"))
+
+def form_hash(form: str) -> int:
+    """Stable 64-bit hash of the lower-cased form."""
+    digest = hashlib.blake2b(form.lower().encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+def read_word_list(path: str) -> Iterable[Tuple[str, str]]:
+    """Yield (form, lemma) pairs from a form<TAB>lemma file."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            columns = line.rstrip('\n').split('\t')
+            if len(columns) >= 2 and columns[0] and columns[1]:
+                yield columns[0], columns[1]
+
+def build_lemma_table(pairs: Iterable[Tuple[str, str]], out_path: str) -> int:
+    """
+    Write the binary lemma table.
+
+    Args:
+        pairs: (form, lemma) pairs
+        out_path: Destination file
+
+    Returns:
+        Number of entries written
+    """
+    blob = bytearray()
+    lemma_refs: Dict[str, Tuple[int, int]] = {}
+    entries = set()
+    for form, lemma in pairs:
+        lemma = lemma.lower()
+        ref = lemma_refs.get(lemma)
+        if ref is None:
+            encoded = lemma.encode('utf-8')
+            ref = lemma_refs[lemma] = (len(blob), len(encoded))
+            blob += encoded
+        entries.add((form_hash(form), ref))
+
+    ordered = sorted(entries)
+    hashes = array('Q', (h for h, _ in ordered))
+    offsets = array('I', (offset for _, (offset, _) in ordered))
+    lengths = array('H', (length for _, (_, length) in ordered))
+
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    with open(out_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(ordered), len(blob)))
+        f.write(hashes.tobytes())
+        f.write(offsets.tobytes())
+        f.write(lengths.tobytes())
+        f.write(blob)
+    return len(ordered)
+
+class LemmaTable:
+    """Memory-mapped lookup over a file written by build_lemma_table."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, blob_size = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a lemma table (version {VERSION}): {path}")
+        self.count = count
+        view = memoryview(self._map)
+        start = HEADER.size
+        self._hashes = view[start:start + 8 * count].cast('Q')
+        start += 8 * count
+        self._offsets = view[start:start + 4 * count].cast('I')
+        start += 4 * count
+        self._lengths = view[start:start + 2 * count].cast('H')
+        start += 2 * count
+        self._blob = view[start:start + blob_size]
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def size_bytes(self) -> int:
+        """Mapped file size."""
+        return len(self._map)
+
+    def lookup(self, form: str) -> List[str]:
+        """
+        Base forms for an inflected form.
+
+        Returns:
+            Lemmas (lower-case), empty if the form is not in the table
+        """
+        h = form_hash(form)
+        i = bisect_left(self._hashes, h)
+        lemmas = []
+        while i < self.count and self._hashes[i] == h:
+            offset = self._offsets[i]
+            lemmas.append(bytes(self._blob[offset:offset + self._lengths[i]]).decode('utf-8'))
+            i += 1
+        return lemmas
+
+    def close(self) -> None:
+        """Release the memory map."""
+        for view in (self._hashes, self._offsets, self._lengths, self._blob):
+            view.release()
+        self._map.close()
+
+def load_lemma_table(path: str = LEMMA_PATH) -> Optional[LemmaTable]:
+    """Map the lemma table if it has been built, else None."""
+    if not os.path.exists(path):
+        return None
+    return LemmaTable(path)
+
+def main(argv: List[str]) -> int:
+    if len(argv) == 4 and argv[1] == 'build':
+        count = build_lemma_table(read_word_list(argv[2]), argv[3])
+        print(f"Wrote {count} entries to {argv[3]} ({os.path.getsize(argv[3])} bytes)")
+        return 0
+    if len(argv) >= 4 and argv[1] == 'lookup':
+        table = LemmaTable(argv[2])
+        for form in argv[3:]:
+            print(f"{form}: {', '.join(table.lookup(form)) or '-'}")
+        return 0
+    print(__doc__)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
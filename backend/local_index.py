@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Local full-text index over a Swedish Wikipedia dump.
+
+Build (streams the dump, never loads it whole):
+    python local_index.py build svwiki-latest-pages-articles.xml.bz2 data/index
+
+Query:
+    python local_index.py search data/index "Gustav Vasa"
+
+Index layout (all little-endian, read through mmap at query time):
+    meta.json      document count, average document length, BM25 parameters
+    docs.dat       "title\\0lead" UTF-8 records
+    docs.off       uint64[n + 1] record offsets into docs.dat
+    doclen.bin     uint32[n] token count per document (title tokens boosted)
+    terms.dat      sorted UTF-8 terms
+    terms.off      uint64[t + 1] offsets into terms.dat
+    postings.off   uint64[t + 1] offsets into postings.dat
+    postings.dat   uint32 (doc_id, tf) pairs, doc ids ascending per term
+
+Postings are accumulated in memory up to BLOCK_POSTINGS, spilled to sorted
+block files and k-way merged at the end, so memory stays bounded on the
+full svwiki dump.
+"""
+
+import bz2
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import tempfile
+import xml.etree.ElementTree as ET
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+INDEX_VERSION = 1
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Title tokens count this many times towards term frequency
+TITLE_BOOST = 3
+
+# Lead text kept per article (characters)
+LEAD_LENGTH = 600
+
+# Postings held in memory before a block is spilled to disk
+BLOCK_POSTINGS = 4_000_000
+
+# Frequent Swedish function words, not worth a postings list
+STOPWORDS = frozenset("""
+och i att det som en på är av för med till den har de inte om ett han men
+var jag sig från vi så kan man när år säga hon under också efter eller nu
+sin där vid mot ska skulle kommer ut får finns vara blev blir hade än dess
+the of and
+""".split())
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case word tokens without stopwords or single characters."""
+    return [token for token in TOKEN_RE.findall(text.lower())
+            if len(token) > 1 and token not in STOPWORDS]
+
+# --- Wikitext lead extraction -------------------------------------------------
+
+COMMENT_RE = re.compile(r'<!--.*?-->', re.DOTALL)
+REF_RE = re.compile(r'<ref[^>/]*/>|<ref[^>]*>.*?</ref>', re.DOTALL | re.IGNORECASE)
+TAG_RE = re.compile(r'<[^>]+>')
+TABLE_RE = re.compile(r'\{\|.*?\|\}', re.DOTALL)
+TEMPLATE_RE = re.compile(r'\{\{[^{}]*\}\}')
+FILE_LINK_RE = re.compile(r'\[\[(?:Fil|File|Bild|Image|Kategori|Category):[^\[\]]*(?:\[\[[^\[\]]*\]\][^\[\]]*)*\]\]',
+                          re.IGNORECASE)
+LINK_RE = re.compile(r'\[\[(?:[^\[\]|]*\|)?([^\[\]]*)\]\]')
+EXTERNAL_LINK_RE = re.compile(r'\[https?://[^\s\]]+\s*([^\]]*)\]')
+EMPHASIS_RE = re.compile(r"'{2,}")
+HEADING_RE = re.compile(r'^=+.*?=+\s*$', re.MULTILINE)
+
+def extract_lead(wikitext: str, max_length: int = LEAD_LENGTH) -> str:
+    """
+    Extract plain lead text (everything before the first heading).
+
+    Args:
+        wikitext: Raw article wikitext
+        max_length: Maximum characters kept
+
+    Returns:
+        Plain text lead
+    """
+    heading = HEADING_RE.search(wikitext)
+    text = wikitext[:heading.start()] if heading else wikitext
+    text = COMMENT_RE.sub('', text)
+    text = REF_RE.sub('', text)
+    # Templates nest, so strip innermost first until none remain
+    previous = None
+    while previous != text:
+        previous = text
+        text = TEMPLATE_RE.sub('', text)
+    text = TABLE_RE.sub('', text)
+    text = FILE_LINK_RE.sub('', text)
+    text = LINK_RE.sub(r'\1', text)
+    text = EXTERNAL_LINK_RE.sub(r'\1', text)
+    text = EMPHASIS_RE.sub('', text)
+    text = TAG_RE.sub('', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text[:max_length]
+
+# --- Dump streaming -----------------------------------------------------------
+
+def open_dump(path: str):
+    """Open a dump, decompressing .bz2 on the fly."""
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    return open(path, 'rb')
+
+def iter_dump_pages(path: str) -> Iterator[Tuple[str, str]]:
+    """
+    Stream (title, lead) for every article in a pages-articles dump.
+
+    Only namespace 0 pages that are not redirects are yielded. Parsed
+    elements are cleared as they are consumed.
+    """
+    with open_dump(path) as f:
+        context = ET.iterparse(f, events=('start', 'end'))
+        _, root = next(context)
+        for event, elem in context:
+            if event != 'end' or elem.tag.rsplit('}', 1)[-1] != 'page':
+                continue
+
+            title = ns = text = None
+            redirect = False
+            for child in elem.iter():
+                tag = child.tag.rsplit('}', 1)[-1]
+                if tag == 'title':
+                    title = child.text
+                elif tag == 'ns':
+                    ns = child.text
+                elif tag == 'redirect':
+                    redirect = True
+                elif tag == 'text':
+                    text = child.text
+
+            if title and ns == '0' and not redirect and text:
+                lead = extract_lead(text)
+                if lead:
+                    yield title, lead
+
+            elem.clear()
+            root.clear()
+
+# --- Index building -----------------------------------------------------------
+
+def _write_block(path: str, postings: Dict[str, array]) -> None:
+    with open(path, 'wb') as out:
+        for term in sorted(postings):
+            encoded = term.encode('utf-8')
+            data = postings[term]
+            out.write(struct.pack('<HI', len(encoded), len(data)))
+            out.write(encoded)
+            out.write(data.tobytes())
+
+def _read_block(path: str, block_no: int) -> Iterator[Tuple[str, int, bytes]]:
+    with open(path, 'rb') as f:
+        while True:
+            header = f.read(6)
+            if not header:
+                return
+            term_length, count = struct.unpack('<HI', header)
+            term = f.read(term_length).decode('utf-8')
+            yield term, block_no, f.read(count * 4)
+
+def build_index(dump_path: str, out_dir: str, block_postings: int = BLOCK_POSTINGS) -> Dict[str, float]:
+    """
+    Build an on-disk BM25 index from a dump.
+
+    Args:
+        dump_path: pages-articles XML dump (.xml or .xml.bz2)
+        out_dir: Directory for the index files
+        block_postings: Postings held in memory before spilling a block
+
+    Returns:
+        The index metadata written to meta.json
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    block_dir = tempfile.mkdtemp(prefix='upsum-index-', dir=out_dir)
+    blocks: List[str] = []
+    postings: Dict[str, array] = {}
+    pending = 0
+    doc_lengths = array('I')
+    doc_offsets = array('Q', [0])
+
+    with open(os.path.join(out_dir, 'docs.dat'), 'wb') as docs:
+        for doc_id, (title, lead) in enumerate(iter_dump_pages(dump_path)):
+            record = f"{title}\0{lead}".encode('utf-8')
+            docs.write(record)
+            doc_offsets.append(doc_offsets[-1] + len(record))
+
+            frequencies: Dict[str, int] = {}
+            for token in tokenize(title):
+                frequencies[token] = frequencies.get(token, 0) + TITLE_BOOST
+            for token in tokenize(lead):
+                frequencies[token] = frequencies.get(token, 0) + 1
+            doc_lengths.append(sum(frequencies.values()))
+
+            for term, tf in frequencies.items():
+                postings.setdefault(term, array('I')).extend((doc_id, tf))
+            pending += len(frequencies)
+
+            if pending >= block_postings:
+                blocks.append(os.path.join(block_dir, f'block{len(blocks)}.bin'))
+                _write_block(blocks[-1], postings)
+                postings.clear()
+                pending = 0
+
+    if postings:
+        blocks.append(os.path.join(block_dir, f'block{len(blocks)}.bin'))
+        _write_block(blocks[-1], postings)
+        postings.clear()
+
+    term_offsets = array('Q', [0])
+    posting_offsets = array('Q', [0])
+    with open(os.path.join(out_dir, 'terms.dat'), 'wb') as terms, \
+            open(os.path.join(out_dir, 'postings.dat'), 'wb') as post:
+        current = None
+        written = 0
+        merged = heapq.merge(*(_read_block(path, n) for n, path in enumerate(blocks)))
+        for term, _, data in merged:
+            if term != current:
+                if current is not None:
+                    posting_offsets.append(written)
+                encoded = term.encode('utf-8')
+                terms.write(encoded)
+                term_offsets.append(term_offsets[-1] + len(encoded))
+                current = term
+            # Blocks hold increasing doc ids, so block order keeps postings sorted
+            post.write(data)
+            written += len(data)
+        if current is not None:
+            posting_offsets.append(written)
+
+    for path in blocks:
+        os.remove(path)
+    os.rmdir(block_dir)
+
+    for name, data in (('docs.off', doc_offsets), ('doclen.bin', doc_lengths),
+                       ('terms.off', term_offsets), ('postings.off', posting_offsets)):
+        with open(os.path.join(out_dir, name), 'wb') as f:
+            f.write(data.tobytes())
+
+    meta = {
+        'version': INDEX_VERSION,
+        'documents': len(doc_lengths),
+        'terms': len(term_offsets) - 1,
+        'avg_doc_length': (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0,
+        'k1': BM25_K1,
+        'b': BM25_B
+    }
+    with open(os.path.join(out_dir, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return meta
+
+# --- Query time ---------------------------------------------------------------
+
+def _map(path: str):
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+class LocalIndex:
+    """Memory-mapped BM25 index produced by build_index."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, 'meta.json'), encoding='utf-8') as f:
+            self.meta = json.load(f)
+        if self.meta.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported index version in {path}: {self.meta.get('version')}")
+
+        self._maps = {name: _map(os.path.join(path, name)) for name in
+                      ('docs.dat', 'docs.off', 'doclen.bin', 'terms.dat', 'terms.off',
+                       'postings.off', 'postings.dat')}
+        self._doc_offsets = memoryview(self._maps['docs.off']).cast('Q')
+        self._doc_lengths = memoryview(self._maps['doclen.bin']).cast('I')
+        self._term_offsets = memoryview(self._maps['terms.off']).cast('Q')
+        self._posting_offsets = memoryview(self._maps['postings.off']).cast('Q')
+        self._postings = memoryview(self._maps['postings.dat'])
+        self.documents = self.meta['documents']
+        self.avg_doc_length = self.meta['avg_doc_length'] or 1.0
+        self.k1 = self.meta.get('k1', BM25_K1)
+        self.b = self.meta.get('b', BM25_B)
+
+    def __len__(self) -> int:
+        return self.documents
+
+    def _term(self, i: int) -> bytes:
+        return self._maps['terms.dat'][self._term_offsets[i]:self._term_offsets[i + 1]]
+
+    def _find_term(self, term: str) -> Optional[int]:
+        encoded = term.encode('utf-8')
+        lo, hi = 0, len(self._term_offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < encoded:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self._term_offsets) - 1 and self._term(lo) == encoded:
+            return lo
+        return None
+
+    def postings(self, term: str) -> memoryview:
+        """(doc_id, tf) pairs for a term, flattened, as a uint32 view."""
+        i = self._find_term(term)
+        if i is None:
+            return memoryview(b'').cast('I')
+        return self._postings[self._posting_offsets[i]:self._posting_offsets[i + 1]].cast('I')
+
+    def document(self, doc_id: int) -> Tuple[str, str]:
+        """(title, lead) for a document id."""
+        record = self._maps['docs.dat'][self._doc_offsets[doc_id]:self._doc_offsets[doc_id + 1]]
+        title, _, lead = bytes(record).decode('utf-8').partition('\0')
+        return title, lead
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[str, str, float]]:
+        """
+        Rank documents for a query with BM25.
+
+        Args:
+            query: Free text query
+            limit: Maximum number of hits
+
+        Returns:
+            List of (title, lead, score), best first
+        """
+        scores: Dict[int, float] = {}
+        k1, b = self.k1, self.b
+        norm = k1 / self.avg_doc_length
+        doc_lengths = self._doc_lengths
+
+        for term in set(tokenize(query)):
+            pairs = self.postings(term)
+            df = len(pairs) // 2
+            if not df:
+                continue
+            idf = math.log(1 + (self.documents - df + 0.5) / (df + 0.5))
+            for i in range(0, len(pairs), 2):
+                doc_id, tf = pairs[i], pairs[i + 1]
+                denominator = tf + k1 * (1 - b) + norm * b * doc_lengths[doc_id]
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (k1 + 1) / denominator
+
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(*self.document(doc_id), score) for doc_id, score in best]
+
+    def close(self) -> None:
+        """Release the memory maps."""
+        for view in (self._doc_offsets, self._doc_lengths, self._term_offsets,
+                     self._posting_offsets, self._postings):
+            view.release()
+        for mapped in self._maps.values():
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+def main(argv: List[str]) -> int:
+    if len(argv) == 4 and argv[1] == 'build':
+        meta = build_index(argv[2], argv[3])
+        print(f"Indexed {meta['documents']} articles, {meta['terms']} terms -> {argv[3]}")
+        return 0
+    if len(argv) >= 4 and argv[1] == 'search':
+        index = LocalIndex(argv[2])
+        for title, lead, score in index.search(' '.join(argv[3:])):
+            print(f"{score:7.3f}  {title} — {lead[:80]}")
+        return 0
+    print(__doc__)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
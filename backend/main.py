@@ -1,15 +1,49 @@
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from search import router as search_router
-from pathlib import Path
+from contextlib import asynccontextmanager
+from search import (router as search_router, close_client, result_cache, search_flight, upstream_flight,
+                    upstream_client, governor, admission, rule_stats, article_summaries, query_log,
+                    warm_query, SEARCH_MODE)
+from cache import run_compaction
+from variant_stats import run_persistence
+from warmup import WARMUP_TOP, load_snapshot, run_saver, run_warmup, save_snapshot, warmup_stats
+from suggest import router as suggest_router, load_title_index
+from metrics import MetricsMiddleware, render_metrics
+from static_assets import AssetStore
+import asyncio
+
+# Frontend files, minified and precompressed in memory at startup
+frontend_assets = AssetStore()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup/shutdown hooks."""
+    load_title_index()
+    frontend_assets.load()
+    load_snapshot(result_cache)
+    # Warm-up runs in the background; /health answers right away
+    warmup = asyncio.create_task(run_warmup(query_log.top(WARMUP_TOP), warm_query))
+    compaction = asyncio.create_task(run_compaction(result_cache))
+    article_compaction = asyncio.create_task(run_compaction(article_summaries.cache))
+    persistence = asyncio.create_task(run_persistence(rule_stats))
+    saver = asyncio.create_task(run_saver(query_log, result_cache))
+    yield
+    for task in (warmup, compaction, article_compaction, persistence, saver):
+        task.cancel()
+    await close_client()
+    save_snapshot(result_cache)
+    result_cache.close()
+    rule_stats.save()
+    query_log.save()
 
 app = FastAPI(
     title="Upsum Backend", 
     description="API for Upsum — Project Nexus", 
     version="1.0.0",
     docs_url="/api/docs",
-    redoc_url="/api/redoc"
+    redoc_url="/api/redoc",
+    lifespan=lifespan
 )
 
 # Configure CORS for remote access
@@ -29,7 +63,11 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+# Request latency histograms and opt-in X-Upsum-Trace stage breakdowns
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(search_router)
+app.include_router(suggest_router)
 
 @app.get("/health")
 def health_check():
@@ -43,11 +81,26 @@ def health_check():
             "Natural Input Language (NIL)",
             "Definiteness normalization",
             "Compound word handling"
-        ]
+        ],
+        "search_mode": SEARCH_MODE,
+        "cache": result_cache.stats(),
+        "coalescing": {
+            "searches": search_flight.stats(),
+            "upstream": upstream_flight.stats()
+        },
+        "upstream": upstream_client.stats(),
+        "governor": governor.stats(),
+        "admission": admission.stats(),
+        "articles": article_summaries.stats(),
+        "warmup": warmup_stats
     })
 
+@app.get("/metrics")
+def metrics():
+    """Prometheus metrics for this worker."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
-def serve_frontend():
-    """Serve the frontend HTML file."""
-    frontend_path = Path(__file__).parent.parent / "frontend" / "frontend.html"
-    return FileResponse(frontend_path)
+def serve_frontend(request: Request):
+    """Serve the frontend HTML from memory (precompressed, with ETag)."""
+    return frontend_assets.response(request, "frontend.html")
@@ -0,0 +1,204 @@
+"""
+Low-overhead metrics and per-request stage tracing.
+
+Counters and histograms live in process memory and are rendered in the
+Prometheus text format by /metrics. Each gunicorn worker keeps its own
+values, so scrape every worker or aggregate by instance.
+
+Code under measurement wraps a stage with `with stage("name"):`. The
+duration goes into the upsum_stage_seconds histogram and, when the client
+sent `X-Upsum-Trace: 1`, into that request's trace. The trace is returned
+in the `X-Upsum-Trace` and `Server-Timing` response headers.
+"""
+
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from cache hits to a stalled upstream call
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10, 15, 20)
+
+TRACE_HEADER = "x-upsum-trace"
+
+_registry: List["Metric"] = []
+_trace: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("upsum_trace", default=None)
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class Metric:
+    """Base for registered metrics."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        _registry.append(self)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(Metric):
+    """Monotonic counter with optional labels."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for label_values, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value:g}")
+        return lines
+
+class Gauge(Metric):
+    """Value that goes up and down, with optional labels."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self.values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def dec(self, *label_values: str, amount: float = 1.0) -> None:
+        self.inc(*label_values, amount=-amount)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for label_values, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value:g}")
+        return lines
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram with optional labels."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        # Per label set: [count per bucket (+Inf last)], sum
+        self.values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        entry = self.values.get(label_values)
+        if entry is None:
+            entry = self.values[label_values] = ([0] * (len(self.buckets) + 1), [0.0])
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1][0] += value
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for label_values, (counts, total) in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                labels = _format_labels(self.labels, label_values, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, label_values)} {total[0]:g}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, label_values)} {cumulative}")
+        return lines
+
+def render_metrics() -> str:
+    """All registered metrics in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# --- Metrics used across the backend -----------------------------------------
+
+REQUEST_SECONDS = Histogram("upsum_http_request_seconds", "HTTP request latency by route.", ("route", "status"))
+STAGE_SECONDS = Histogram("upsum_stage_seconds", "Time spent per search stage.", ("stage",))
+QUERY_VARIANTS = Histogram("upsum_query_variants", "Query variants produced per search.", buckets=COUNT_BUCKETS)
+VARIANTS_FETCHED = Histogram("upsum_query_variants_fetched", "Query variants sent upstream per search.",
+                             buckets=COUNT_BUCKETS)
+UPSTREAM_REQUESTS = Counter("upsum_upstream_requests_total", "MediaWiki API calls by kind and HTTP status.",
+                            ("kind", "status"))
+CACHE_LOOKUPS = Counter("upsum_cache_lookups_total", "Result cache lookups by outcome.", ("result",))
+UPSTREAM_QUEUE_DEPTH = Gauge("upsum_upstream_queue_depth", "MediaWiki calls waiting for the governor.",
+                             ("priority",))
+UPSTREAM_QUEUE_WAIT = Histogram("upsum_upstream_queue_wait_seconds", "Time MediaWiki calls waited for the governor.",
+                                ("priority",))
+UPSTREAM_IN_FLIGHT = Gauge("upsum_upstream_in_flight", "MediaWiki calls in flight from this worker.")
+ADMISSIONS = Counter("upsum_search_admissions_total",
+                     "Searches needing upstream work, by admission outcome (admitted, queued, shed, expired).",
+                     ("result",))
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block as a search stage (histogram + opt-in request trace)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, name)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((name, elapsed))
+
+def format_trace(trace: List[Tuple[str, float]]) -> Tuple[str, str]:
+    """(X-Upsum-Trace, Server-Timing) header values for a trace."""
+    totals: Dict[str, List[float]] = {}
+    for name, elapsed in trace:
+        totals.setdefault(name, []).append(elapsed)
+    upsum = ";".join(f"{name}={sum(times) * 1000:.2f}ms/{len(times)}" for name, times in totals.items())
+    server_timing = ", ".join(f'{name};dur={sum(times) * 1000:.2f}' for name, times in totals.items())
+    return upsum, server_timing
+
+class MetricsMiddleware:
+    """ASGI middleware recording request latency and answering trace requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = None
+        if any(name == TRACE_HEADER.encode() and value == b"1" for name, value in scope["headers"]):
+            trace = []
+        token = _trace.set(trace)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if trace is not None:
+                    upsum, server_timing = format_trace(trace)
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-upsum-trace", upsum.encode()))
+                    headers.append((b"server-timing", server_timing.encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _trace.reset(token)
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(time.perf_counter() - start,
+                                    getattr(route, "path", "other"), str(status))
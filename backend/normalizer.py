@@ -0,0 +1,234 @@
+"""
+Swedish query normalization (Natural Input Language).
+
+The rule tables below are compiled once at import: question prefixes into a
+single anchored alternation, definite suffixes into a reversed-character
+trie and compound hints into one lookahead scan. Results are memoized per
+input string.
+
+When a lemma table (lemmas.py) is available, single-word queries get their
+real base forms from it instead of the DEFINITE_SUFFIXES guesses.
+
+When a spelling index (spelling.py) is available, a query with misspelled
+words ("stokholm") also gets a corrected variant ("stockholm"), placed
+right after the original so it is fetched first; words the lemma table
+knows are never corrected.
+
+Each variant is tagged with the rule that produced it (RULES), so the
+search layer can measure which rules find new results.
+"""
+
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from lemmas import LemmaTable, load_lemma_table
+from spelling import SpellingIndex, load_spelling_index
+
+# Swedish linguistic patterns
+SWEDISH_DEFINITENESS = {
+    'en': '',   # en bil -> bil
+    'ett': '',  # ett hus -> hus
+    'den': '',  # den stora bilen -> stora bilen
+    'det': '',  # det stora huset -> stora huset
+    'de': '',   # de stora bilarna -> stora bilarna
+}
+
+# Common Swedish suffixes for definiteness
+DEFINITE_SUFFIXES = ['en', 'et', 'n', 't', 'a', 'na', 'orna', 'erna', 'arna']
+
+# Swedish question words and natural language patterns
+QUESTION_PATTERNS = [
+    (r'^vad är\s+', ''),           # "vad är Stockholm" -> "Stockholm"
+    (r'^vem är\s+', ''),           # "vem är Gustav Vasa" -> "Gustav Vasa"
+    (r'^var ligger\s+', ''),        # "var ligger Stockholm" -> "Stockholm"
+    (r'^när grundades\s+', ''),    # "när grundades Sverige" -> "Sverige"
+    (r'^hur fungerar\s+', ''),      # "hur fungerar" -> direct search
+    (r'^varför\s+', ''),           # "varför" -> keep as is
+    (r'^beskriv\s+', ''),           # "beskriv Stockholm" -> "Stockholm"
+    (r'^förklara\s+', ''),         # "förklara kvantfysik" -> "kvantfysik"
+    (r'^vad betyder\s+', ''),       # "vad betyder" -> term
+]
+
+# Common Swedish compound word patterns for splitting hints
+COMPOUND_HINTS = [
+    'historia',  # Sveriges historia
+    'stad',      # Stockholm stad
+    'landet',    # Sverige landet
+    'kung',      # Gustav kung
+]
+
+# Rule tags, in the order the rules run
+RULES = ('original', 'spelling', 'question', 'article', 'lemma', 'suffix', 'compound', 'capitalize')
+
+# Stripped from words before spelling correction ("stokholm?" -> "stokholm")
+TRAILING_PUNCTUATION = '?!.,;:"\''
+
+# Memoized normalizations kept per worker
+NORMALIZE_CACHE_SIZE = 8192
+
+# One anchored alternation; alternatives are tried in QUESTION_PATTERNS order,
+# so the first listed pattern that matches wins, as with a per-pattern loop
+QUESTION_RE = re.compile(
+    '|'.join(f'(?:{pattern})' for pattern, _ in QUESTION_PATTERNS),
+    re.IGNORECASE
+)
+
+# Compound hints located in one pass; the lookahead also finds overlapping hints
+COMPOUND_RE = re.compile('(?=(' + '|'.join(re.escape(hint) for hint in COMPOUND_HINTS) + '))')
+
+def _build_suffix_trie(suffixes: List[str]) -> Dict:
+    """Trie over reversed suffixes; terminal nodes carry the suffix position."""
+    trie: Dict = {}
+    for position, suffix in enumerate(suffixes):
+        node = trie
+        for ch in reversed(suffix):
+            node = node.setdefault(ch, {})
+        node[None] = position
+    return trie
+
+SUFFIX_TRIE = _build_suffix_trie(DEFINITE_SUFFIXES)
+
+# Inflection lookup replacing suffix guessing; None falls back to DEFINITE_SUFFIXES
+lemma_table: Optional[LemmaTable] = load_lemma_table()
+
+# Symmetric-delete index for correcting misspelled words; None disables correction
+spelling_index: Optional[SpellingIndex] = load_spelling_index()
+
+def set_lemma_table(table: Optional[LemmaTable]) -> None:
+    """Swap the lemma table (None restores suffix guessing) and drop memoized results."""
+    global lemma_table
+    lemma_table = table
+    _normalize.cache_clear()
+
+def set_spelling_index(index: Optional[SpellingIndex]) -> None:
+    """Swap the spelling index (None disables correction) and drop memoized results."""
+    global spelling_index
+    spelling_index = index
+    _normalize.cache_clear()
+
+def correct_spelling(words: List[str]) -> Optional[str]:
+    """The words (punctuation stripped) with misspellings corrected, or None if none were found."""
+    corrected = []
+    changed = False
+    for word in words:
+        word = word.strip(TRAILING_PUNCTUATION)
+        fixed = None
+        if word and (lemma_table is None or not lemma_table.lookup(word)):
+            fixed = spelling_index.correct(word)
+        changed = changed or fixed is not None
+        corrected.append(fixed or word)
+    return ' '.join(word for word in corrected if word) if changed else None
+
+def matching_suffixes(word: str) -> List[str]:
+    """DEFINITE_SUFFIXES that word ends with, in list order."""
+    positions = []
+    node = SUFFIX_TRIE
+    for ch in reversed(word):
+        node = node.get(ch)
+        if node is None:
+            break
+        if None in node:
+            positions.append(node[None])
+    return [DEFINITE_SUFFIXES[position] for position in sorted(positions)]
+
+@lru_cache(maxsize=NORMALIZE_CACHE_SIZE)
+def _normalize(query: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """(variants, rule tag per variant) for a query."""
+    variants = [query]  # Always include original
+    rules = ['original']
+    seen: Set[str] = {query}
+    normalized = query.lower().strip()
+
+    def add(variant: str, rule: str) -> None:
+        if variant not in seen:
+            seen.add(variant)
+            variants.append(variant)
+            rules.append(rule)
+
+    # Corrected spelling first: when it applies, the original usually finds little
+    if spelling_index is not None:
+        corrected = correct_spelling(QUESTION_RE.sub('', normalized, count=1).split())
+        if corrected:
+            add(corrected, 'spelling')
+
+    # Remove question patterns (NIL - Natural Input Language)
+    match = QUESTION_RE.match(normalized)
+    if match:
+        cleaned = normalized[match.end():].strip()
+        if cleaned:
+            add(cleaned, 'question')
+        normalized = cleaned
+
+    words = normalized.split()
+
+    # Remove leading articles
+    if len(words) > 1 and words[0] in SWEDISH_DEFINITENESS:
+        add(' '.join(words[1:]), 'article')
+
+    # Handle definite forms: base forms from the lemma table when loaded,
+    # otherwise guessed by removing suffixes
+    if len(words) == 1 and lemma_table is not None:
+        for lemma in lemma_table.lookup(words[0]):
+            if lemma != words[0]:
+                add(lemma, 'lemma')
+    elif len(words) == 1 and len(words[0]) > 4:
+        base_word = words[0]
+        for suffix in matching_suffixes(base_word):
+            if len(base_word) > len(suffix) + 2:
+                indefinite = base_word[:-len(suffix)]
+                if len(indefinite) > 2:
+                    add(indefinite, 'suffix')
+
+    # Add compound word variants
+    if len(words) > 1:
+        found = {m.group(1) for m in COMPOUND_RE.finditer(normalized)}
+        for hint in COMPOUND_HINTS:
+            if hint in found:
+                without_hint = normalized.replace(hint, '').strip()
+                if without_hint:
+                    add(without_hint, 'compound')
+
+    # Capitalize proper nouns (Swedish convention)
+    if words:
+        add(' '.join(word.capitalize() for word in words), 'capitalize')
+
+    return tuple(variants), tuple(rules)
+
+def normalize_swedish_query(query: str) -> List[str]:
+    """
+    Normalize Swedish input using linguistic rules.
+    Returns multiple query variants for better search coverage.
+    
+    Args:
+        query: Raw Swedish query
+    
+    Returns:
+        List of normalized query variants
+    """
+    return list(_normalize(query)[0])
+
+def normalize_with_rules(query: str) -> List[Tuple[str, str]]:
+    """
+    Like normalize_swedish_query, with the rule that produced each variant.
+
+    Args:
+        query: Raw Swedish query
+
+    Returns:
+        (variant, rule) pairs in variant order; rules are from RULES
+    """
+    variants, rules = _normalize(query)
+    return list(zip(variants, rules))
+
+def normalize_batch(queries: Iterable[str]) -> List[List[str]]:
+    """
+    Normalize many queries at once.
+
+    Args:
+        queries: Raw Swedish queries
+
+    Returns:
+        One variant list per query, in input order
+    """
+    return [list(_normalize(query)[0]) for query in queries]
@@ -0,0 +1,50 @@
+"""
+Small JSON state files shared by all workers on a host.
+
+update_json() reads a file, applies a change and writes it back atomically
+while holding an exclusive flock on "<path>.lock", so workers saving at the
+same time don't lose each other's updates.
+"""
+
+import json
+import os
+from typing import Any, Callable, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: concurrent saves from several workers may lose updates
+    fcntl = None
+
+def read_json(path: str) -> Optional[Any]:
+    """Parsed file contents, or None if the file does not exist."""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+def write_json(path: str, data: Any) -> None:
+    """Write data to path atomically (temporary file + rename)."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def update_json(path: str, update: Callable[[Optional[Any]], Any]) -> Any:
+    """
+    Read-modify-write a JSON file under an exclusive lock.
+
+    Args:
+        path: JSON file
+        update: Receives the current contents (None if missing), returns the new contents
+
+    Returns:
+        The contents written
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path + '.lock', 'w') as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        data = update(read_json(path))
+        write_json(path, data)
+    return data
@@ -1,107 +1,88 @@
-from fastapi import APIRouter, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+import asyncio
+import httpx
+import json
+import os
 import requests
 import re
-from typing import List, Dict, Set
+import time
+from contextlib import nullcontext
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Dict, Optional, Set, Tuple
+
+from admission import Admission, Overloaded
+from articles import ARTICLE_BATCH, ArticleSummaries
+from cache import cache_key, create_cache
+from coalesce import SingleFlight
+from governor import FALLBACK, PRIMARY, SECONDARY, Governor, UpstreamBusy, background
+from http_cache import cached_response, json_response
+from local_index import LocalIndex, tokenize
+from normalizer import normalize_swedish_query, normalize_with_rules
+from metrics import CACHE_LOOKUPS, QUERY_VARIANTS, UPSTREAM_REQUESTS, VARIANTS_FETCHED, stage
+from upstream import (MAX_TIMEOUT, SEARCH_DEADLINE, ResilientClient, UpstreamUnavailable, request_deadline,
+                      time_left)
+from variant_stats import RuleStats
+from warmup import QueryLog
 
 router = APIRouter()
 
-# Swedish Wikipedia API endpoint
-WIKI_API = "https://sv.wikipedia.org/w/api.php"
+# Swedish Wikipedia API endpoint (overridable, e.g. to point at fake_wikipedia.py)
+WIKI_API = os.getenv("UPSUM_WIKI_API", "https://sv.wikipedia.org/w/api.php")
 
 # User-Agent header required by Wikipedia API
 HEADERS = {
     'User-Agent': 'Upsum/1.0 (https://oscyra.solutions/upsum; alex@oscyra.solutions) Python/requests'
 }
 
-# Swedish linguistic patterns
-SWEDISH_DEFINITENESS = {
-    'en': '',   # en bil -> bil
-    'ett': '',  # ett hus -> hus
-    'den': '',  # den stora bilen -> stora bilen
-    'det': '',  # det stora huset -> stora huset
-    'de': '',   # de stora bilarna -> stora bilarna
-}
+# "api" (MediaWiki only), "local" (dump index only) or
+# "local-first" (dump index, MediaWiki when the index finds nothing)
+SEARCH_MODE = os.getenv("UPSUM_SEARCH_MODE", "api")
+INDEX_PATH = os.getenv("UPSUM_INDEX_PATH", os.path.join(os.path.dirname(__file__), "data", "index"))
+_local_index: Optional[LocalIndex] = None
 
-# Common Swedish suffixes for definiteness
-DEFINITE_SUFFIXES = ['en', 'et', 'n', 't', 'a', 'na', 'orna', 'erna', 'arna']
-
-# Swedish question words and natural language patterns
-QUESTION_PATTERNS = [
-    (r'^vad är\s+', ''),           # "vad är Stockholm" -> "Stockholm"
-    (r'^vem är\s+', ''),           # "vem är Gustav Vasa" -> "Gustav Vasa"
-    (r'^var ligger\s+', ''),        # "var ligger Stockholm" -> "Stockholm"
-    (r'^när grundades\s+', ''),    # "när grundades Sverige" -> "Sverige"
-    (r'^hur fungerar\s+', ''),      # "hur fungerar" -> direct search
-    (r'^varför\s+', ''),           # "varför" -> keep as is
-    (r'^beskriv\s+', ''),           # "beskriv Stockholm" -> "Stockholm"
-    (r'^förklara\s+', ''),         # "förklara kvantfysik" -> "kvantfysik"
-    (r'^vad betyder\s+', ''),       # "vad betyder" -> term
-]
-
-# Common Swedish compound word patterns for splitting hints
-COMPOUND_HINTS = [
-    'historia',  # Sveriges historia
-    'stad',      # Stockholm stad
-    'landet',    # Sverige landet
-    'kung',      # Gustav kung
-]
-
-def normalize_swedish_query(query: str) -> List[str]:
-    """
-    Normalize Swedish input using linguistic rules.
-    Returns multiple query variants for better search coverage.
-    
-    Args:
-        query: Raw Swedish query
-    
-    Returns:
-        List of normalized query variants
-    """
-    variants = [query]  # Always include original
-    normalized = query.lower().strip()
-    
-    # Remove question patterns (NIL - Natural Input Language)
-    for pattern, replacement in QUESTION_PATTERNS:
-        if re.match(pattern, normalized, re.IGNORECASE):
-            cleaned = re.sub(pattern, replacement, normalized, flags=re.IGNORECASE).strip()
-            if cleaned and cleaned not in variants:
-                variants.append(cleaned)
-            normalized = cleaned
-            break
-    
-    # Remove articles and definiteness markers
-    words = normalized.split()
-    if len(words) > 1:
-        # Remove leading articles
-        if words[0] in SWEDISH_DEFINITENESS:
-            article_removed = ' '.join(words[1:])
-            if article_removed not in variants:
-                variants.append(article_removed)
-    
-    # Handle definite forms (remove suffixes)
-    if len(words) == 1 and len(words[0]) > 4:
-        base_word = words[0]
-        for suffix in DEFINITE_SUFFIXES:
-            if base_word.endswith(suffix) and len(base_word) > len(suffix) + 2:
-                indefinite = base_word[:-len(suffix)]
-                if indefinite not in variants and len(indefinite) > 2:
-                    variants.append(indefinite)
-    
-    # Add compound word variants
-    for hint in COMPOUND_HINTS:
-        if hint in normalized and len(words) > 1:
-            without_hint = normalized.replace(hint, '').strip()
-            if without_hint and without_hint not in variants:
-                variants.append(without_hint)
-    
-    # Capitalize proper nouns (Swedish convention)
-    if len(words) > 0:
-        capitalized = ' '.join(word.capitalize() for word in words)
-        if capitalized not in variants:
-            variants.append(capitalized)
-    
-    return variants
+# Pooled async HTTP client shared by all requests in this worker, behind
+# adaptive timeouts, hedging and a circuit breaker (see upstream.py)
+UPSTREAM_TIMEOUT = MAX_TIMEOUT
+UPSTREAM_LIMITS = httpx.Limits(max_connections=50, max_keepalive_connections=20)
+_client: Optional[httpx.AsyncClient] = None
+upstream_client = ResilientClient()
+
+# Host-wide concurrency and rate limit for MediaWiki calls, by priority (see governor.py)
+governor = Governor()
+
+# Bounded searches needing upstream work per worker (/search misses, /search/stream,
+# /search/batch); the rest queue briefly or get a 503 (see admission.py)
+admission = Admission()
+
+# Result cache in front of search_wikipedia_async, plus pending background refreshes
+result_cache = create_cache()
+_refresh_tasks: Dict[str, asyncio.Task] = {}
+
+# /search/batch: upstream calls in flight per batch, and the size from which responses stream
+BATCH_CONCURRENCY = int(os.getenv("UPSUM_BATCH_CONCURRENCY", "8"))
+BATCH_STREAM_THRESHOLD = 50
+MAX_BATCH_QUERIES = 1000
+
+# Search frequency per cache key, for warming the cache at startup
+query_log = QueryLog()
+
+# Which normalizer rules find new results; decides the variants sent upstream
+rule_stats = RuleStats()
+
+# Per-title article summaries for /articles and /search?summaries=1
+article_summaries = ArticleSummaries(lambda params: upstream_get('articles', params, SECONDARY))
+
+# Single-flight groups: whole searches by cache key, upstream calls by parameters
+search_flight = SingleFlight()
+upstream_flight = SingleFlight()
+
+class PartialResults(list):
+    """Results missing some variants (upstream error, open breaker or deadline); never cached."""
+
+def cacheable(results: List[Dict[str, str]]) -> bool:
+    """Whether results are complete and non-empty, i.e. worth caching."""
+    return bool(results) and not isinstance(results, PartialResults)
 
 def clean_html(text: str) -> str:
     """Remove HTML tags from text."""
@@ -119,10 +100,132 @@ def clean_snippet(text: str, max_length: int = 200) -> str:
     
     return text
 
+def wiki_url(title: str) -> str:
+    """Build the Swedish Wikipedia article URL for a title."""
+    return f"https://sv.wikipedia.org/wiki/{title.replace(' ', '_')}"
+
+def search_params(variant: str, srlimit: int) -> Dict[str, Any]:
+    """MediaWiki list=search parameters for one query variant."""
+    return {
+        'action': 'query',
+        'format': 'json',
+        'list': 'search',
+        'srsearch': variant,
+        'srlimit': srlimit,
+        'srprop': 'snippet',
+        'utf8': 1
+    }
+
+def opensearch_params(search: str, limit: int) -> Dict[str, Any]:
+    """MediaWiki opensearch parameters for the fallback lookup."""
+    return {
+        'action': 'opensearch',
+        'search': search,
+        'limit': limit,
+        'namespace': 0,
+        'format': 'json'
+    }
+
+def collect_search_hits(search_results: List[Dict[str, Any]], results: List[Dict[str, str]],
+                        seen_titles: Set[str], limit: int) -> None:
+    """Append list=search hits to results, skipping titles already seen."""
+    with stage('clean_snippets'):
+        for result in search_results:
+            if len(results) >= limit:
+                break
+
+            title = result.get('title', '')
+            
+            # Skip duplicates
+            if title in seen_titles:
+                continue
+            
+            seen_titles.add(title)
+            snippet = clean_html(result.get('snippet', 'Läs mer på Wikipedia'))
+            
+            results.append({
+                'title': title,
+                'snippet': clean_snippet(snippet),
+                'url': wiki_url(title)
+            })
+
+def collect_opensearch_hits(data: List[Any], results: List[Dict[str, str]],
+                            seen_titles: Set[str]) -> None:
+    """Append opensearch hits ([query, titles, descriptions, urls]) to results."""
+    titles = data[1] if len(data) > 1 else []
+    descriptions = data[2] if len(data) > 2 else []
+    urls = data[3] if len(data) > 3 else []
+    
+    with stage('clean_snippets'):
+        for i, title in enumerate(titles):
+            if title in seen_titles:
+                continue
+            
+            seen_titles.add(title)
+            snippet = descriptions[i] if i < len(descriptions) and descriptions[i] else 'Läs mer på Wikipedia'
+            url = urls[i] if i < len(urls) else wiki_url(title)
+            
+            results.append({
+                'title': title,
+                'snippet': clean_snippet(snippet),
+                'url': url
+            })
+
+def get_local_index() -> Optional[LocalIndex]:
+    """Return the memory-mapped dump index, or None if it has not been built."""
+    global _local_index
+    if _local_index is None and os.path.exists(os.path.join(INDEX_PATH, 'meta.json')):
+        _local_index = LocalIndex(INDEX_PATH)
+    return _local_index
+
+def search_local(query_variants: List[str], limit: int) -> List[Dict[str, str]]:
+    """
+    Search the local dump index with each variant in priority order.
+    
+    Variants that tokenize to the same terms as an earlier one are skipped,
+    since BM25 would rank them identically.
+    
+    Returns:
+        List of dictionaries containing title, snippet, and url
+    """
+    results: List[Dict[str, str]] = []
+    index = get_local_index()
+    if index is None:
+        print(f"[Local] No index at {INDEX_PATH}")
+        return results
+    
+    seen_titles: Set[str] = set()
+    seen_terms: Set[frozenset] = set()
+    for variant in query_variants:
+        if len(results) >= limit:
+            break
+        terms = frozenset(tokenize(variant))
+        if not terms or terms in seen_terms:
+            continue
+        seen_terms.add(terms)
+        
+        for title, lead, _ in index.search(variant, limit):
+            if len(results) >= limit:
+                break
+            if title in seen_titles:
+                continue
+            seen_titles.add(title)
+            results.append({
+                'title': title,
+                'snippet': clean_snippet(lead),
+                'url': wiki_url(title)
+            })
+    
+    return results
+
 def search_wikipedia(query: str, limit: int = 10) -> List[Dict[str, str]]:
     """
     Search Swedish Wikipedia using MediaWiki API with Swedish NLP preprocessing.
     
+    Blocking variant that queries one variant at a time. The /search route
+    uses search_wikipedia_async instead. Honours UPSUM_SEARCH_MODE like the
+    async path, and stops starting calls after UPSUM_SEARCH_DEADLINE.
+    
     Args:
         query: Search query in Swedish
         limit: Maximum number of results to return
@@ -132,97 +235,439 @@ def search_wikipedia(query: str, limit: int = 10) -> List[Dict[str, str]]:
     """
     results = []
     seen_titles: Set[str] = set()
+    deadline = time.monotonic() + SEARCH_DEADLINE
     
     # Generate query variants using Swedish linguistic rules
     query_variants = normalize_swedish_query(query)
     print(f"[NLP] Query variants: {query_variants}")
     
+    if SEARCH_MODE in ('local', 'local-first'):
+        results = search_local(query_variants, limit)
+        if results or SEARCH_MODE == 'local':
+            return results
+    
     try:
-        # Try each query variant
+        # Try each query variant until the deadline
         for variant in query_variants:
-            if len(results) >= limit:
+            remaining = deadline - time.monotonic()
+            if len(results) >= limit or remaining <= 0:
                 break
             
-            # Search API
-            params = {
-                'action': 'query',
-                'format': 'json',
-                'list': 'search',
-                'srsearch': variant,
-                'srlimit': limit - len(results),
-                'srprop': 'snippet',
-                'utf8': 1
-            }
-            
-            response = requests.get(WIKI_API, params=params, headers=HEADERS, timeout=10)
+            params = search_params(variant, limit - len(results))
+            with governor.limits.blocking(remaining):
+                response = requests.get(WIKI_API, params=params, headers=HEADERS,
+                                        timeout=min(UPSTREAM_TIMEOUT, deadline - time.monotonic()))
             
             if response.status_code == 200:
                 data = response.json()
-                search_results = data.get('query', {}).get('search', [])
-                
-                for result in search_results:
-                    title = result.get('title', '')
-                    
-                    # Skip duplicates
-                    if title in seen_titles:
-                        continue
-                    
-                    seen_titles.add(title)
-                    snippet = clean_html(result.get('snippet', 'Läs mer på Wikipedia'))
-                    
-                    # Construct Wikipedia URL
-                    url = f"https://sv.wikipedia.org/wiki/{title.replace(' ', '_')}"
-                    
-                    results.append({
-                        'title': title,
-                        'snippet': clean_snippet(snippet),
-                        'url': url
-                    })
-                    
-                    if len(results) >= limit:
-                        break
+                collect_search_hits(data.get('query', {}).get('search', []), results, seen_titles, limit)
         
         # If no results, try opensearch API with first variant
-        if not results and query_variants:
-            opensearch_params = {
-                'action': 'opensearch',
-                'search': query_variants[0],
-                'limit': limit,
-                'namespace': 0,
-                'format': 'json'
-            }
-            
-            response = requests.get(WIKI_API, params=opensearch_params, headers=HEADERS, timeout=10)
+        remaining = deadline - time.monotonic()
+        if not results and query_variants and remaining > 0:
+            params = opensearch_params(query_variants[0], limit)
+            with governor.limits.blocking(remaining):
+                response = requests.get(WIKI_API, params=params, headers=HEADERS,
+                                        timeout=min(UPSTREAM_TIMEOUT, deadline - time.monotonic()))
             
             if response.status_code == 200:
-                data = response.json()
-                titles = data[1] if len(data) > 1 else []
-                descriptions = data[2] if len(data) > 2 else []
-                urls = data[3] if len(data) > 3 else []
-                
-                for i, title in enumerate(titles):
-                    if title in seen_titles:
-                        continue
-                    
-                    seen_titles.add(title)
-                    snippet = descriptions[i] if i < len(descriptions) and descriptions[i] else 'Läs mer på Wikipedia'
-                    url = urls[i] if i < len(urls) else f"https://sv.wikipedia.org/wiki/{title.replace(' ', '_')}"
-                    
-                    results.append({
-                        'title': title,
-                        'snippet': clean_snippet(snippet),
-                        'url': url
-                    })
+                collect_opensearch_hits(response.json(), results, seen_titles)
         
-    except requests.RequestException as e:
+    except (requests.RequestException, UpstreamBusy) as e:
         print(f"Wikipedia API error: {e}")
     except Exception as e:
         print(f"Search error: {e}")
     
     return results
 
+def get_client() -> httpx.AsyncClient:
+    """Return the worker's pooled async client, creating it on first use."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(headers=HEADERS, timeout=UPSTREAM_TIMEOUT, limits=UPSTREAM_LIMITS)
+    return _client
+
+async def close_client() -> None:
+    """Close the pooled async client (called on application shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def upstream_get(kind: str, params: Dict[str, Any], priority: int = PRIMARY) -> httpx.Response:
+    """
+    GET the MediaWiki API through the governor, timed as an upstream_<kind>
+    stage and counted by status.
+    """
+    try:
+        async with governor.slot(priority):
+            with stage(f'upstream_{kind}'):
+                response = await upstream_client.get(get_client(), WIKI_API, params, governor.spare_slot)
+    except UpstreamBusy:
+        UPSTREAM_REQUESTS.inc(kind, 'throttled')
+        raise
+    except UpstreamUnavailable:
+        UPSTREAM_REQUESTS.inc(kind, 'circuit_open')
+        raise
+    except httpx.TimeoutException:
+        UPSTREAM_REQUESTS.inc(kind, 'timeout')
+        raise
+    except httpx.HTTPError:
+        UPSTREAM_REQUESTS.inc(kind, 'error')
+        raise
+    UPSTREAM_REQUESTS.inc(kind, str(response.status_code))
+    return response
+
+async def fetch_variant(variant: str, limit: int, priority: int = SECONDARY) -> List[Dict[str, Any]]:
+    """Fetch raw list=search hits for a single query variant (coalesced)."""
+    async def fetch() -> List[Dict[str, Any]]:
+        response = await upstream_get('search', search_params(variant, limit), priority)
+        if response.status_code != 200:
+            return []
+        return response.json().get('query', {}).get('search', [])
+    
+    return await upstream_flight.do(('search', variant, limit), fetch)
+
+async def fetch_opensearch(search: str, limit: int) -> List[Any]:
+    """Fetch the raw opensearch payload for the fallback lookup (coalesced)."""
+    async def fetch() -> List[Any]:
+        response = await upstream_get('opensearch', opensearch_params(search, limit), FALLBACK)
+        if response.status_code != 200:
+            return []
+        return response.json()
+    
+    return await upstream_flight.do(('opensearch', search, limit), fetch)
+
+def merge_in_variant_order(hits: List[Optional[List[Dict[str, Any]]]], limit: int,
+                           rules: Optional[List[str]] = None) -> Tuple[List[Dict[str, str]], bool]:
+    """
+    Merge per-variant list=search hits in variant order, deduplicated by title.
+    
+    Args:
+        hits: Raw hits per variant in priority order; None for a fetch that
+            has not completed (or failed)
+        limit: Maximum number of results
+        rules: Normalizer rule per variant; when given, each completed fetch
+            is credited in rule_stats with the new results it added
+    
+    Returns:
+        (results, settled): settled is False while a missing variant could
+        still change the results
+    """
+    results: List[Dict[str, str]] = []
+    seen_titles: Set[str] = set()
+    settled = True
+    for index, variant_hits in enumerate(hits):
+        if variant_hits is None:
+            settled = settled and len(results) >= limit
+            continue
+        found = len(results)
+        if found < limit:
+            collect_search_hits(variant_hits, results, seen_titles, limit)
+        if rules is not None:
+            rule_stats.record(rules[index], len(results) - found)
+    return results, settled
+
+async def merge_variant_fetches(query_variants: List[str], fetches: List[Awaitable[List[Dict[str, Any]]]],
+                                limit: int, rules: Optional[List[str]] = None) -> List[Dict[str, str]]:
+    """
+    Await per-variant list=search fetches and merge them in variant order.
+    
+    Falls back to opensearch with the first variant when nothing was found.
+    Under a request deadline, variants still running when it passes are
+    dropped and whatever has arrived is returned as PartialResults.
+    
+    Args:
+        query_variants: Variants in priority order
+        fetches: One awaitable of raw hits per variant, same order
+        limit: Maximum number of results to return
+        rules: Normalizer rule per variant; when given, each completed fetch
+            is credited in rule_stats with the new results it added
+    
+    Returns:
+        List of dictionaries containing title, snippet, and url
+    """
+    results: List[Dict[str, str]] = []
+    partial = False
+    tasks = [asyncio.ensure_future(fetch) for fetch in fetches]
+    
+    try:
+        pending: Set[asyncio.Future] = set()
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=time_left())
+        if pending:
+            print(f"[Upstream] Deadline passed with {len(pending)} of {len(tasks)} variants pending")
+            partial = True
+        
+        hits: List[Optional[List[Dict[str, Any]]]] = []
+        for task in tasks:
+            if task in pending:
+                hits.append(None)
+            elif task.cancelled() or task.exception() is not None:
+                # Cancelled: a shared fetch whose batch was abandoned
+                print(f"Wikipedia API error: {'cancelled' if task.cancelled() else task.exception()}")
+                partial = True
+                hits.append(None)
+            else:
+                hits.append(task.result())
+        results, _ = merge_in_variant_order(hits, limit, rules)
+        
+        # If no results, try opensearch API with first variant
+        if not results and query_variants and time_left() != 0:
+            data = await fetch_opensearch(query_variants[0], limit)
+            collect_opensearch_hits(data, results, set())
+        
+    except (httpx.HTTPError, UpstreamUnavailable) as e:
+        print(f"Wikipedia API error: {e}")
+        partial = True
+    except Exception as e:
+        print(f"Search error: {e}")
+    finally:
+        # Shared tasks (from search_batch) belong to the caller; only cancel our own
+        for fetch, task in zip(fetches, tasks):
+            if task is not fetch:
+                task.cancel()
+    
+    return PartialResults(results) if partial else results
+
+async def search_wikipedia_async(query: str, limit: int = 10) -> List[Dict[str, str]]:
+    """
+    Search Swedish Wikipedia with all query variants fetched concurrently.
+    
+    The variants chosen by rule_stats (at most UPSUM_UPSTREAM_BUDGET, skipping
+    low-yield rules) are sent at once over the pooled client; hits are then
+    merged in variant-priority order. A failing variant only loses its own
+    hits. In "local"/"local-first" mode the dump index is consulted first,
+    with every variant.
+    
+    Args:
+        query: Search query in Swedish
+        limit: Maximum number of results to return
+    
+    Returns:
+        List of dictionaries containing title, snippet, and url
+    """
+    with stage('normalize'):
+        tagged = normalize_with_rules(query)
+    query_variants = [variant for variant, _ in tagged]
+    QUERY_VARIANTS.observe(len(query_variants))
+    print(f"[NLP] Query variants: {query_variants}")
+    
+    if SEARCH_MODE in ('local', 'local-first'):
+        results = await asyncio.to_thread(search_local, query_variants, limit)
+        if results or SEARCH_MODE == 'local':
+            return results
+    
+    variants, rules = rule_stats.plan(tagged)
+    VARIANTS_FETCHED.observe(len(variants))
+    return await merge_variant_fetches(
+        variants, [fetch_variant(variant, limit, variant_priority(i)) for i, variant in enumerate(variants)],
+        limit, rules
+    )
+
+def variant_priority(position: int) -> int:
+    """Governor priority of the variant at position: the first one decides what the user sees."""
+    return PRIMARY if position == 0 else SECONDARY
+
+async def search_and_store(key: str, query: str, limit: int) -> List[Dict[str, str]]:
+    """Run a search once per key at a time and cache non-empty results."""
+    async def run() -> List[Dict[str, str]]:
+        results = await search_wikipedia_async(query, limit)
+        if cacheable(results):
+            result_cache.set(key, results)
+        return results
+    
+    return await search_flight.do(key, run)
+
+async def refresh_cached(key: str, query: str, limit: int) -> None:
+    """Re-run a search and replace its cache entry (stale-while-revalidate)."""
+    try:
+        # Own deadline: the request that found the stale entry has already been answered
+        with request_deadline(), background():
+            await search_and_store(key, query, limit)
+    finally:
+        _refresh_tasks.pop(key, None)
+
+def lookup_cached(key: str, query: str, limit: int) -> Optional[List[Dict[str, str]]]:
+    """Cached results for key, scheduling one background refresh if stale."""
+    cached = result_cache.get(key)
+    if cached is None:
+        CACHE_LOOKUPS.inc('miss')
+        return None
+    results, stale = cached
+    CACHE_LOOKUPS.inc('stale' if stale else 'hit')
+    if stale and key not in _refresh_tasks:
+        _refresh_tasks[key] = asyncio.create_task(refresh_cached(key, query, limit))
+    return results
+
+async def cached_search(query: str, limit: int = 10, admit: bool = False) -> List[Dict[str, str]]:
+    """
+    Search through the result cache.
+    
+    Fresh entries are returned directly. Stale entries are returned
+    immediately while a single background refresh per key runs. Concurrent
+    misses for the same key share one upstream search. Empty result lists
+    are not cached, since they are usually upstream errors.
+    
+    Args:
+        query: Search query in Swedish
+        limit: Maximum number of results to return
+        admit: Start a new upstream search only with an admission turn
+    
+    Returns:
+        List of dictionaries containing title, snippet, and url
+    
+    Raises:
+        Overloaded: admit is set and the worker is at capacity
+    """
+    with stage('normalize'):
+        key = cache_key(normalize_swedish_query(query), limit)
+    query_log.record(key, query, limit)
+    results = lookup_cached(key, query, limit)
+    if results is not None:
+        return results
+    
+    if not admit or search_flight.running(key):
+        return await search_and_store(key, query, limit)
+    async with admission.admit():
+        return await search_and_store(key, query, limit)
+
+async def warm_query(query: str, limit: int) -> bool:
+    """
+    Search a logged query unless its cache entry is still fresh (startup warm-up).
+    
+    Returns:
+        False if the query was already cached
+    """
+    key = cache_key(normalize_swedish_query(query), limit)
+    cached = result_cache.get(key)
+    if cached is not None and not cached[1]:
+        return False
+    with request_deadline(), background():
+        await search_and_store(key, query, limit)
+    return True
+
+def lookup_stream(query: str, limit: int) -> Tuple[List[Tuple[str, str]], str, Optional[List[Dict[str, str]]]]:
+    """
+    Normalize a query for stream_search and look it up in the result cache.
+    
+    Returns:
+        (variants tagged with their rules, cache key, cached results or None)
+    """
+    with stage('normalize'):
+        tagged = normalize_with_rules(query)
+        key = cache_key([variant for variant, _ in tagged], limit)
+    query_log.record(key, query, limit)
+    return tagged, key, lookup_cached(key, query, limit)
+
+async def stream_search(query: str, limit: int = 10, admit: bool = False,
+                        lookup: Optional[Tuple[List[Tuple[str, str]], str, Optional[List[Dict[str, str]]]]] = None
+                        ) -> AsyncIterator[Dict[str, str]]:
+    """
+    Yield deduplicated results as soon as the variant that found them returns.
+    
+    Uses the same cache, seen-title dedup, limit and opensearch fallback as
+    cached_search, but yields variants in arrival order rather than
+    waiting for the slowest one. What gets cached (and credited in
+    rule_stats) is the variant-priority merge /search would return, so
+    after the limit is reached the stream stays open until higher-priority
+    variants that could change it have arrived. Stops at the request deadline.
+    
+    Args:
+        query: Search query in Swedish
+        limit: Maximum number of results to yield
+        admit: Go upstream only with an admission turn, held until the generator finishes
+        lookup: Result of lookup_stream, if the caller already made it
+    
+    Yields:
+        Dictionaries containing title, snippet, and url
+    
+    Raises:
+        Overloaded: admit is set and the worker is at capacity (before any upstream result)
+    """
+    tagged, key, cached = lookup or lookup_stream(query, limit)
+    query_variants = [variant for variant, _ in tagged]
+    if cached is not None:
+        for result in cached:
+            yield result
+        return
+    
+    QUERY_VARIANTS.observe(len(query_variants))
+    print(f"[NLP] Query variants: {query_variants}")
+    results: List[Dict[str, str]] = []
+    seen_titles: Set[str] = set()
+    partial = False
+    
+    if SEARCH_MODE in ('local', 'local-first'):
+        results = await asyncio.to_thread(search_local, query_variants, limit)
+        seen_titles.update(result['title'] for result in results)
+        for result in results:
+            yield result
+    
+    if not results and SEARCH_MODE != 'local':
+        async with (admission.admit() if admit else nullcontext()):
+            # Set around task creation only: the tasks copy the context, and this
+            # generator may be resumed in a different one between yields
+            variants, rules = rule_stats.plan(tagged)
+            VARIANTS_FETCHED.observe(len(variants))
+            with request_deadline() as deadline:
+                tasks = [asyncio.ensure_future(fetch_variant(variant, limit, variant_priority(i)))
+                         for i, variant in enumerate(variants)]
+            hits: List[Optional[List[Dict[str, Any]]]] = [None] * len(tasks)
+            try:
+                pending = set(tasks)
+                # Past the limit, keep waiting (without yielding) until the
+                # priority-order merge that gets cached can no longer change
+                while pending and (len(results) < limit or not merge_in_variant_order(hits, limit)[1]):
+                    remaining = deadline - time.monotonic()
+                    done, pending = await asyncio.wait(pending, timeout=max(0.0, remaining),
+                                                       return_when=asyncio.FIRST_COMPLETED)
+                    if not done:
+                        print(f"[Upstream] Deadline passed with {len(pending)} of {len(tasks)} variants pending")
+                        partial = True
+                        break
+                    # Variants finishing together are merged in priority order
+                    for task in sorted(done, key=tasks.index):
+                        if task.exception() is not None:
+                            print(f"Wikipedia API error: {task.exception()}")
+                            partial = True
+                            continue
+                        hits[tasks.index(task)] = task.result()
+                        found = len(results)
+                        collect_search_hits(task.result(), results, seen_titles, limit)
+                        for result in results[found:]:
+                            yield result
+                
+                # Cached and credited like merge_variant_fetches: /search shares the key
+                ordered, _ = merge_in_variant_order(hits, limit, rules)
+                
+                # If no results, try opensearch API with first variant
+                remaining = deadline - time.monotonic()
+                if not results and variants and remaining > 0:
+                    with request_deadline(remaining):
+                        fallback = asyncio.ensure_future(fetch_opensearch(query_variants[0], limit))
+                    tasks.append(fallback)
+                    data = await fallback
+                    collect_opensearch_hits(data, results, seen_titles)
+                    for result in results:
+                        yield result
+                else:
+                    results = ordered
+            except (httpx.HTTPError, UpstreamUnavailable) as e:
+                print(f"Wikipedia API error: {e}")
+                partial = True
+            except Exception as e:
+                print(f"Search error: {e}")
+            finally:
+                for task in tasks:
+                    task.cancel()
+    
+    if results and not partial:
+        result_cache.set(key, results)
+
 @router.get("/search")
-def search(q: str = Query("", description="Fråga eller ämne på svenska")):
+async def search(request: Request, q: str = Query("", description="Fråga eller ämne på svenska"),
+                 summaries: bool = Query(False, description="Bifoga sammanfattning och miniatyrbild")):
     """
     Search endpoint for Swedish Wikipedia with Natural Input Language support.
     
@@ -233,16 +678,291 @@ def search(q: str = Query("", description="Fråga eller ämne på svenska")):
     - Compound words
     - Colloquial phrasing
     
-    Returns relevant Wikipedia articles based on the query.
+    Returns relevant Wikipedia articles based on the query. Upstream work
+    is bounded by UPSUM_SEARCH_DEADLINE; past it, whatever has been found
+    is returned. When the worker already runs UPSUM_MAX_IN_FLIGHT searches
+    and its short queue is full, answers 503 with Retry-After at once.
+    
+    Responses carry an ETag (If-None-Match gets a 304) and Cache-Control
+    with stale-while-revalidate, and are gzip/brotli-compressed when the
+    client accepts it. Empty or partial results are sent with no-store.
+    
+    With summaries=1 each result also gets "summary" (plain-text intro) and
+    "thumbnail", fetched for all results in one batched upstream round trip.
     """
     if not q or q.strip() == "":
-        return JSONResponse({"results": [], "count": 0})
+        return json_response(request, {"results": [], "count": 0})
     
-    # Perform Wikipedia search with Swedish NLP
-    results = search_wikipedia(q.strip(), limit=10)
+    # Perform Wikipedia search with Swedish NLP; the deadline includes any admission wait
+    with request_deadline():
+        try:
+            results = await cached_search(q.strip(), limit=10, admit=True)
+        except Overloaded as e:
+            return overloaded_response(e, {"results": [], "count": 0, "query": q})
+        if summaries and results:
+            results = await attach_summaries(results)
     
-    return JSONResponse({
+    return json_response(request, {
         "results": results,
         "count": len(results),
         "query": q
-    })
+    }, cacheable=cacheable(results))
+
+def overloaded_response(error: Overloaded, body: Dict[str, Any]) -> JSONResponse:
+    """503 with Retry-After for a search refused by admission control."""
+    return JSONResponse({"error": str(error), **body}, status_code=503,
+                        headers={"Retry-After": str(error.retry_after), "Cache-Control": "no-store"})
+
+async def started(items: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    """
+    Run an async generator up to its first item before a response is started.
+    
+    Errors raised until then (Overloaded) reach the endpoint while it can
+    still send a different status; the returned iterator yields all items.
+    """
+    try:
+        first = await items.__anext__()
+    except StopAsyncIteration:
+        # Exhausted: iterates to nothing
+        return items
+    
+    async def resumed() -> AsyncIterator[Any]:
+        try:
+            yield first
+            async for item in items:
+                yield item
+        finally:
+            await items.aclose()
+    
+    return resumed()
+
+async def attach_summaries(results: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """Copies of results with "summary" and "thumbnail" added where available."""
+    with stage('summaries'):
+        found = await article_summaries.summaries([result['title'] for result in results])
+    enriched = []
+    for result in results:
+        summary = found.get(result['title'])
+        if summary and not summary.get('missing'):
+            result = {**result, "summary": summary['extract'], "thumbnail": summary['thumbnail']}
+        enriched.append(result)
+    return PartialResults(enriched) if isinstance(results, PartialResults) else enriched
+
+@router.get("/articles")
+async def articles(request: Request, titles: str = Query("", description="Titlar separerade med |")):
+    """
+    Intro extracts and thumbnails for up to 50 titles ("A|B|C").
+    
+    Titles not yet cached are fetched with one batched MediaWiki query;
+    cached ones are served from memory and revalidated by revision id.
+    Returns {"articles": [...], "count"} in request order; a missing page
+    has "missing": true.
+    """
+    requested = [title.strip() for title in titles.split('|') if title.strip()]
+    if len(requested) > ARTICLE_BATCH:
+        return JSONResponse({"error": f"At most {ARTICLE_BATCH} titles per request"}, status_code=400)
+    
+    found = await article_summaries.summaries(requested) if requested else {}
+    entries = [found[title] for title in requested if title in found]
+    return json_response(request, {"articles": entries, "count": len(entries)},
+                         cacheable=len(entries) == len(requested))
+
+def ndjson_line(frame: Dict[str, Any]) -> bytes:
+    """One NDJSON line."""
+    return (json.dumps(frame, ensure_ascii=False) + "\n").encode('utf-8')
+
+@router.get("/search/stream")
+async def search_stream(request: Request, q: str = Query("", description="Fråga eller ämne på svenska")):
+    """
+    Streaming variant of /search.
+    
+    Returns NDJSON: one {"type": "result", title, snippet, url} line per
+    result as soon as it is found, then {"type": "done", "count", "query"}.
+    Admission control applies as for /search: at capacity the answer is a
+    503 with Retry-After instead of a stream.
+    
+    A query answered by the result cache is sent as one complete body with
+    the same ETag/304, Cache-Control and compression as /search. Results
+    still being fetched are streamed uncompressed with no-store.
+    """
+    query = q.strip()
+    found: Optional[AsyncIterator[Dict[str, str]]] = None
+    if query:
+        lookup = lookup_stream(query, 10)
+        cached = lookup[2]
+        if cached is not None:
+            lines = [ndjson_line({"type": "result", **result}) for result in cached]
+            lines.append(ndjson_line({"type": "done", "count": len(cached), "query": q}))
+            return cached_response(request, b"".join(lines), "application/x-ndjson")
+        try:
+            # Nothing is sent until the first result (or the refusal) is known
+            found = await started(stream_search(query, limit=10, admit=True, lookup=lookup))
+        except Overloaded as e:
+            return overloaded_response(e, {"results": [], "count": 0, "query": q})
+    
+    async def frames() -> AsyncIterator[bytes]:
+        count = 0
+        if found is not None:
+            async for result in found:
+                count += 1
+                yield ndjson_line({"type": "result", **result})
+        yield ndjson_line({"type": "done", "count": count, "query": q})
+    
+    # Tell nginx not to buffer (or cache), or the first result waits for the last
+    return StreamingResponse(frames(), media_type="application/x-ndjson",
+                             headers={"X-Accel-Buffering": "no", "Cache-Control": "no-store"})
+
+@router.get("/search/rules")
+async def search_rules():
+    """
+    Per-rule variant yield and the upstream calls made per search.
+    
+    Counts cover all workers up to their last save plus this worker since.
+    """
+    return JSONResponse(rule_stats.snapshot())
+
+class BatchSearchRequest(BaseModel):
+    """Body of POST /search/batch."""
+    queries: List[str] = Field(..., max_length=MAX_BATCH_QUERIES)
+    limit: int = Field(10, ge=1, le=50)
+    stream: Optional[bool] = None
+
+async def search_batch(queries: List[str], limit: int = 10, concurrency: int = BATCH_CONCURRENCY,
+                       admit: bool = False) -> AsyncIterator[Tuple[int, List[Dict[str, str]]]]:
+    """
+    Search many queries with each distinct variant fetched once.
+    
+    Queries answered by the result cache cost nothing upstream. The rest are
+    normalized together, pruned by rule_stats like a single search, and every
+    distinct variant across the batch is fetched once, at most `concurrency`
+    at a time; each query is then merged
+    from the shared fetches exactly like search_wikipedia_async and cached.
+    The whole batch runs under one request deadline; if the generator is
+    closed early, upstream fetches still queued or running are cancelled.
+    
+    Args:
+        queries: Stripped, non-empty queries
+        limit: Maximum number of results per query
+        concurrency: Upstream calls in flight
+        admit: If any query needs upstream work, take one admission turn
+            for the whole batch first
+    
+    Yields:
+        (query index, results) as each query completes
+    
+    Raises:
+        Overloaded: admit is set and the worker is at capacity (before anything is yielded)
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def bounded(fn: Callable[[], Awaitable[Any]]) -> Any:
+        async with semaphore:
+            return await fn()
+    
+    pending: List[asyncio.Future] = []
+    variant_tasks: Dict[str, asyncio.Task] = {}
+    planned: Dict[str, Tuple[List[str], List[str]]] = {}
+    
+    async def answer(index: int, results: List[Dict[str, str]]) -> Tuple[int, List[Dict[str, str]]]:
+        return index, results
+    
+    async def local_or_fallback(index: int, query: str) -> Tuple[int, List[Dict[str, str]]]:
+        return index, await bounded(lambda: cached_search(query, limit))
+    
+    async def merged(index: int, key: str, variants: List[str],
+                     rules: Optional[List[str]]) -> Tuple[int, List[Dict[str, str]]]:
+        async def run() -> List[Dict[str, str]]:
+            results = await merge_variant_fetches(variants, [variant_tasks[v] for v in variants], limit, rules)
+            if cacheable(results):
+                result_cache.set(key, results)
+            return results
+        return index, await search_flight.do(key, run)
+    
+    with stage('normalize'):
+        batch_tagged = [normalize_with_rules(query) for query in queries]
+    keys = [cache_key([variant for variant, _ in tagged], limit) for tagged in batch_tagged]
+    found = [lookup_cached(key, queries[index], limit) for index, key in enumerate(keys)]
+    upstream = admit and any(cached is None for cached in found)
+    
+    async with (admission.admit() if upstream else nullcontext()):
+        try:
+            # Set around task creation only: the tasks copy the context, and this
+            # generator may be resumed in a different one between yields
+            with request_deadline():
+                for index, tagged in enumerate(batch_tagged):
+                    key, cached = keys[index], found[index]
+                    if cached is not None:
+                        pending.append(asyncio.ensure_future(answer(index, cached)))
+                    elif SEARCH_MODE != 'api':
+                        pending.append(asyncio.ensure_future(local_or_fallback(index, queries[index])))
+                    elif key in planned:
+                        # Same normalized query earlier in the batch: share its fetches
+                        # (and don't credit its rules twice)
+                        pending.append(asyncio.ensure_future(merged(index, key, planned[key][0], None)))
+                    else:
+                        variants, rules = planned[key] = rule_stats.plan(tagged)
+                        VARIANTS_FETCHED.observe(len(variants))
+                        for position, variant in enumerate(variants):
+                            if variant not in variant_tasks:
+                                variant_tasks[variant] = asyncio.ensure_future(
+                                    bounded(lambda v=variant, p=variant_priority(position): fetch_variant(v, limit, p))
+                                )
+                        pending.append(asyncio.ensure_future(merged(index, key, variants, rules)))
+            
+            print(f"[Batch] {len(queries)} queries, {len(variant_tasks)} distinct upstream variants")
+            for completed in asyncio.as_completed(pending):
+                yield await completed
+        finally:
+            # Closed early (client gone) or failed: stop fetches nobody will use
+            for task in [*pending, *variant_tasks.values()]:
+                task.cancel()
+
+@router.post("/search/batch")
+async def search_batch_endpoint(request: Request, body: BatchSearchRequest):
+    """
+    Search many queries in one request.
+    
+    Variants are deduplicated across the whole batch before going upstream.
+    Small batches return one JSON document in input order; batches of
+    BATCH_STREAM_THRESHOLD queries or more (or "stream": true) stream one
+    NDJSON line per query as it completes. A batch needing upstream work
+    takes one admission turn and gets a 503 with Retry-After at capacity.
+    
+    The JSON document is compressed like /search, but sent with no-store:
+    POST responses aren't reused by HTTP caches.
+    """
+    queries = [q.strip() for q in body.queries]
+    indexed = [i for i, q in enumerate(queries) if q]
+    live = [queries[i] for i in indexed]
+    stream = body.stream if body.stream is not None else len(live) >= BATCH_STREAM_THRESHOLD
+    
+    def entry(i: int, results: List[Dict[str, str]]) -> Dict[str, Any]:
+        return {"index": i, "query": body.queries[i], "results": results, "count": len(results)}
+    
+    overloaded_body = {"results": [], "count": 0}
+    if stream:
+        try:
+            batch = await started(search_batch(live, body.limit, admit=True))
+        except Overloaded as e:
+            return overloaded_response(e, overloaded_body)
+        
+        async def lines() -> AsyncIterator[bytes]:
+            for i in range(len(queries)):
+                if not queries[i]:
+                    yield ndjson_line(entry(i, []))
+            async for position, results in batch:
+                yield ndjson_line(entry(indexed[position], results))
+        
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    
+    answered: List[List[Dict[str, str]]] = [[] for _ in queries]
+    try:
+        async for position, results in search_batch(live, body.limit, admit=True):
+            answered[indexed[position]] = results
+    except Overloaded as e:
+        return overloaded_response(e, overloaded_body)
+    
+    return json_response(request, {
+        "results": [entry(i, results) for i, results in enumerate(answered)],
+        "count": len(queries)
+    }, cacheable=False)
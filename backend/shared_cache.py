@@ -0,0 +1,192 @@
+"""
+Host-wide result cache shared by all gunicorn workers.
+
+Same interface as cache.ResultCache, backed by a SQLite database in WAL
+mode so readers in every worker proceed concurrently with a writer. Values
+are stored as zlib-compressed compact JSON. The file is kept bounded by
+compact(), which each worker runs periodically (see cache.run_compaction).
+
+get() and set() run on the event loop, so they never wait long: the
+connection gives up on a locked database after BUSY_TIMEOUT, and any
+SQLite error counts as a miss or a skipped write rather than failing the
+search. Lookups are read-only; access times for LRU are remembered in
+memory and written by compact(), which uses its own connection from a
+worker thread.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional, Tuple
+
+from cache import CACHE_SIZE, CACHE_TTL, CACHE_STALE_TTL, Results
+
+CACHE_PATH = os.getenv("UPSUM_CACHE_PATH", os.path.join(os.path.dirname(__file__), "upsum_cache.sqlite3"))
+
+# Access times are only recorded when older than this
+TOUCH_INTERVAL = 30.0
+# Longest wait for a locked database on the request path, and in compact() (seconds)
+BUSY_TIMEOUT = float(os.getenv("UPSUM_CACHE_BUSY_TIMEOUT", "0.05"))
+COMPACT_BUSY_TIMEOUT = 5.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed_at);
+"""
+
+def encode_results(results: Results) -> bytes:
+    """Serialize a result list compactly."""
+    return zlib.compress(json.dumps(results, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+def decode_results(blob: bytes) -> Results:
+    """Inverse of encode_results."""
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+class SharedResultCache:
+    """SQLite (WAL) result cache with LRU/TTL compaction."""
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = CACHE_SIZE,
+                 ttl: float = CACHE_TTL, stale_ttl: float = CACHE_STALE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, timeout=COMPACT_BUSY_TIMEOUT, isolation_level=None,
+                                   check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._db.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+        # Access times not yet written, flushed by compact()
+        self._touched: Dict[str, float] = {}
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.errors = 0
+
+    def get(self, key: str) -> Optional[Tuple[Results, bool]]:
+        """
+        Look up an entry.
+
+        Returns:
+            (results, is_stale), or None on a miss
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT stored_at, accessed_at, value FROM results WHERE key = ?", (key,)
+                ).fetchone()
+        except sqlite3.Error:
+            self.errors += 1
+            self.misses += 1
+            return None
+        if row is None:
+            self.misses += 1
+            return None
+
+        stored_at, accessed_at, blob = row
+        age = now - stored_at
+        if age > self.ttl + self.stale_ttl:
+            # Deleted by the next compact()
+            self.misses += 1
+            return None
+
+        if now - accessed_at > TOUCH_INTERVAL:
+            self._touched[key] = now
+
+        if age > self.ttl:
+            self.stale_hits += 1
+            return decode_results(blob), True
+        self.hits += 1
+        return decode_results(blob), False
+
+    def set(self, key: str, results: Results) -> None:
+        """Store results; size is enforced by compact(). Skipped if the database is busy."""
+        now = time.time()
+        blob = encode_results(results)
+        try:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, stored_at, accessed_at, value) VALUES (?, ?, ?, ?)",
+                    (key, now, now, blob)
+                )
+        except sqlite3.Error:
+            self.errors += 1
+            return
+        self._touched.pop(key, None)
+
+    def clear(self) -> None:
+        """Drop all entries (counters are kept)."""
+        with self._lock:
+            self._db.execute("DELETE FROM results")
+
+    def compact(self) -> int:
+        """
+        Write pending access times, remove expired entries, then the least
+        recently used ones past max_entries.
+
+        Runs on its own connection, so it can be called from a worker thread
+        without holding up get() and set().
+
+        Returns:
+            Number of entries removed
+        """
+        touched, self._touched = self._touched, {}
+        cutoff = time.time() - self.ttl - self.stale_ttl
+        db = sqlite3.connect(self.path, timeout=COMPACT_BUSY_TIMEOUT, isolation_level=None)
+        try:
+            with db:
+                db.executemany("UPDATE results SET accessed_at = ? WHERE key = ? AND accessed_at < ?",
+                               [(at, key, at) for key, at in touched.items()])
+            expired = db.execute("DELETE FROM results WHERE stored_at < ?", (cutoff,)).rowcount
+            evicted = db.execute(
+                "DELETE FROM results WHERE key IN ("
+                " SELECT key FROM results ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            if expired or evicted:
+                db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        finally:
+            db.close()
+        self.expirations += expired
+        self.evictions += evicted
+        return expired + evicted
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._db.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for /health (hit/miss counters are per worker)."""
+        try:
+            with self._lock:
+                entries = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "errors": self.errors,
+            "hit_rate": round((self.hits + self.stale_hits) / lookups, 4) if lookups else 0.0
+        }
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Compact Swedish spelling correction (SymSpell-style symmetric delete index).
+
+Every dictionary term is indexed under all strings obtained by deleting up
+to MAX_DISTANCE characters from its first PREFIX_LENGTH characters. A
+misspelled word generates the same kind of deletes; terms sharing one are
+the only candidates, and the closest (Damerau-Levenshtein, then most
+frequent) wins. A lookup is a few dozen binary searches, no network.
+
+Build from a tab-separated file, one "text<TAB>count" per line (count
+optional), e.g. the title file used by /suggest or a word-frequency list;
+texts are split into words and counts summed per word:
+    python spelling.py build data/titles.tsv data/spelling.bin
+
+The binary file is memory-mapped, so loading is constant time and all
+gunicorn workers share the same pages:
+    header        b"UPSP", version, term count, delete count, blob size,
+                  max distance, prefix length (4 x uint32, 2 x uint16)
+    hashes        uint32[m]  sorted CRC-32 of delete strings
+    refs          uint32[m]  term id << 2 | characters deleted, adjacent for the same hash
+    offsets       uint32[n]  term offsets into the blob
+    counts        uint32[n]  term frequencies
+    lengths       uint16[n]  term byte lengths
+    blob          terms, UTF-8, concatenated
+
+Hash collisions only add candidates, which the distance check rejects.
+Deletes are tried fewest-first and stop once a closer match is impossible,
+so a known word costs one binary search.
+"""
+
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+MAGIC = b"UPSP"
+VERSION = 1
+HEADER = struct.Struct('<4sIIIIHH')
+
+SPELLING_PATH = os.getenv("UPSUM_SPELLING_PATH", os.path.join(os.path.dirname(__file__), "data", "spelling.bin"))
+
+MAX_DISTANCE = 2
+PREFIX_LENGTH = 7
+# Shorter words are left alone: too many dictionary terms are within reach
+MIN_WORD_LENGTH = 4
+# Terms kept when building, most frequent first
+MAX_TERMS = 300000
+
+WORD_RE = re.compile(r"[^\W\d_]+(?:-[^\W\d_]+)*")
+
+def delete_hash(text: str) -> int:
+    return zlib.crc32(text.encode('utf-8'))
+
+def delete_levels(word: str, max_distance: int, prefix_length: int) -> Iterator[List[str]]:
+    """The word's prefix, then the strings made by deleting 1..max_distance characters from it, per count."""
+    level = [word[:prefix_length]]
+    found = set(level)
+    yield level
+    for _ in range(max_distance):
+        following = []
+        for text in level:
+            for i in range(len(text)):
+                shorter = text[:i] + text[i + 1:]
+                if shorter not in found:
+                    found.add(shorter)
+                    following.append(shorter)
+        level = following
+        yield level
+
+def distance(a: str, b: str, limit: int) -> int:
+    """Optimal string alignment distance, or limit + 1 if it exceeds limit."""
+    # A shared prefix and suffix don't change the distance
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end_a, end_b = len(a), len(b)
+    while end_a > start and end_b > start and a[end_a - 1] == b[end_b - 1]:
+        end_a -= 1
+        end_b -= 1
+    a, b = a[start:end_a], b[start:end_b]
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    if not a or not b:
+        return max(len(a), len(b))
+
+    over = limit + 1
+    previous2: List[int] = []
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        # Only cells within limit of the diagonal can stay within limit
+        ch = a[i - 1]
+        row_min = current[0]
+        for j in range(max(1, i - limit), min(len(b), i + limit) + 1):
+            value = previous[j - 1] if ch == b[j - 1] else previous[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if i > 1 and j > 1 and ch == b[j - 2] and a[i - 2] == b[j - 1] and previous2[j - 2] + 1 < value:
+                value = previous2[j - 2] + 1
+            if value > over:
+                value = over
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > limit:
+            return over
+        previous2, previous = previous, current
+    return previous[-1]
+
+def read_term_counts(path: str) -> Dict[str, int]:
+    """Word frequencies from a text<TAB>count file (count defaults to 1)."""
+    counts: Dict[str, int] = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if not line.strip() or line.startswith('#'):
+                continue
+            text, _, count = line.rstrip('\n').partition('\t')
+            try:
+                weight = max(1, int(float(count.split('\t')[0]))) if count else 1
+            except ValueError:
+                weight = 1
+            for word in WORD_RE.findall(text.lower()):
+                counts[word] = counts.get(word, 0) + weight
+    return counts
+
+def build_spelling_index(counts: Dict[str, int], out_path: str, max_distance: int = MAX_DISTANCE,
+                         prefix_length: int = PREFIX_LENGTH, max_terms: int = MAX_TERMS) -> int:
+    """
+    Write the binary spelling index.
+
+    Args:
+        counts: Word -> frequency
+        out_path: Destination file
+        max_distance: Largest edit distance corrected
+        prefix_length: Characters of each term that are indexed
+        max_terms: Most frequent terms kept
+
+    Returns:
+        Number of terms written
+    """
+    terms = sorted((word for word in counts if len(word) >= MIN_WORD_LENGTH - max_distance),
+                   key=lambda word: (-counts[word], word))[:max_terms]
+    blob = bytearray()
+    offsets, lengths, term_counts = array('I'), array('H'), array('I')
+    pairs = []
+    for term_id, term in enumerate(terms):
+        encoded = term.encode('utf-8')
+        offsets.append(len(blob))
+        lengths.append(len(encoded))
+        term_counts.append(min(counts[term], 0xFFFFFFFF))
+        blob += encoded
+        for deleted, texts in enumerate(delete_levels(term, max_distance, prefix_length)):
+            pairs.extend((delete_hash(text), term_id << 2 | deleted) for text in texts)
+
+    ordered = sorted(pairs)
+    hashes = array('I', (h for h, _ in ordered))
+    refs = array('I', (ref for _, ref in ordered))
+
+    os.makedirs(os.path.dirname(out_path) or '.', exist_ok=True)
+    with open(out_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(terms), len(ordered), len(blob), max_distance, prefix_length))
+        for part in (hashes, refs, offsets, term_counts, lengths):
+            f.write(part.tobytes())
+        f.write(blob)
+    return len(terms)
+
+class SpellingIndex:
+    """Memory-mapped lookup over a file written by build_spelling_index."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, delete_count, blob_size, max_distance, prefix_length = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Not a spelling index (version {VERSION}): {path}")
+        self.count = count
+        self.delete_count = delete_count
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        view = memoryview(self._map)
+        start = HEADER.size
+        self._hashes = view[start:start + 4 * delete_count].cast('I')
+        start += 4 * delete_count
+        self._refs = view[start:start + 4 * delete_count].cast('I')
+        start += 4 * delete_count
+        self._offsets = view[start:start + 4 * count].cast('I')
+        start += 4 * count
+        self._counts = view[start:start + 4 * count].cast('I')
+        start += 4 * count
+        self._lengths = view[start:start + 2 * count].cast('H')
+        start += 2 * count
+        self._blob = view[start:start + blob_size]
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def size_bytes(self) -> int:
+        """Mapped file size."""
+        return len(self._map)
+
+    def term(self, term_id: int) -> str:
+        offset = self._offsets[term_id]
+        return bytes(self._blob[offset:offset + self._lengths[term_id]]).decode('utf-8')
+
+    def lookup(self, word: str) -> Optional[Tuple[str, int]]:
+        """
+        Closest dictionary term to a lower-case word.
+
+        Returns:
+            (term, distance), preferring smaller distance, then higher frequency;
+            None if nothing is within max_distance
+        """
+        best: Optional[Tuple[int, int, int]] = None  # (distance, -count, term_id)
+        limit = self.max_distance
+        seen: Set[int] = set()
+        for deleted, texts in enumerate(delete_levels(word, self.max_distance, self.prefix_length)):
+            # Candidates reached only through more deletes are at least that far away
+            if deleted > limit:
+                break
+            for text in texts:
+                h = delete_hash(text)
+                i = bisect_left(self._hashes, h)
+                while i < self.delete_count and self._hashes[i] == h:
+                    ref = self._refs[i]
+                    i += 1
+                    term_id = ref >> 2
+                    if (ref & 3) > limit or term_id in seen:
+                        continue
+                    seen.add(term_id)
+                    # UTF-8 length bounds the character count: n chars take n..4n bytes
+                    size = self._lengths[term_id]
+                    if size < len(word) - limit or size > 4 * (len(word) + limit):
+                        continue
+                    d = distance(word, self.term(term_id), limit)
+                    if d > limit:
+                        continue
+                    key = (d, -self._counts[term_id], term_id)
+                    if best is None or key < best:
+                        best = key
+                        limit = d
+                        if d == 0:
+                            return word, 0
+        if best is None:
+            return None
+        return self.term(best[2]), best[0]
+
+    def correct(self, word: str) -> Optional[str]:
+        """A better spelling of word, or None if it is known, too short or has no close term."""
+        if len(word) < MIN_WORD_LENGTH or not WORD_RE.fullmatch(word):
+            return None
+        found = self.lookup(word)
+        if found is None or found[1] == 0:
+            return None
+        return found[0]
+
+    def close(self) -> None:
+        """Release the memory map."""
+        for view in (self._hashes, self._refs, self._offsets, self._counts, self._lengths, self._blob):
+            view.release()
+        self._map.close()
+
+def load_spelling_index(path: str = SPELLING_PATH) -> Optional[SpellingIndex]:
+    """Map the spelling index if it has been built, else None."""
+    if not os.path.exists(path):
+        return None
+    return SpellingIndex(path)
+
+def main(argv: List[str]) -> int:
+    if len(argv) == 4 and argv[1] == 'build':
+        count = build_spelling_index(read_term_counts(argv[2]), argv[3])
+        print(f"Wrote {count} terms to {argv[3]} ({os.path.getsize(argv[3])} bytes)")
+        return 0
+    if len(argv) >= 4 and argv[1] == 'lookup':
+        index = SpellingIndex(argv[2])
+        for word in argv[3:]:
+            found = index.lookup(word.lower())
+            print(f"{word}: {f'{found[0]} ({found[1]})' if found else '-'}")
+        return 0
+    print(__doc__)
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
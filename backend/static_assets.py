@@ -0,0 +1,161 @@
+"""
+In-memory frontend assets.
+
+Files in the frontend directory are read once at startup, minified (HTML,
+CSS, JS) and stored with their gzip and brotli variants precomputed at
+maximum compression. Requests are served from memory with a strong ETag
+and Cache-Control; the variant is chosen by Accept-Encoding.
+
+With UPSUM_ASSETS_RELOAD=1 (development) a file is reloaded when its
+modification time changes, so edits show up without restarting.
+
+Minification is deliberately conservative: indentation, blank lines, HTML
+comments, CSS comments and whole-line // comments in scripts are removed;
+nothing inside a line is rewritten.
+"""
+
+import gzip
+import os
+import re
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from http_cache import body_etag, brotli, choose_encoding, etag_matches
+
+FRONTEND_DIR = Path(os.getenv("UPSUM_FRONTEND_DIR", Path(__file__).parent.parent / "frontend"))
+ASSETS_RELOAD = os.getenv("UPSUM_ASSETS_RELOAD", "0") == "1"
+
+# Cache-Control for assets: revalidation is a cheap 304 from memory
+ASSET_MAX_AGE = int(os.getenv("UPSUM_ASSET_MAX_AGE", "3600"))
+ASSET_STALE_WHILE_REVALIDATE = 86400
+
+MEDIA_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'text/javascript; charset=utf-8',
+    '.json': 'application/json',
+    '.svg': 'image/svg+xml',
+    '.ico': 'image/x-icon',
+    '.png': 'image/png',
+    '.webp': 'image/webp',
+}
+TEXT_TYPES = {'.html', '.css', '.js', '.json', '.svg'}
+
+HTML_COMMENT_RE = re.compile(r'<!--(?!\[if).*?-->', re.DOTALL)
+CSS_COMMENT_RE = re.compile(r'/\*.*?\*/', re.DOTALL)
+BLOCK_RE = re.compile(r'(<(style|script)\b[^>]*>)(.*?)(</\2>)', re.DOTALL | re.IGNORECASE)
+
+def _strip_lines(text: str, drop_line_comments: bool = False) -> str:
+    lines = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or (drop_line_comments and line.startswith('//')):
+            continue
+        lines.append(line)
+    return '\n'.join(lines)
+
+def minify_css(css: str) -> str:
+    return _strip_lines(CSS_COMMENT_RE.sub('', css))
+
+def minify_js(js: str) -> str:
+    return _strip_lines(js, drop_line_comments=True)
+
+def minify_html(html: str) -> str:
+    """Minify a page, including its inline <style> and <script> blocks."""
+    def block(match: re.Match) -> str:
+        minify = minify_css if match.group(2).lower() == 'style' else minify_js
+        return f"{match.group(1)}\n{minify(match.group(3))}\n{match.group(4)}"
+
+    return _strip_lines(BLOCK_RE.sub(block, HTML_COMMENT_RE.sub('', html)))
+
+MINIFIERS = {'.html': minify_html, '.css': minify_css, '.js': minify_js}
+
+class Asset:
+    """One file with its precomputed encodings."""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.mtime = path.stat().st_mtime
+        self.media_type = MEDIA_TYPES[path.suffix]
+        raw = path.read_bytes()
+        minify = MINIFIERS.get(path.suffix)
+        if minify is not None:
+            raw = minify(raw.decode('utf-8')).encode('utf-8')
+        self.etag = body_etag(raw)
+        self.bodies: Dict[Optional[str], bytes] = {None: raw}
+        if path.suffix in TEXT_TYPES:
+            encoded = {'gzip': gzip.compress(raw, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                encoded['br'] = brotli.compress(raw, quality=11)
+            # Tiny files can grow when compressed
+            self.bodies.update((encoding, body) for encoding, body in encoded.items() if len(body) < len(raw))
+
+    def stats(self) -> Dict[str, int]:
+        return {encoding or 'identity': len(body) for encoding, body in self.bodies.items()}
+
+class AssetStore:
+    """Frontend files held in memory, keyed by file name."""
+
+    def __init__(self, directory: Path = FRONTEND_DIR, reload: bool = ASSETS_RELOAD):
+        self.directory = Path(directory)
+        self.reload = reload
+        self.assets: Dict[str, Asset] = {}
+
+    def load(self) -> None:
+        """Read, minify and compress every servable file in the directory."""
+        assets = {}
+        if self.directory.is_dir():
+            for path in sorted(self.directory.iterdir()):
+                if path.is_file() and path.suffix in MEDIA_TYPES:
+                    assets[path.name] = Asset(path)
+        self.assets = assets
+        sizes = ", ".join(f"{name} {asset.stats()}" for name, asset in assets.items())
+        print(f"[Assets] Loaded {len(assets)} files from {self.directory}: {sizes}")
+
+    def get(self, name: str) -> Optional[Asset]:
+        """Asset by file name, reloaded first if it changed and reloading is on."""
+        asset = self.assets.get(name)
+        if self.reload:
+            path = self.directory / name
+            try:
+                if asset is None or path.stat().st_mtime != asset.mtime:
+                    if path.suffix in MEDIA_TYPES:
+                        asset = self.assets[name] = Asset(path)
+                        print(f"[Assets] Reloaded {name}")
+            except FileNotFoundError:
+                self.assets.pop(name, None)
+                return None
+        return asset
+
+    def response(self, request: Request, name: str) -> Response:
+        """
+        Serve an asset from memory.
+
+        Args:
+            request: Incoming request (If-None-Match, Accept-Encoding)
+            name: File name in the frontend directory
+
+        Returns:
+            200 with the best accepted encoding, 304 if the client's copy is current, or 404
+        """
+        asset = self.get(name)
+        if asset is None:
+            return Response(status_code=404)
+
+        encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+        if encoding not in asset.bodies:
+            encoding = None
+        headers = {
+            "ETag": f'{asset.etag[:-1]}-{encoding}"' if encoding else asset.etag,
+            "Cache-Control": f"public, max-age={ASSET_MAX_AGE}, stale-while-revalidate={ASSET_STALE_WHILE_REVALIDATE}",
+            "Vary": "Accept-Encoding"
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(if_none_match, asset.etag):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=asset.bodies[encoding], media_type=asset.media_type, headers=headers)
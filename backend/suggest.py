@@ -0,0 +1,134 @@
+"""
+Title autocomplete for /suggest.
+
+Titles are loaded once at startup from a UTF-8 file with one
+"title<TAB>weight" per line (weight optional, e.g. monthly page views).
+Lookup keys are case- and diacritic-folded ("Malmö" and "malmo" match) and
+kept in a sorted list searched with bisect. Prefixes matching more than
+SCAN_LIMIT titles get their top entries precomputed at load time, so every
+lookup is either a table hit or a small bounded scan; no upstream calls.
+"""
+
+import heapq
+import os
+import unicodedata
+from bisect import bisect_left
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, Query
+from fastapi.responses import JSONResponse
+
+router = APIRouter()
+
+TITLES_PATH = os.getenv("UPSUM_TITLES_PATH", os.path.join(os.path.dirname(__file__), "data", "titles.tsv"))
+
+# Largest prefix range scanned at query time; bigger ones are precomputed
+SCAN_LIMIT = 256
+
+# Suggestions kept per precomputed prefix (upper bound for ?limit=)
+MAX_SUGGESTIONS = 10
+
+def _strip_diacritics(ch: str) -> str:
+    decomposed = unicodedata.normalize('NFKD', ch)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+# Latin letters with diacritics mapped to their base letters, applied with str.translate
+FOLD_TABLE = {code: _strip_diacritics(chr(code)) for code in range(0xC0, 0x250)
+              if _strip_diacritics(chr(code)) != chr(code)}
+
+def fold(text: str) -> str:
+    """Case-fold and strip diacritics (å/ä → a, ö → o) and extra whitespace."""
+    return ' '.join(text.casefold().translate(FOLD_TABLE).split())
+
+class TitleIndex:
+    """Sorted-array prefix index over article titles, ranked by weight."""
+
+    def __init__(self, entries: List[Tuple[str, float]]):
+        ordered = sorted(((fold(title), title, weight) for title, weight in entries), key=lambda e: e[0])
+        self.keys = [key for key, _, _ in ordered]
+        self.titles = [title for _, title, _ in ordered]
+        self.weights = array('d', (weight for _, _, weight in ordered))
+        self.top: Dict[str, Tuple[int, ...]] = {}
+        self._precompute('', 0, len(self.keys))
+
+    @classmethod
+    def load(cls, path: str = TITLES_PATH) -> "TitleIndex":
+        """Load a title<TAB>weight file."""
+        entries = []
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                title, _, weight = line.rstrip('\n').partition('\t')
+                if title:
+                    entries.append((title.replace('_', ' '), float(weight) if weight else 0.0))
+        return cls(entries)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _best(self, lo: int, hi: int, limit: int) -> List[int]:
+        return heapq.nlargest(limit, range(lo, hi), key=self.weights.__getitem__)
+
+    def _precompute(self, prefix: str, lo: int, hi: int) -> None:
+        """Store top entries for every prefix whose range exceeds SCAN_LIMIT."""
+        if hi - lo <= SCAN_LIMIT:
+            return
+        self.top[prefix] = tuple(self._best(lo, hi, MAX_SUGGESTIONS))
+        depth = len(prefix) + 1
+        start = lo
+        while start < hi:
+            key = self.keys[start]
+            if len(key) < depth:
+                start += 1
+                continue
+            child = key[:depth]
+            end = bisect_left(self.keys, child + '\uffff', start, hi)
+            self._precompute(child, start, end)
+            start = end
+
+    def suggest(self, prefix: str, limit: int = MAX_SUGGESTIONS) -> List[str]:
+        """
+        Titles starting with prefix, highest weight first.
+
+        Args:
+            prefix: User input so far
+            limit: Maximum number of titles (at most MAX_SUGGESTIONS)
+
+        Returns:
+            List of titles
+        """
+        key = fold(prefix)
+        if not key:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+        best = self.top.get(key)
+        if best is None:
+            lo = bisect_left(self.keys, key)
+            hi = bisect_left(self.keys, key + '\uffff', lo)
+            best = self._best(lo, hi, limit)
+        return [self.titles[i] for i in best[:limit]]
+
+title_index: Optional[TitleIndex] = None
+
+def load_title_index(path: str = TITLES_PATH) -> Optional[TitleIndex]:
+    """Load the title list at startup; autocomplete stays empty if it is missing."""
+    global title_index
+    if not os.path.exists(path):
+        print(f"[Suggest] No title list at {path}")
+        return None
+    title_index = TitleIndex.load(path)
+    print(f"[Suggest] Loaded {len(title_index)} titles")
+    return title_index
+
+@router.get("/suggest")
+async def suggest(q: str = Query("", description="Början av en artikeltitel"),
+                  limit: int = Query(8, ge=1, le=MAX_SUGGESTIONS)):
+    """Title autocomplete served from the in-memory prefix index (no upstream calls)."""
+    titles = title_index.suggest(q, limit) if title_index is not None else []
+    return JSONResponse({
+        "query": q,
+        "suggestions": [
+            {"title": title, "url": f"https://sv.wikipedia.org/wiki/{title.replace(' ', '_')}"}
+            for title in titles
+        ]
+    })
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for admission control (admission.py).
+Run with pytest, or directly: python test_admission.py
+"""
+
+import asyncio
+
+import admission
+from admission import Admission, Overloaded
+
+def test_excess_searches_are_shed():
+    async def run():
+        limiter = Admission(max_in_flight=1, queue_size=1, max_wait=0.2)
+        release = asyncio.Event()
+
+        async def search():
+            async with limiter.admit():
+                await release.wait()
+
+        first = asyncio.create_task(search())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(search())
+        await asyncio.sleep(0)
+        try:
+            async with limiter.admit():
+                raise AssertionError("admitted past the queue")
+        except Overloaded as e:
+            assert e.retry_after == admission.RETRY_AFTER
+        release.set()
+        await asyncio.gather(first, queued)
+        return limiter
+
+    limiter = asyncio.run(run())
+    assert (limiter.in_flight, limiter.admitted, limiter.shed) == (0, 2, 1)
+
+def test_turn_handed_over_as_wait_times_out_is_released():
+    saved = admission.asyncio.wait_for
+
+    async def run():
+        limiter = Admission(max_in_flight=1, queue_size=1, max_wait=0.1)
+        release = asyncio.Event()
+
+        async def holder():
+            async with limiter.admit():
+                await release.wait()
+
+        async def wait_for(future, timeout):
+            # The holder finishes and hands its turn over just as the wait expires
+            release.set()
+            await future
+            raise asyncio.TimeoutError
+
+        task = asyncio.create_task(holder())
+        await asyncio.sleep(0)
+        admission.asyncio.wait_for = wait_for
+        try:
+            async with limiter.admit():
+                raise AssertionError("admitted after the wait timed out")
+        except Overloaded:
+            pass
+        finally:
+            admission.asyncio.wait_for = saved
+        await task
+        return limiter
+
+    try:
+        limiter = asyncio.run(run())
+    finally:
+        admission.asyncio.wait_for = saved
+    assert (limiter.in_flight, limiter.expired) == (0, 1)
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"  ✓ {name}")
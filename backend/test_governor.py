@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for the upstream governor (governor.py): priority order, the host-wide
+concurrency cap and token bucket, and hedges counted against the budget.
+Run with pytest, or directly: python test_governor.py
+"""
+
+import asyncio
+import tempfile
+
+import httpx
+
+from governor import BACKGROUND, FALLBACK, PRIMARY, SECONDARY, Governor, HostLimits
+from upstream import ResilientClient
+
+def test_waiting_calls_served_by_priority_then_arrival():
+    async def run() -> list:
+        governor = Governor(HostLimits(concurrency=1, rate=0, directory=None))
+        order = []
+        release = asyncio.Event()
+
+        async def call(name: str, priority: int) -> None:
+            async with governor.slot(priority):
+                order.append(name)
+                if name == "holder":
+                    await release.wait()
+
+        holder = asyncio.create_task(call("holder", PRIMARY))
+        await asyncio.sleep(0)
+        waiting = []
+        for name, priority in [("refresh", BACKGROUND), ("fallback", FALLBACK), ("variant", SECONDARY),
+                               ("first", PRIMARY), ("second", PRIMARY)]:
+            waiting.append(asyncio.create_task(call(name, priority)))
+            await asyncio.sleep(0)
+        assert governor.stats()["queued"] == {"primary": 2, "secondary": 1, "fallback": 1, "background": 1}
+        release.set()
+        await asyncio.gather(holder, *waiting)
+        return order
+
+    assert asyncio.run(run()) == ["holder", "first", "second", "variant", "fallback", "refresh"]
+
+def test_concurrency_cap_holds_under_load():
+    async def run() -> int:
+        governor = Governor(HostLimits(concurrency=3, rate=0, directory=None))
+        peak = 0
+
+        async def call(priority: int) -> None:
+            nonlocal peak
+            async with governor.slot(priority):
+                peak = max(peak, governor.in_flight)
+                await asyncio.sleep(0.005)
+
+        await asyncio.gather(*(call(i % 4) for i in range(40)))
+        assert governor.in_flight == 0
+        return peak
+
+    assert asyncio.run(run()) == 3
+
+def test_slots_and_bucket_shared_between_workers():
+    with tempfile.TemporaryDirectory() as tmp:
+        # Two HostLimits on one directory stand in for two workers
+        first = HostLimits(concurrency=2, rate=0, directory=tmp)
+        second = HostLimits(concurrency=2, rate=0, directory=tmp)
+        held = [first.try_acquire()[0], first.try_acquire()[0]]
+        assert None not in held
+        assert second.try_acquire()[0] is None
+        first.release(held[0])
+        slot, _ = second.try_acquire()
+        assert slot == held[0]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        first = HostLimits(concurrency=10, rate=1, burst=2, directory=tmp)
+        second = HostLimits(concurrency=10, rate=1, burst=2, directory=tmp)
+        assert first.try_acquire()[0] is not None
+        assert second.try_acquire()[0] is not None
+        slot, wait = first.try_acquire()
+        assert slot is None and 0.5 < wait <= 1.0
+
+def test_hedge_needs_a_free_slot():
+    async def run(concurrency: int) -> int:
+        governor = Governor(HostLimits(concurrency=concurrency, rate=0, directory=None))
+        sent = 0
+
+        async def slow(request: httpx.Request) -> httpx.Response:
+            nonlocal sent
+            sent += 1
+            await asyncio.sleep(0.05)
+            return httpx.Response(200, json={})
+
+        upstream = ResilientClient()
+        for _ in range(20):
+            upstream.latency.record(0.01)
+        async with httpx.AsyncClient(transport=httpx.MockTransport(slow)) as client:
+            async with governor.slot(PRIMARY):
+                await upstream.get(client, "http://wiki.test/w/api.php", {}, governor.spare_slot)
+                assert governor.in_flight == 1
+        assert governor.in_flight == 0
+        return sent
+
+    # With a slot to spare the slow call is hedged; at the cap it is not
+    assert asyncio.run(run(2)) == 2
+    assert asyncio.run(run(1)) == 1
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"  ✓ {name}")
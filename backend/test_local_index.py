@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Tests for the local dump index (local_index.py) against a small fixture dump.
+Run with pytest, or directly: python test_local_index.py
+"""
+
+import asyncio
+import os
+import tempfile
+
+import local_index
+import search
+
+FIXTURE_DUMP = os.path.join(os.path.dirname(__file__), "fixtures", "svwiki-test-pages-articles.xml.bz2")
+
+def build_fixture_index(out_dir: str, **kwargs) -> local_index.LocalIndex:
+    local_index.build_index(FIXTURE_DUMP, out_dir, **kwargs)
+    return local_index.LocalIndex(out_dir)
+
+def test_dump_streaming_skips_redirects_and_other_namespaces():
+    titles = [title for title, _ in local_index.iter_dump_pages(FIXTURE_DUMP)]
+    assert titles == ["Stockholm", "Sverige", "Gustav Vasa", "Stockholms stad", "Kvantfysik"]
+
+def test_lead_extraction_strips_markup():
+    leads = dict(local_index.iter_dump_pages(FIXTURE_DUMP))
+    assert leads["Stockholm"].startswith("Stockholm är Sveriges huvudstad")
+    assert "Historia" not in leads["Stockholm"]
+    assert "SCB" not in leads["Stockholm"]
+    assert leads["Gustav Vasa"] == "Gustav Eriksson Vasa var Sveriges kung 1523–1560 och grundade Vasaätten."
+
+def test_bm25_ranking():
+    with tempfile.TemporaryDirectory() as out_dir:
+        index = build_fixture_index(out_dir)
+        try:
+            assert len(index) == 5
+            assert index.search("stockholm")[0][0] == "Stockholm"
+            assert index.search("gustav vasa")[0][0] == "Gustav Vasa"
+            assert index.search("kvantmekanik")[0][0] == "Kvantfysik"
+            assert index.search("finnsinte") == []
+        finally:
+            index.close()
+
+def test_spilled_blocks_merge_to_same_index():
+    with tempfile.TemporaryDirectory() as single, tempfile.TemporaryDirectory() as spilled:
+        local_index.build_index(FIXTURE_DUMP, single)
+        local_index.build_index(FIXTURE_DUMP, spilled, block_postings=5)
+        for name in ("terms.dat", "terms.off", "postings.dat", "postings.off"):
+            with open(os.path.join(single, name), "rb") as a, open(os.path.join(spilled, name), "rb") as b:
+                assert a.read() == b.read(), name
+
+def test_search_wikipedia_local_mode_returns_api_shape():
+    with tempfile.TemporaryDirectory() as out_dir:
+        local_index.build_index(FIXTURE_DUMP, out_dir)
+        saved = search.SEARCH_MODE, search.INDEX_PATH, search._local_index
+        search.SEARCH_MODE, search.INDEX_PATH, search._local_index = "local", out_dir, None
+        try:
+            results = search.search_wikipedia("Vad är Stockholm?", limit=2)
+            assert results[0] == {
+                "title": "Stockholm",
+                "snippet": search.clean_snippet(dict(local_index.iter_dump_pages(FIXTURE_DUMP))["Stockholm"]),
+                "url": "https://sv.wikipedia.org/wiki/Stockholm"
+            }
+            assert len(results) == 2
+            assert asyncio.run(search.search_wikipedia_async("Vad är Stockholm?", limit=2)) == results
+        finally:
+            search._local_index.close()
+            search.SEARCH_MODE, search.INDEX_PATH, search._local_index = saved
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"  ✓ {name}")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the spelling index (spelling.py) and the normalizer's spelling variant.
+Run with pytest, or directly: python test_spelling.py
+"""
+
+import os
+import tempfile
+
+import normalizer
+from spelling import SpellingIndex, build_spelling_index
+
+COUNTS = {"stockholm": 900, "stockholms": 300, "sverige": 800, "göteborg": 500, "kvantfysik": 40,
+          "東京都庁舎": 10}
+
+def with_index(test) -> None:
+    """Build COUNTS into a temporary index and run test(index)."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "spelling.bin")
+        assert build_spelling_index(COUNTS, path) == len(COUNTS)
+        index = SpellingIndex(path)
+        try:
+            test(index)
+        finally:
+            index.close()
+
+def test_lookup_finds_closest_then_most_frequent():
+    def test(index: SpellingIndex) -> None:
+        assert len(index) == len(COUNTS)
+        assert index.lookup("stockholm") == ("stockholm", 0)
+        assert index.lookup("stokholm") == ("stockholm", 1)
+        assert index.lookup("sverieg") == ("sverige", 1)     # transposition
+        assert index.lookup("goteborg") == ("göteborg", 1)
+        assert index.lookup("kvantfysk") == ("kvantfysik", 1)
+        assert index.lookup("xyzzyqwv") is None
+
+    with_index(test)
+
+def test_lookup_keeps_terms_with_multibyte_characters():
+    def test(index: SpellingIndex) -> None:
+        # 5 characters in 15 bytes: more than twice the word plus distance
+        assert index.lookup("東京都庁") == ("東京都庁舎", 1)
+
+    with_index(test)
+
+def test_correct_skips_known_short_and_non_words():
+    def test(index: SpellingIndex) -> None:
+        assert index.correct("stokholm") == "stockholm"
+        assert index.correct("stockholm") is None   # known
+        assert index.correct("sve") is None         # too short
+        assert index.correct("stokh0lm") is None    # not a word
+        assert index.correct("xyzzyqwv") is None    # nothing close
+
+    with_index(test)
+
+def test_normalizer_adds_spelling_variant_after_original():
+    def test(index: SpellingIndex) -> None:
+        saved = normalizer.spelling_index, normalizer.lemma_table
+        normalizer.set_lemma_table(None)
+        normalizer.set_spelling_index(index)
+        try:
+            tagged = normalizer.normalize_with_rules("Vad är stokholm?")
+            assert tagged[0] == ("Vad är stokholm?", "original")
+            assert tagged[1] == ("stockholm", "spelling")
+            assert "spelling" not in [rule for _, rule in normalizer.normalize_with_rules("stockholm")]
+        finally:
+            normalizer.set_spelling_index(saved[0])
+            normalizer.set_lemma_table(saved[1])
+
+    with_index(test)
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"  ✓ {name}")
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Tests for the dynamic DNS updater (update_dns.py) against a stand-in
+Netlify API and IP lookup served on a loopback port.
+Run with pytest, or directly: python test_update_dns.py
+"""
+
+import json
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import update_dns
+
+class FakeNetlify(BaseHTTPRequestHandler):
+    """GET /ip answers the current public IP; /api/v1/... keeps DNS records in memory."""
+    public_ip = "203.0.113.5"
+    records: list = []
+    calls: list = []
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def reply(self, status: int, body) -> None:
+        data = (body if isinstance(body, str) else json.dumps(body)).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def body(self) -> dict:
+        return json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+    def do_GET(self) -> None:
+        self.calls.append(("GET", self.path))
+        if self.path == "/ip":
+            self.reply(200, self.public_ip)
+        else:
+            self.reply(200, self.records)
+
+    def do_POST(self) -> None:
+        self.calls.append(("POST", self.path))
+        record = {**self.body(), "id": f"rec{len(self.records) + 1}"}
+        self.records.append(record)
+        self.reply(201, record)
+
+    def do_PUT(self) -> None:
+        self.calls.append(("PUT", self.path))
+        record_id = self.path.rsplit('/', 1)[1]
+        record = next((r for r in self.records if r["id"] == record_id), None)
+        if record is None:
+            self.reply(404, {"message": "Not found"})
+            return
+        record.update(self.body())
+        self.reply(200, record)
+
+def run_against_fake(test) -> None:
+    """Point update_dns at a fresh stand-in server and a temporary state file, then run test(state_path)."""
+    FakeNetlify.public_ip = "203.0.113.5"
+    FakeNetlify.records = []
+    FakeNetlify.calls = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeNetlify)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    saved = update_dns.NETLIFY_API, update_dns.IP_LOOKUP_URL, update_dns.ZONE_ID
+    update_dns.NETLIFY_API = base + "/api/v1/dns_zones/{zone_id}/dns_records"
+    update_dns.IP_LOOKUP_URL = base + "/ip"
+    update_dns.ZONE_ID = "zone"
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            test(os.path.join(tmp, "dns_state.json"))
+    finally:
+        update_dns.NETLIFY_API, update_dns.IP_LOOKUP_URL, update_dns.ZONE_ID = saved
+        server.shutdown()
+        server.server_close()
+
+def writes() -> list:
+    return [call for call in FakeNetlify.calls if call[0] in ("PUT", "POST")]
+
+def test_writes_only_when_ip_changes():
+    def test(state_path: str) -> None:
+        with update_dns.create_session(retries=0) as session:
+            state = update_dns.load_state(state_path)
+            assert update_dns.sync(session, state, state_path)
+            assert [call[0] for call in writes()] == ["POST"]
+
+            # Same IP, also after a restart: only the IP lookup, no listing or write
+            FakeNetlify.calls = []
+            assert not update_dns.sync(session, update_dns.load_state(state_path), state_path)
+            assert FakeNetlify.calls == [("GET", "/ip")]
+
+            # New IP: exactly one write, straight to the saved record
+            FakeNetlify.public_ip = "203.0.113.9"
+            FakeNetlify.calls = []
+            assert update_dns.sync(session, state, state_path)
+            assert FakeNetlify.calls == [("GET", "/ip"), ("PUT", "/api/v1/dns_zones/zone/dns_records/rec1")]
+            assert FakeNetlify.records[0]["value"] == "203.0.113.9"
+            assert update_dns.load_state(state_path)["ip"] == "203.0.113.9"
+
+    run_against_fake(test)
+
+def test_record_deleted_elsewhere_is_found_again():
+    def test(state_path: str) -> None:
+        with update_dns.create_session(retries=0) as session:
+            state = {"ip": "198.51.100.1", "record_id": "gone"}
+            FakeNetlify.records.append({"id": "rec7", "type": "A", "hostname": update_dns.RECORD_NAME,
+                                        "value": "198.51.100.1"})
+            assert update_dns.sync(session, state, state_path)
+            assert [call[0] for call in writes()] == ["PUT", "PUT"]
+            assert state["record_id"] == "rec7"
+            assert FakeNetlify.records[0]["value"] == "203.0.113.5"
+
+    run_against_fake(test)
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"  ✓ {name}")
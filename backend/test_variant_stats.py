@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for the upstream variant plan (variant_stats.py), with stats kept in memory.
+Run with pytest, or directly: python test_variant_stats.py
+"""
+
+from variant_stats import ALWAYS_FETCHED, MIN_SAMPLES, RuleStats
+
+TAGGED = [("Vad är bilen?", "original"), ("bilen", "question"), ("Bilen", "capitalize"),
+          ("bil", "suffix"), ("bile", "lemma")]
+
+def teach(stats: RuleStats, rule: str, contributed: int, fetched: int = MIN_SAMPLES) -> None:
+    """Record fetched fetches of rule, contributed of them adding a result."""
+    for i in range(fetched):
+        stats.record(rule, 1 if i < contributed else 0)
+
+def test_budget_caps_calls_and_keeps_order():
+    stats = RuleStats(path=None, budget=3, seed=1)
+    teach(stats, "question", MIN_SAMPLES)
+    teach(stats, "capitalize", 10)
+    teach(stats, "suffix", 30)
+    teach(stats, "lemma", 20)
+    variants, rules = stats.plan(TAGGED)
+    # The original plus the two highest-yield rules, in normalizer order
+    assert rules == ["original", "question", "suffix"]
+    assert variants == ["Vad är bilen?", "bilen", "bil"]
+    assert stats.delta["variant_calls"] == 3
+    assert stats.delta["rules"]["capitalize"]["pruned"] == 1
+    assert stats.delta["rules"]["lemma"]["pruned"] == 1
+
+def test_unmeasured_rules_rank_first():
+    stats = RuleStats(path=None, budget=2, seed=1)
+    teach(stats, "question", MIN_SAMPLES // 2)
+    _, rules = stats.plan(TAGGED[:3])
+    assert rules == ["original", "capitalize"]
+
+def test_low_yield_rule_skipped_except_when_exploring():
+    stats = RuleStats(path=None, budget=0, min_yield=0.05, explore_rate=0.0, seed=1)
+    teach(stats, "capitalize", 0)
+    teach(stats, "question", MIN_SAMPLES)
+    _, rules = stats.plan(TAGGED[:3])
+    assert rules == ["original", "question"]
+    assert stats.snapshot()["rules"]["capitalize"]["status"] == "skipped"
+
+    exploring = RuleStats(path=None, budget=0, min_yield=0.05, explore_rate=1.0, seed=1)
+    teach(exploring, "capitalize", 0)
+    _, rules = exploring.plan(TAGGED[:3])
+    assert rules == ["original", "question", "capitalize"]
+
+def test_rule_under_min_samples_is_not_skipped():
+    stats = RuleStats(path=None, budget=0, explore_rate=0.0, seed=1)
+    teach(stats, "capitalize", 0, fetched=MIN_SAMPLES - 1)
+    assert stats.rule_yield("capitalize") is None
+    _, rules = stats.plan(TAGGED[:3])
+    assert "capitalize" in rules
+
+def test_original_is_never_pruned():
+    stats = RuleStats(path=None, budget=1, explore_rate=0.0, seed=1)
+    teach(stats, ALWAYS_FETCHED, 0)
+    teach(stats, "question", MIN_SAMPLES)
+    variants, rules = stats.plan(TAGGED)
+    assert (variants, rules) == (["Vad är bilen?"], [ALWAYS_FETCHED])
+    assert stats.delta["rules"].get(ALWAYS_FETCHED, {}).get("pruned", 0) == 0
+    assert stats.snapshot()["rules"][ALWAYS_FETCHED]["status"] == "always"
+    assert stats.plan([]) == ([], [])
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"  ✓ {name}")
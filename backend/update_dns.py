@@ -1,42 +1,203 @@
-import requests
-import os
-
-# Netlify API endpoint for DNS records
-NETLIFY_API = "https://api.netlify.com/api/v1/dns_zones/{zone_id}/dns_records"
-NETLIFY_TOKEN = os.getenv("NETLIFY_TOKEN")  # Store your Netlify personal access token in an environment variable
-ZONE_ID = os.getenv("NETLIFY_ZONE_ID")      # Store your Netlify DNS zone ID in an environment variable
-RECORD_NAME = "upsum.oscyra.solutions"      # The DNS record to update
-
-# Get public IP
-def get_public_ip():
-    return requests.get("https://api.ipify.org").text
-
-# Update Netlify DNS record
-def update_dns_record(ip):
-    headers = {
-        "Authorization": f"Bearer {NETLIFY_TOKEN}",
-        "Content-Type": "application/json"
-    }
-    # Find existing A record
-    resp = requests.get(NETLIFY_API.format(zone_id=ZONE_ID), headers=headers)
-    resp.raise_for_status()
-    records = resp.json()
-    a_record = next((r for r in records if r["type"] == "A" and r["hostname"] == RECORD_NAME), None)
-    if a_record:
-        # Update existing record
-        record_id = a_record["id"]
-        update_url = f"{NETLIFY_API.format(zone_id=ZONE_ID)}/{record_id}"
-        data = {"value": ip}
-        resp = requests.put(update_url, headers=headers, json=data)
-        resp.raise_for_status()
-        print(f"Updated A record for {RECORD_NAME} to {ip}")
-    else:
-        # Create new record
-        data = {"type": "A", "hostname": RECORD_NAME, "value": ip}
-        resp = requests.post(NETLIFY_API.format(zone_id=ZONE_ID), headers=headers, json=data)
-        resp.raise_for_status()
-        print(f"Created A record for {RECORD_NAME} with {ip}")
-
-if __name__ == "__main__":
-    ip = get_public_ip()
-    update_dns_record(ip)
+"""
+Keep the Netlify A record for RECORD_NAME pointed at this host's public IP.
+
+The last IP written and the record's ID are kept in STATE_PATH. Netlify is
+only called when the public IP differs from that: no listing, no write,
+just one IP lookup per check. A known record ID is updated directly; the
+zone is listed only when there is none yet or Netlify no longer has it.
+
+One check (e.g. from cron):
+    python update_dns.py
+Or stay running and check every UPSUM_DNS_INTERVAL seconds:
+    python update_dns.py --daemon
+
+All requests share one pooled session with timeouts, and retry with
+exponential backoff on connection errors, 429 and 5xx (creating a record
+is not retried, so it can't happen twice). UPSUM_DNS_API_BASE and
+UPSUM_DNS_IP_URL point at a local stand-in server for testing.
+"""
+
+import argparse
+import ipaddress
+import os
+import sys
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from persist import read_json, write_json
+
+# Netlify API endpoint for DNS records
+NETLIFY_API_BASE = os.getenv("UPSUM_DNS_API_BASE", "https://api.netlify.com/api/v1").rstrip("/")
+NETLIFY_API = NETLIFY_API_BASE + "/dns_zones/{zone_id}/dns_records"
+IP_LOOKUP_URL = os.getenv("UPSUM_DNS_IP_URL", "https://api.ipify.org")
+NETLIFY_TOKEN = os.getenv("NETLIFY_TOKEN")  # Store your Netlify personal access token in an environment variable
+ZONE_ID = os.getenv("NETLIFY_ZONE_ID")      # Store your Netlify DNS zone ID in an environment variable
+RECORD_NAME = os.getenv("UPSUM_DNS_RECORD", "upsum.oscyra.solutions")  # The DNS record to update
+
+STATE_PATH = os.getenv("UPSUM_DNS_STATE_PATH", os.path.join(os.path.dirname(__file__), "data", "dns_state.json"))
+CHECK_INTERVAL = float(os.getenv("UPSUM_DNS_INTERVAL", "60"))
+REQUEST_TIMEOUT = float(os.getenv("UPSUM_DNS_TIMEOUT", "10"))
+RETRIES = int(os.getenv("UPSUM_DNS_RETRIES", "3"))
+RETRY_BACKOFF = float(os.getenv("UPSUM_DNS_BACKOFF", "1"))  # seconds, doubled per retry
+
+def create_session(retries: int = RETRIES, backoff: float = RETRY_BACKOFF) -> requests.Session:
+    """
+    Pooled session that retries idempotent requests with exponential backoff.
+
+    Args:
+        retries: Retries per request after the first attempt
+        backoff: Base delay between retries (seconds)
+
+    Returns:
+        Session with the Netlify token set, if there is one
+    """
+    retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=frozenset({"GET", "PUT"}), respect_retry_after_header=True,
+                  raise_on_status=False)
+    session = requests.Session()
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=2, pool_maxsize=2)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if NETLIFY_TOKEN:
+        session.headers["Authorization"] = f"Bearer {NETLIFY_TOKEN}"
+    return session
+
+# Get public IP
+def get_public_ip(session: requests.Session) -> str:
+    """
+    This host's public IPv4 address.
+
+    Raises:
+        requests.RequestException: If the lookup fails
+        ValueError: If the answer is not an IPv4 address
+    """
+    resp = session.get(IP_LOOKUP_URL, timeout=REQUEST_TIMEOUT)
+    resp.raise_for_status()
+    return str(ipaddress.IPv4Address(resp.text.strip()))
+
+def load_state(path: str = STATE_PATH) -> Dict[str, Any]:
+    """Last IP written and record ID, or an empty dict."""
+    try:
+        return read_json(path) or {}
+    except (OSError, ValueError) as e:
+        print(f"[DNS] Could not load {path}: {e}")
+        return {}
+
+def find_record(session: requests.Session) -> Optional[Dict[str, Any]]:
+    """The zone's A record for RECORD_NAME, if any (lists the whole zone)."""
+    resp = session.get(NETLIFY_API.format(zone_id=ZONE_ID), timeout=REQUEST_TIMEOUT)
+    resp.raise_for_status()
+    return next((r for r in resp.json() if r["type"] == "A" and r["hostname"] == RECORD_NAME), None)
+
+# Update Netlify DNS record
+def update_dns_record(session: requests.Session, ip: str, record_id: Optional[str] = None) -> str:
+    """
+    Point the A record at ip, creating it if needed.
+
+    Args:
+        session: Session from create_session
+        ip: New address
+        record_id: Record to update without listing the zone first
+
+    Returns:
+        ID of the record written
+
+    Raises:
+        requests.RequestException: If Netlify rejects a request or can't be reached
+    """
+    if record_id:
+        resp = session.put(f"{NETLIFY_API.format(zone_id=ZONE_ID)}/{record_id}", json={"value": ip},
+                           timeout=REQUEST_TIMEOUT)
+        if resp.status_code != 404:
+            resp.raise_for_status()
+            print(f"[DNS] Updated A record for {RECORD_NAME} to {ip}")
+            return record_id
+        print(f"[DNS] Record {record_id} is gone, looking it up again")
+
+    # Find existing A record
+    a_record = find_record(session)
+    if a_record:
+        record_id = a_record["id"]
+        if a_record.get("value") == ip:
+            print(f"[DNS] A record for {RECORD_NAME} already points to {ip}")
+            return record_id
+        # Update existing record
+        resp = session.put(f"{NETLIFY_API.format(zone_id=ZONE_ID)}/{record_id}", json={"value": ip},
+                           timeout=REQUEST_TIMEOUT)
+        resp.raise_for_status()
+        print(f"[DNS] Updated A record for {RECORD_NAME} to {ip}")
+        return record_id
+
+    # Create new record
+    data = {"type": "A", "hostname": RECORD_NAME, "value": ip}
+    resp = session.post(NETLIFY_API.format(zone_id=ZONE_ID), json=data, timeout=REQUEST_TIMEOUT)
+    resp.raise_for_status()
+    print(f"[DNS] Created A record for {RECORD_NAME} with {ip}")
+    return resp.json()["id"]
+
+def sync(session: requests.Session, state: Dict[str, Any], state_path: str = STATE_PATH) -> bool:
+    """
+    One check: update the record if the public IP changed since the last write.
+
+    Args:
+        session: Session from create_session
+        state: Result of load_state; updated in place and saved after a write
+        state_path: Where state is saved
+
+    Returns:
+        True if Netlify was written to (or found already up to date)
+    """
+    ip = get_public_ip(session)
+    if ip == state.get("ip") and state.get("record_id"):
+        return False
+    record_id = update_dns_record(session, ip, state.get("record_id"))
+    state.update(ip=ip, record_id=record_id, updated=time.time())
+    try:
+        write_json(state_path, state)
+    except OSError as e:
+        print(f"[DNS] Could not save {state_path}: {e}")
+    return True
+
+def run_daemon(session: requests.Session, interval: float = CHECK_INTERVAL, state_path: str = STATE_PATH) -> None:
+    """Check every interval seconds until interrupted; failures are logged and retried next time."""
+    state = load_state(state_path)
+    print(f"[DNS] Watching public IP for {RECORD_NAME} every {interval:.0f} s (last: {state.get('ip', 'unknown')})")
+    while True:
+        started = time.monotonic()
+        try:
+            sync(session, state, state_path)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            print(f"[DNS] Check failed: {e}")
+        time.sleep(max(0.0, interval - (time.monotonic() - started)))
+
+def main(argv: Optional[list] = None) -> int:
+    parser = argparse.ArgumentParser(description=f"Point the Netlify A record for {RECORD_NAME} at this host")
+    parser.add_argument("--daemon", action="store_true", help="keep running and check periodically")
+    parser.add_argument("--interval", type=float, default=CHECK_INTERVAL, help="seconds between checks")
+    parser.add_argument("--state", default=STATE_PATH, help="file holding the last IP and record ID")
+    args = parser.parse_args(argv)
+    if not NETLIFY_TOKEN or not ZONE_ID:
+        print("[DNS] NETLIFY_TOKEN and NETLIFY_ZONE_ID must be set")
+        return 1
+
+    with create_session() as session:
+        if args.daemon:
+            try:
+                run_daemon(session, args.interval, args.state)
+            except KeyboardInterrupt:
+                pass
+            return 0
+        try:
+            if not sync(session, load_state(args.state), args.state):
+                print("[DNS] Public IP unchanged, nothing to do")
+        except (requests.RequestException, ValueError, KeyError) as e:
+            print(f"[DNS] Update failed: {e}")
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
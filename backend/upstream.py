@@ -0,0 +1,249 @@
+"""
+Resilient MediaWiki client: adaptive timeouts, hedged requests, a circuit
+breaker and a per-request deadline.
+
+- Timeouts follow observed latency (p99 x TIMEOUT_MULTIPLIER, clamped).
+- A call still running after the observed p95 gets one duplicate (hedge);
+  the first success wins. Hedges are capped at HEDGE_BUDGET of calls, and
+  need capacity of their own from the hedge_slot passed to get().
+- When the error rate over BREAKER_WINDOW seconds reaches
+  BREAKER_ERROR_RATE, the breaker opens and calls fail immediately with
+  UpstreamUnavailable for BREAKER_COOLDOWN seconds, then a single probe
+  decides whether to close it again.
+- request_deadline() bounds everything a /search request sends upstream;
+  no call outlives the time left.
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, ContextManager, Deque, Dict, Iterator, Optional, Tuple
+
+import httpx
+
+SEARCH_DEADLINE = float(os.getenv("UPSUM_SEARCH_DEADLINE", "4.0"))
+MIN_TIMEOUT = float(os.getenv("UPSUM_UPSTREAM_MIN_TIMEOUT", "0.5"))
+MAX_TIMEOUT = float(os.getenv("UPSUM_UPSTREAM_MAX_TIMEOUT", "10"))
+TIMEOUT_MULTIPLIER = 3.0
+HEDGE_PERCENTILE = float(os.getenv("UPSUM_HEDGE_PERCENTILE", "95"))
+HEDGE_BUDGET = float(os.getenv("UPSUM_HEDGE_BUDGET", "0.1"))
+BREAKER_ERROR_RATE = float(os.getenv("UPSUM_BREAKER_ERROR_RATE", "0.5"))
+BREAKER_MIN_REQUESTS = 20
+BREAKER_WINDOW = 30.0
+BREAKER_COOLDOWN = float(os.getenv("UPSUM_BREAKER_COOLDOWN", "15"))
+
+# Latency samples kept, and how many are needed before percentiles are trusted
+LATENCY_SAMPLES = 512
+MIN_SAMPLES = 20
+
+_deadline: ContextVar[Optional[float]] = ContextVar("upsum_deadline", default=None)
+
+class UpstreamUnavailable(Exception):
+    """Raised instead of calling upstream while the circuit breaker is open."""
+
+@contextmanager
+def request_deadline(seconds: float = SEARCH_DEADLINE) -> Iterator[float]:
+    """Bound upstream work started inside the block (and tasks it spawns)."""
+    deadline = time.monotonic() + seconds
+    token = _deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _deadline.reset(token)
+
+def time_left() -> Optional[float]:
+    """Seconds until the current deadline, or None if there is none."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+class LatencyTracker:
+    """Sliding window of successful call latencies."""
+
+    def __init__(self, size: int = LATENCY_SAMPLES):
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def record(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if len(self.samples) < MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+class CircuitBreaker:
+    """Error-rate breaker: closed -> open -> half-open -> closed."""
+
+    def __init__(self, error_rate: float = BREAKER_ERROR_RATE, min_requests: int = BREAKER_MIN_REQUESTS,
+                 window: float = BREAKER_WINDOW, cooldown: float = BREAKER_COOLDOWN):
+        self.error_rate = error_rate
+        self.min_requests = min_requests
+        self.window = window
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+
+    def allow(self) -> bool:
+        """Whether a call may go upstream now."""
+        if self.state == "closed":
+            return True
+        if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = "half_open"
+        # A probe that never reported back (e.g. cancelled) is replaced after a cooldown
+        now = time.monotonic()
+        if self.state == "half_open" and (not self._probe_in_flight or now - self._probe_started >= self.cooldown):
+            self._probe_in_flight = True
+            self._probe_started = now
+            return True
+        return False
+
+    def record(self, ok: bool) -> None:
+        now = time.monotonic()
+        if self.state == "half_open" and self._probe_in_flight:
+            self._probe_in_flight = False
+            if ok:
+                self.state = "closed"
+                self._outcomes.clear()
+            else:
+                self._open(now)
+            return
+
+        self._outcomes.append((now, ok))
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+        failures = sum(1 for _, outcome in self._outcomes if not outcome)
+        if (self.state == "closed" and len(self._outcomes) >= self.min_requests
+                and failures / len(self._outcomes) >= self.error_rate):
+            self._open(now)
+
+    def _open(self, now: float) -> None:
+        self.state = "open"
+        self.opened_at = now
+        self.times_opened += 1
+        self._outcomes.clear()
+
+class ResilientClient:
+    """Wraps httpx GETs with adaptive timeouts, hedging and a circuit breaker."""
+
+    def __init__(self):
+        self.latency = LatencyTracker()
+        self.breaker = CircuitBreaker()
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def timeout(self) -> float:
+        """Per-attempt timeout from observed p99, capped by the request deadline."""
+        p99 = self.latency.percentile(99)
+        timeout = MAX_TIMEOUT if p99 is None else min(MAX_TIMEOUT, max(MIN_TIMEOUT, p99 * TIMEOUT_MULTIPLIER))
+        remaining = time_left()
+        if remaining is not None:
+            timeout = min(timeout, remaining)
+        return timeout
+
+    async def _attempt(self, client: httpx.AsyncClient, url: str, params: Dict[str, Any],
+                       timeout: float) -> httpx.Response:
+        if timeout <= 0:
+            raise httpx.TimeoutException("Request deadline exceeded")
+        start = time.monotonic()
+        response = await client.get(url, params=params, timeout=timeout)
+        if response.status_code < 500:
+            self.latency.record(time.monotonic() - start)
+        return response
+
+    async def get(self, client: httpx.AsyncClient, url: str, params: Dict[str, Any],
+                  hedge_slot: Optional[Callable[[], ContextManager[bool]]] = None) -> httpx.Response:
+        """
+        GET through the breaker, hedging slow calls.
+
+        Args:
+            client: Pooled client
+            url: API endpoint
+            params: Query parameters
+            hedge_slot: Returns a context manager holding capacity for the
+                hedge while it runs, entered as True if there is any (e.g.
+                Governor.spare_slot); a call is only hedged when it is
+
+        Raises:
+            UpstreamUnavailable: breaker is open
+            httpx.HTTPError: both attempts failed or the deadline passed
+        """
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise UpstreamUnavailable("MediaWiki circuit breaker is open")
+
+        self.calls += 1
+        timeout = self.timeout()
+        hedge_after = self.latency.percentile(HEDGE_PERCENTILE)
+        primary = asyncio.ensure_future(self._attempt(client, url, params, timeout))
+        attempts = [primary]
+        with ExitStack() as held:
+            try:
+                if hedge_after is not None and hedge_after < timeout and self.hedges < HEDGE_BUDGET * self.calls:
+                    done, _ = await asyncio.wait(attempts, timeout=hedge_after)
+                    if not done and (hedge_slot is None or held.enter_context(hedge_slot())):
+                        self.hedges += 1
+                        attempts.append(asyncio.ensure_future(
+                            self._attempt(client, url, params, timeout - hedge_after)
+                        ))
+
+                response, winner = await self._first_success(attempts)
+                if winner is not primary:
+                    self.hedge_wins += 1
+            except Exception:
+                self.failures += 1
+                self.breaker.record(False)
+                raise
+            finally:
+                for attempt in attempts:
+                    attempt.cancel()
+
+        self.breaker.record(response.status_code < 500)
+        if response.status_code >= 500:
+            self.failures += 1
+        return response
+
+    @staticmethod
+    async def _first_success(attempts) -> Tuple[httpx.Response, asyncio.Future]:
+        """First attempt to return a non-5xx response, else the last outcome."""
+        pending = set(attempts)
+        last: Optional[asyncio.Future] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for attempt in done:
+                last = attempt
+                if attempt.exception() is None and attempt.result().status_code < 500:
+                    return attempt.result(), attempt
+        return last.result(), last
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters for /health."""
+        def ms(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value * 1000, 1)
+
+        return {
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.times_opened,
+            "calls": self.calls,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "latency_ms": {
+                "p50": ms(self.latency.percentile(50)),
+                "p95": ms(self.latency.percentile(95)),
+                "p99": ms(self.latency.percentile(99))
+            },
+            "timeout_ms": ms(self.timeout())
+        }
@@ -0,0 +1,209 @@
+"""
+Per-rule yield statistics and the upstream budget for query variants.
+
+Every variant from the normalizer is tagged with the rule that produced it
+(normalizer.RULES). After a search, each fetched variant is credited with
+the number of results it added that earlier variants had not already found.
+A rule's yield is the share of its fetches that added anything.
+
+plan() uses the yields to choose which variants go upstream:
+- the original query is always fetched;
+- rules whose yield is below MIN_YIELD (after MIN_SAMPLES fetches) are
+  skipped, except on EXPLORE_RATE of searches so their numbers stay current;
+- the rest are ranked by yield and cut to UPSTREAM_BUDGET calls per query.
+Chosen variants keep their normal order, so result ranking is unchanged.
+
+Counts are saved as JSON to STATS_PATH (on shutdown and every
+SAVE_INTERVAL seconds) and loaded at startup. Each worker adds its own
+counts to the file under a lock, so the file holds totals for all workers.
+"""
+
+import asyncio
+import os
+import random
+from typing import Any, Dict, List, Optional, Tuple
+
+from persist import read_json, update_json
+
+STATS_PATH = os.getenv("UPSUM_RULE_STATS_PATH", os.path.join(os.path.dirname(__file__), "data", "rule_stats.json"))
+UPSTREAM_BUDGET = int(os.getenv("UPSUM_UPSTREAM_BUDGET", "3"))  # list=search calls per query, 0 = no limit
+MIN_YIELD = float(os.getenv("UPSUM_RULE_MIN_YIELD", "0.05"))
+MIN_SAMPLES = 50
+EXPLORE_RATE = 0.05
+SAVE_INTERVAL = float(os.getenv("UPSUM_RULE_STATS_SAVE_INTERVAL", "300"))
+
+RULE_FIELDS = ('fetched', 'contributed', 'new_results', 'pruned')
+
+# Rule of the first variant (the query as typed), which plan() always fetches
+ALWAYS_FETCHED = 'original'
+
+Counts = Dict[str, Any]
+
+def empty_counts() -> Counts:
+    return {"searches": 0, "variant_calls": 0, "rules": {}}
+
+def add_counts(target: Counts, source: Counts) -> None:
+    """Add source into target in place."""
+    target["searches"] += source.get("searches", 0)
+    target["variant_calls"] += source.get("variant_calls", 0)
+    for rule, fields in source.get("rules", {}).items():
+        entry = target["rules"].setdefault(rule, dict.fromkeys(RULE_FIELDS, 0))
+        for field in RULE_FIELDS:
+            entry[field] += fields.get(field, 0)
+
+class RuleStats:
+    """Rule yield counters for this worker, on top of the persisted totals."""
+
+    def __init__(self, path: Optional[str] = STATS_PATH, budget: int = UPSTREAM_BUDGET,
+                 min_yield: float = MIN_YIELD, explore_rate: float = EXPLORE_RATE,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            path: JSON file for persisted totals (None keeps stats in memory only)
+            budget: Upstream list=search calls per query (0 = no limit)
+            min_yield: Yield below which a rule is skipped
+            explore_rate: Share of searches that still fetch skipped rules
+            seed: Random seed for exploration
+        """
+        self.path = path
+        self.budget = budget
+        self.min_yield = min_yield
+        self.explore_rate = explore_rate
+        self.saved = empty_counts()
+        self.delta = empty_counts()
+        self._rng = random.Random(seed)
+        self.load()
+
+    def _rule(self, counts: Counts, rule: str) -> Dict[str, int]:
+        return counts["rules"].setdefault(rule, dict.fromkeys(RULE_FIELDS, 0))
+
+    def rule_yield(self, rule: str) -> Optional[float]:
+        """Share of fetches that added new results, or None while under MIN_SAMPLES."""
+        fetched = contributed = 0
+        for counts in (self.saved, self.delta):
+            entry = counts["rules"].get(rule)
+            if entry:
+                fetched += entry["fetched"]
+                contributed += entry["contributed"]
+        if fetched < MIN_SAMPLES:
+            return None
+        return contributed / fetched
+
+    def plan(self, tagged: List[Tuple[str, str]]) -> Tuple[List[str], List[str]]:
+        """
+        Choose the variants to fetch for one search.
+
+        Args:
+            tagged: (variant, rule) pairs from normalize_with_rules
+
+        Returns:
+            (variants, rules) to fetch, in their original order
+        """
+        self.delta["searches"] += 1
+        if not tagged:
+            return [], []
+
+        candidates = []
+        for position, (variant, rule) in enumerate(tagged[1:], 1):
+            rule_yield = self.rule_yield(rule)
+            if (rule_yield is not None and rule_yield < self.min_yield
+                    and self._rng.random() >= self.explore_rate):
+                self._rule(self.delta, rule)["pruned"] += 1
+                continue
+            # Unmeasured rules rank first so they get measured
+            candidates.append((-(1.0 if rule_yield is None else rule_yield), position))
+
+        if self.budget > 0 and len(candidates) > self.budget - 1:
+            candidates.sort()
+            for _, position in candidates[max(0, self.budget - 1):]:
+                self._rule(self.delta, tagged[position][1])["pruned"] += 1
+            candidates = candidates[:max(0, self.budget - 1)]
+
+        chosen = [tagged[0]] + [tagged[position] for position in sorted(p for _, p in candidates)]
+        self.delta["variant_calls"] += len(chosen)
+        return [variant for variant, _ in chosen], [rule for _, rule in chosen]
+
+    def record(self, rule: str, new_results: int) -> None:
+        """Credit one completed fetch of a rule's variant with the results it added."""
+        entry = self._rule(self.delta, rule)
+        entry["fetched"] += 1
+        entry["new_results"] += new_results
+        if new_results:
+            entry["contributed"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Totals (persisted + this worker) with per-rule yields, for the stats endpoint."""
+        counts = empty_counts()
+        add_counts(counts, self.saved)
+        add_counts(counts, self.delta)
+        rules = {}
+        for rule, entry in sorted(counts["rules"].items()):
+            rule_yield = self.rule_yield(rule)
+            rules[rule] = {
+                **entry,
+                "yield": None if rule_yield is None else round(rule_yield, 4),
+                "status": ("always" if rule == ALWAYS_FETCHED
+                           else "learning" if rule_yield is None
+                           else "skipped" if rule_yield < self.min_yield else "active")
+            }
+        searches = counts["searches"]
+        return {
+            "budget": self.budget,
+            "min_yield": self.min_yield,
+            "searches": searches,
+            "variant_calls": counts["variant_calls"],
+            "calls_per_search": round(counts["variant_calls"] / searches, 3) if searches else 0.0,
+            "rules": rules
+        }
+
+    def load(self) -> None:
+        """Read persisted totals, if any."""
+        if not self.path:
+            return
+        try:
+            data = read_json(self.path)
+            if data is not None:
+                saved = empty_counts()
+                add_counts(saved, data)
+                self.saved = saved
+        except (OSError, ValueError) as e:
+            print(f"[Rules] Could not load {self.path}: {e}")
+
+    def take_delta(self) -> Counts:
+        """Detach the counts gathered since the last save."""
+        delta, self.delta = self.delta, empty_counts()
+        return delta
+
+    def write(self, delta: Counts) -> None:
+        """Add delta to the file's totals under an exclusive lock."""
+        def merge(current: Optional[Counts]) -> Counts:
+            totals = empty_counts()
+            if current is not None:
+                add_counts(totals, current)
+            add_counts(totals, delta)
+            return totals
+
+        self.saved = update_json(self.path, merge)
+
+    def save(self) -> None:
+        """Persist this worker's counts (called on shutdown)."""
+        if self.path:
+            delta = self.take_delta()
+            try:
+                self.write(delta)
+            except (OSError, ValueError) as e:
+                add_counts(self.delta, delta)
+                print(f"[Rules] Could not save {self.path}: {e}")
+
+async def run_persistence(stats: RuleStats, interval: float = SAVE_INTERVAL) -> None:
+    """Periodically save rule stats until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        if not stats.path:
+            continue
+        delta = stats.take_delta()
+        try:
+            await asyncio.to_thread(stats.write, delta)
+        except (OSError, ValueError) as e:
+            add_counts(stats.delta, delta)
+            print(f"[Rules] Could not save {stats.path}: {e}")
@@ -0,0 +1,231 @@
+"""
+Cold-start help: a query-frequency log, background warm-up and a cache snapshot.
+
+QueryLog counts searches per cache key and is merged into QUERY_LOG_PATH by
+every worker under a lock. Each entry keeps the query text as first typed
+(warm-up has to replay it; the cache key alone is lossy), a count and when
+it was last searched. Nothing about who searched is stored. Counts decay
+with a half-life of QUERY_LOG_HALF_LIFE, so yesterday's news falls out of
+the top list, and entries not searched for QUERY_LOG_RETENTION are
+dropped. Set UPSUM_QUERY_LOG_PATH to "" to keep no log at all (warm-up
+then has nothing to replay).
+
+At startup, run_warmup() searches the WARMUP_TOP most frequent queries in
+the background, WARMUP_CONCURRENCY at a time, skipping ones already cached.
+/health answers immediately; progress is reported under "warmup".
+
+With UPSUM_CACHE_SNAPSHOT set to a path, the in-process result cache is
+written there (gzip JSON, most recently used SNAPSHOT_ENTRIES entries) on
+shutdown and every SAVE_INTERVAL seconds, and loaded at startup with the
+entries' remaining TTL intact. The sqlite cache backend persists by itself
+and needs no snapshot.
+"""
+
+import asyncio
+import gzip
+import json
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from cache import ResultCache
+from persist import read_json, update_json
+
+QUERY_LOG_PATH = os.getenv("UPSUM_QUERY_LOG_PATH", os.path.join(os.path.dirname(__file__), "data", "query_log.json"))
+QUERY_LOG_HALF_LIFE = 7 * 86400
+QUERY_LOG_MAX = 10000
+QUERY_LOG_RETENTION = float(os.getenv("UPSUM_QUERY_LOG_RETENTION", str(30 * 86400)))  # seconds
+
+WARMUP_TOP = int(os.getenv("UPSUM_WARMUP_TOP", "100"))  # 0 disables warm-up
+WARMUP_CONCURRENCY = int(os.getenv("UPSUM_WARMUP_CONCURRENCY", "4"))
+
+SNAPSHOT_PATH = os.getenv("UPSUM_CACHE_SNAPSHOT", "")
+SNAPSHOT_ENTRIES = 2000
+SAVE_INTERVAL = 300
+
+# (key, query, limit) of a logged search
+LoggedQuery = Tuple[str, str, int]
+
+warmup_stats: Dict[str, Any] = {"planned": 0, "warmed": 0, "skipped": 0, "failed": 0,
+                                "running": False, "seconds": 0.0, "snapshot_restored": 0}
+
+class QueryLog:
+    """Search counts per cache key for this worker, on top of the persisted totals."""
+
+    def __init__(self, path: Optional[str] = QUERY_LOG_PATH):
+        self.path = path
+        self.saved: Dict[str, Dict[str, Any]] = {}
+        self.delta: Dict[str, Dict[str, Any]] = {}
+        self.load()
+
+    def record(self, key: str, query: str, limit: int) -> None:
+        entry = self.delta.get(key)
+        if entry is None:
+            entry = self.delta[key] = {"query": query, "limit": limit, "count": 0}
+        entry["count"] += 1
+        entry["last_seen"] = time.time()
+
+    def top(self, n: int) -> List[LoggedQuery]:
+        """The n most frequent searches (persisted + this worker)."""
+        counts = {key: entry["count"] for key, entry in self.saved.items()}
+        for key, entry in self.delta.items():
+            counts[key] = counts.get(key, 0) + entry["count"]
+        ranked = sorted(counts, key=counts.get, reverse=True)[:n]
+        return [(key, (self.delta.get(key) or self.saved[key])["query"],
+                 (self.delta.get(key) or self.saved[key])["limit"]) for key in ranked]
+
+    def load(self) -> None:
+        """Read persisted counts, if any."""
+        if not self.path:
+            return
+        try:
+            data = read_json(self.path)
+            if data is not None:
+                self.saved = retained(data.get("queries", {}), data.get("saved_at", 0), time.time())
+        except (OSError, ValueError) as e:
+            print(f"[Warmup] Could not load {self.path}: {e}")
+
+    def take_delta(self) -> Dict[str, Dict[str, Any]]:
+        """Detach the counts gathered since the last save."""
+        delta, self.delta = self.delta, {}
+        return delta
+
+    def restore_delta(self, delta: Dict[str, Dict[str, Any]]) -> None:
+        """Put back counts whose save failed."""
+        for key, entry in delta.items():
+            self.delta.setdefault(key, {**entry, "count": 0})["count"] += entry["count"]
+
+    def write(self, delta: Dict[str, Dict[str, Any]]) -> None:
+        """Decay the file's counts, add delta and keep the QUERY_LOG_MAX most frequent."""
+        def merge(current: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+            now = time.time()
+            current = current or {}
+            decay = 0.5 ** (max(0.0, now - current.get("saved_at", now)) / QUERY_LOG_HALF_LIFE)
+            queries = {key: {**entry, "count": entry["count"] * decay}
+                       for key, entry in retained(current.get("queries", {}), current.get("saved_at", now),
+                                                  now).items()}
+            for key, entry in delta.items():
+                if key in queries:
+                    queries[key]["count"] += entry["count"]
+                    queries[key]["last_seen"] = max(queries[key].get("last_seen", 0), entry["last_seen"])
+                else:
+                    queries[key] = dict(entry)
+            kept = sorted(queries, key=lambda key: queries[key]["count"], reverse=True)[:QUERY_LOG_MAX]
+            return {"saved_at": now, "queries": {key: queries[key] for key in kept}}
+
+        self.saved = update_json(self.path, merge)["queries"]
+
+    def save(self) -> None:
+        """Persist this worker's counts (called on shutdown)."""
+        if not self.path:
+            return
+        delta = self.take_delta()
+        try:
+            self.write(delta)
+        except (OSError, ValueError) as e:
+            self.restore_delta(delta)
+            print(f"[Warmup] Could not save {self.path}: {e}")
+
+def retained(queries: Dict[str, Dict[str, Any]], saved_at: float, now: float) -> Dict[str, Dict[str, Any]]:
+    """Entries searched within QUERY_LOG_RETENTION (entries without last_seen count from saved_at)."""
+    cutoff = now - QUERY_LOG_RETENTION
+    return {key: entry for key, entry in queries.items() if entry.get("last_seen", saved_at) >= cutoff}
+
+def snapshot_entries(cache, max_entries: int = SNAPSHOT_ENTRIES) -> List[Tuple[str, float, Any]]:
+    """Entries to snapshot: none unless enabled and the cache is in-process."""
+    if not SNAPSHOT_PATH or not isinstance(cache, ResultCache):
+        return []
+    return cache.export(max_entries)
+
+def write_snapshot(entries: List[Tuple[str, float, Any]], path: str = SNAPSHOT_PATH) -> None:
+    """Write exported cache entries to path atomically (gzip JSON)."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+        json.dump({"saved_at": time.time(), "entries": entries}, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp_path, path)
+
+def save_snapshot(cache) -> int:
+    """
+    Write the most recently used cache entries to SNAPSHOT_PATH (called on shutdown).
+
+    Returns:
+        Number of entries written
+    """
+    entries = snapshot_entries(cache)
+    if entries:
+        try:
+            write_snapshot(entries)
+        except OSError as e:
+            print(f"[Warmup] Could not save snapshot: {e}")
+            return 0
+    return len(entries)
+
+def load_snapshot(cache, path: str = SNAPSHOT_PATH) -> int:
+    """
+    Restore cache entries from a snapshot, aged by the time since it was saved.
+
+    Returns:
+        Number of entries restored
+    """
+    if not path or not isinstance(cache, ResultCache) or not os.path.exists(path):
+        return 0
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[Warmup] Could not load snapshot {path}: {e}")
+        return 0
+    elapsed = max(0.0, time.time() - data.get("saved_at", 0))
+    restored = cache.restore([(key, age + elapsed, results) for key, age, results in data.get("entries", [])])
+    warmup_stats["snapshot_restored"] = restored
+    print(f"[Warmup] Restored {restored} cached searches from {path}")
+    return restored
+
+async def run_warmup(queries: List[LoggedQuery], warm: Callable[[str, int], Awaitable[bool]],
+                     concurrency: int = WARMUP_CONCURRENCY) -> None:
+    """
+    Warm the cache for logged queries in the background.
+
+    Args:
+        queries: (key, query, limit), most frequent first
+        warm: Coroutine function searching one query; returns False if it was already cached
+        concurrency: Warm-up searches in flight
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    start = time.monotonic()
+    warmup_stats.update(planned=len(queries), running=True)
+
+    async def one(key: str, query: str, limit: int) -> None:
+        async with semaphore:
+            try:
+                warmed = await warm(query, limit)
+                warmup_stats["warmed" if warmed else "skipped"] += 1
+            except Exception as e:
+                warmup_stats["failed"] += 1
+                print(f"[Warmup] {query!r} failed: {e}")
+
+    try:
+        await asyncio.gather(*(one(*entry) for entry in queries))
+    finally:
+        warmup_stats.update(running=False, seconds=round(time.monotonic() - start, 3))
+    print(f"[Warmup] {warmup_stats['warmed']} searches warmed, {warmup_stats['skipped']} already cached "
+          f"in {warmup_stats['seconds']} s")
+
+async def run_saver(query_log: QueryLog, cache, interval: float = SAVE_INTERVAL) -> None:
+    """Periodically save the query log and the cache snapshot until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        if query_log.path:
+            delta = query_log.take_delta()
+            try:
+                await asyncio.to_thread(query_log.write, delta)
+            except (OSError, ValueError) as e:
+                query_log.restore_delta(delta)
+                print(f"[Warmup] Could not save {query_log.path}: {e}")
+        entries = snapshot_entries(cache)
+        if entries:
+            try:
+                await asyncio.to_thread(write_snapshot, entries)
+            except OSError as e:
+                print(f"[Warmup] Could not save snapshot: {e}")
@@ -8,20 +8,184 @@ Features:
 - Clean, minimal interface
 - Direct access to upsum.oscyra.solutions
 - Incognito mode by default
+- Optional local mode: the backend runs in-process on a loopback port
+
+Options:
+    --local          Start backend/main.py in a background thread and browse it
+                     on 127.0.0.1 instead of the remote site (or UPSUM_DESKTOP_LOCAL=1)
+    --query TEXT     Search for TEXT once the page has loaded, to time a first result
+
+The HTTP cache (frontend assets and API responses) is bounded and private to
+the session: kept in memory by default, or in a temporary directory with
+UPSUM_DESKTOP_CACHE=disk, and discarded on exit. Startup milestones (backend
+ready, page loaded, and with --query first result shown) are printed as they
+happen.
 """
 
+import argparse
+import html
+import json
+import os
+import shutil
+import socket
 import sys
-from PyQt6.QtCore import QUrl, Qt
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+# Reference point for startup timings, before Qt is loaded
+STARTED = time.perf_counter()
+
+from PyQt6 import sip
+from PyQt6.QtCore import QTimer, QUrl, Qt
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QVBoxLayout, 
     QWidget, QLineEdit, QPushButton, QHBoxLayout
 )
 from PyQt6.QtWebEngineWidgets import QWebEngineView
-from PyQt6.QtWebEngineCore import QWebEngineProfile, QWebEngineSettings
+from PyQt6.QtWebEngineCore import QWebEnginePage, QWebEngineProfile, QWebEngineSettings
+
+HOME_URL = "https://upsum.oscyra.solutions"
+BACKEND_DIR = Path(os.getenv("UPSUM_BACKEND_DIR", Path(__file__).resolve().parent.parent / "backend"))
+
+# HTTP cache for the session: "memory", "disk" (temporary directory) or "none"
+CACHE_MODE = os.getenv("UPSUM_DESKTOP_CACHE", "memory")
+CACHE_MAX_BYTES = int(os.getenv("UPSUM_DESKTOP_CACHE_MB", "64")) * 1024 * 1024
+BACKEND_START_TIMEOUT = float(os.getenv("UPSUM_DESKTOP_BACKEND_TIMEOUT", "30"))
+FIRST_RESULT_TIMEOUT = 30.0  # seconds to wait for the --query search to show a hit
+
+# Backend settings for the embedded server: caches in memory and bounded,
+# nothing about the session written to disk. Explicit environment wins.
+LOCAL_BACKEND_ENV = {
+    "UPSUM_CACHE_BACKEND": "memory",
+    "UPSUM_CACHE_SIZE": "512",
+    "UPSUM_ARTICLE_CACHE_SIZE": "1024",
+    "UPSUM_QUERY_LOG_PATH": "",
+    "UPSUM_RULE_STATS_PATH": "",
+    "UPSUM_CACHE_SNAPSHOT": "",
+    "UPSUM_GOVERNOR_DIR": "",
+    "UPSUM_WARMUP_TOP": "0",
+}
+
+# Shown while the local backend starts, or if it fails
+MESSAGE_HTML = """<!DOCTYPE html>
+<html lang="sv"><body style="background:#05070b;color:#e5e9f0;font-family:sans-serif;
+display:flex;flex-direction:column;align-items:center;justify-content:center;height:90vh">
+<h2>{title}</h2><p style="color:#88c0d0">{detail}</p></body></html>"""
+
+# Polled after each page load: true once the first search result is on screen
+FIRST_RESULT_JS = "!!(document.getElementById('count') && document.getElementById('count').textContent)"
+
+def elapsed_ms() -> float:
+    return (time.perf_counter() - STARTED) * 1000
+
+class StartupTimer:
+    """Time from process start to each startup milestone, reported once each."""
 
-class UpsumBrowser(QMainWindow):
     def __init__(self):
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, name: str) -> None:
+        if name not in self.marks:
+            self.marks[name] = elapsed_ms()
+            print(f"[Startup] {name}: {self.marks[name]:.0f} ms")
+
+    def report(self) -> str:
+        return ", ".join(f"{name} {ms:.0f} ms" for name, ms in self.marks.items())
+
+class LocalBackend:
+    """The FastAPI app from backend/main.py, served by uvicorn on a loopback port in a daemon thread."""
+
+    def __init__(self, backend_dir: Path = BACKEND_DIR, host: str = "127.0.0.1"):
+        self.backend_dir = backend_dir
+        self.host = host
+        self.port: Optional[int] = None
+        self.server = None
+        self.thread: Optional[threading.Thread] = None
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at
+        self.error: Optional[str] = None
+        self.stopping = False
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self, timeout: float = BACKEND_START_TIMEOUT) -> None:
+        """
+        Start importing and serving the app in the background; returns at once.
+
+        Call poll() until it reports the outcome.
+
+        Args:
+            timeout: Longest wait for startup (seconds)
+        """
+        for name, value in LOCAL_BACKEND_ENV.items():
+            os.environ.setdefault(name, value)
+        # Backend modules import each other by flat name
+        sys.path.insert(0, str(self.backend_dir))
+
+        # Bound here so the port is known before the server runs; port 0 = any free port
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind((self.host, 0))
+        self.port = sock.getsockname()[1]
+        self.deadline = time.monotonic() + timeout
+        self.thread = threading.Thread(target=self.serve, args=(sock,), name="upsum-backend", daemon=True)
+        self.thread.start()
+
+    def serve(self, sock: socket.socket) -> None:
+        """Thread body: import the app (the slow part) and run uvicorn until stopped."""
+        try:
+            import uvicorn
+            from main import app
+
+            config = uvicorn.Config(app, log_level="warning", lifespan="on")
+            self.server = uvicorn.Server(config)
+            if not self.stopping:
+                self.server.run(sockets=[sock])
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+        finally:
+            sock.close()
+
+    def poll(self) -> Optional[bool]:
+        """
+        Startup outcome so far.
+
+        Returns:
+            True once the server accepts requests, False if it failed or
+            missed the deadline (see error), None while still starting
+        """
+        if self.server is not None and self.server.started:
+            return True
+        if self.error is None and not self.thread.is_alive():
+            self.error = "server exited during startup"
+        if self.error is None and time.monotonic() > self.deadline:
+            self.error = f"did not start within {self.deadline - self.started_at:.0f} s"
+        return None if self.error is None else False
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Ask uvicorn to shut down (runs the app's shutdown hooks) and wait for it."""
+        self.stopping = True
+        if self.server is not None:
+            self.server.should_exit = True
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+class UpsumBrowser(QMainWindow):
+    def __init__(self, local: bool = False, query: Optional[str] = None):
+        """
+        Args:
+            local: Serve the backend in-process and browse it instead of HOME_URL
+            query: Search to run after the first page load (for timing)
+        """
         super().__init__()
+        self.timer = StartupTimer()
+        self.query = query
+        # Not known until the local backend is up
+        self.home_url: Optional[str] = None if local else HOME_URL
         self.setWindowTitle("Upsum — Svensk Kunskap")
         self.setGeometry(100, 100, 1200, 800)
         
@@ -52,10 +216,9 @@ class UpsumBrowser(QMainWindow):
             }
         """)
         
-        # Create privacy-focused profile (incognito mode)
-        self.profile = QWebEngineProfile()
-        self.profile.setHttpCacheType(QWebEngineProfile.CacheType.NoCache)
-        self.profile.setPersistentCookiesPolicy(QWebEngineProfile.PersistentCookiesPolicy.NoPersistentCookies)
+        # Create privacy-focused profile (incognito mode) with a session-only cache
+        self.cache_dir: Optional[str] = None
+        self.profile = self.create_profile()
         
         # Create central widget and layout
         central_widget = QWidget()
@@ -72,7 +235,7 @@ class UpsumBrowser(QMainWindow):
         
         # URL bar
         self.url_bar = QLineEdit()
-        self.url_bar.setPlaceholderText("https://upsum.oscyra.solutions")
+        self.url_bar.setPlaceholderText(self.home_url or "http://127.0.0.1")
         self.url_bar.returnPressed.connect(self.navigate_to_url)
         toolbar_layout.addWidget(self.url_bar)
         
@@ -85,7 +248,8 @@ class UpsumBrowser(QMainWindow):
         
         # Create web view with privacy profile
         self.browser = QWebEngineView()
-        self.browser.setPage(self.profile.defaultProfile().page())
+        self.page = QWebEnginePage(self.profile, self.browser)
+        self.browser.setPage(self.page)
         
         # Configure privacy settings
         settings = self.browser.settings()
@@ -101,12 +265,77 @@ class UpsumBrowser(QMainWindow):
         
         layout.addWidget(self.browser)
         
-        # Load Upsum homepage
+        # Watches for the --query search's first result to appear
+        self.result_poll = QTimer(self)
+        self.result_poll.setInterval(50)
+        self.result_poll.timeout.connect(self.check_first_result)
+        
+        # The backend starts in its own thread; a timer checks on it without blocking the window
+        self.backend: Optional[LocalBackend] = None
+        self.backend_poll = QTimer(self)
+        self.backend_poll.setInterval(20)
+        self.backend_poll.timeout.connect(self.check_backend)
+        if local:
+            self.backend = LocalBackend()
+            self.backend.start()
+            self.backend_poll.start()
+        
+        # Load Upsum homepage (a loading page until a local backend is ready)
         self.go_home()
     
+    def check_backend(self):
+        """Open the local backend once it is ready, or show why it failed."""
+        ready = self.backend.poll()
+        if ready is None:
+            return
+        self.backend_poll.stop()
+        if ready:
+            self.home_url = self.backend.url
+            self.url_bar.setPlaceholderText(self.home_url)
+            print(f"[Desktop] Local backend on {self.home_url}")
+            self.timer.mark("backend ready")
+            self.go_home()
+        else:
+            print(f"[Desktop] Local backend failed: {self.backend.error}")
+            self.backend.stop(timeout=0)
+            self.go_home()
+    
+    def show_message(self, title: str, detail: str = ""):
+        """Show a status page in the dark theme (loading, errors)."""
+        self.browser.setHtml(MESSAGE_HTML.format(title=html.escape(title), detail=html.escape(detail)))
+    
+    def create_profile(self):
+        """
+        Off-the-record profile whose HTTP cache is bounded and lives only for this session.
+
+        Returns:
+            Profile with a memory cache (default), a cache in a fresh temporary
+            directory (UPSUM_DESKTOP_CACHE=disk, removed by shutdown) or no cache
+        """
+        if CACHE_MODE == "disk":
+            # Named profiles are the only ones with a disk cache; give each run its own directory
+            self.cache_dir = tempfile.mkdtemp(prefix="upsum-desktop-")
+            profile = QWebEngineProfile(f"upsum-{os.getpid()}", self)
+            profile.setPersistentStoragePath(os.path.join(self.cache_dir, "storage"))
+            profile.setCachePath(os.path.join(self.cache_dir, "cache"))
+            profile.setHttpCacheType(QWebEngineProfile.CacheType.DiskHttpCache)
+        else:
+            profile = QWebEngineProfile(self)
+            profile.setHttpCacheType(QWebEngineProfile.CacheType.NoCache if CACHE_MODE == "none"
+                                     else QWebEngineProfile.CacheType.MemoryHttpCache)
+        profile.setHttpCacheMaximumSize(CACHE_MAX_BYTES)
+        profile.setPersistentCookiesPolicy(QWebEngineProfile.PersistentCookiesPolicy.NoPersistentCookies)
+        return profile
+    
     def go_home(self):
         """Navigate to Upsum homepage."""
-        url = QUrl("https://upsum.oscyra.solutions")
+        if self.home_url is None:
+            if self.backend is not None and self.backend.error:
+                self.show_message("Den lokala servern kunde inte startas", self.backend.error)
+            else:
+                self.show_message("Startar lokal server …")
+            return
+        url = QUrl(self.home_url)
         self.browser.setUrl(url)
     
     def navigate_to_url(self):
@@ -122,21 +351,62 @@ class UpsumBrowser(QMainWindow):
     
     def update_url_bar(self, url):
         """Update URL bar when page changes."""
-        self.url_bar.setText(url.toString())
+        if url.scheme() in ('http', 'https'):
+            self.url_bar.setText(url.toString())
     
     def on_load_finished(self, success):
         """Handle page load completion."""
+        if self.browser.url().scheme() not in ('http', 'https'):
+            # Status page from show_message
+            return
         if success:
             print(f"Loaded: {self.browser.url().toString()}")
+            if "first result" not in self.timer.marks:
+                self.timer.mark("page loaded")
+                if self.query:
+                    query = json.dumps(self.query)
+                    self.page.runJavaScript(f"document.getElementById('q').value = {query}; fetchResults({query});")
+                    # Only a --query run is timed; give up if it never shows a hit
+                    self.result_poll.start()
+                    QTimer.singleShot(int(FIRST_RESULT_TIMEOUT * 1000), self.result_poll.stop)
         else:
             print(f"Failed to load: {self.browser.url().toString()}")
+    
+    def check_first_result(self):
+        """Record the first time a search result is shown."""
+        self.page.runJavaScript(FIRST_RESULT_JS, self.on_first_result_check)
+    
+    def on_first_result_check(self, shown):
+        if shown and self.result_poll.isActive():
+            self.result_poll.stop()
+            self.timer.mark("first result")
+            print(f"[Startup] {self.timer.report()}")
+    
+    def shutdown(self):
+        """Stop the local backend and discard the session cache."""
+        self.result_poll.stop()
+        self.backend_poll.stop()
+        if self.backend is not None:
+            self.backend.stop()
+        # The page must go before its profile, and the profile before its cache directory
+        sip.delete(self.page)
+        sip.delete(self.profile)
+        if self.cache_dir:
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
 
 def main():
-    app = QApplication(sys.argv)
+    parser = argparse.ArgumentParser(description="Upsum desktop browser")
+    parser.add_argument("--local", action="store_true", default=os.getenv("UPSUM_DESKTOP_LOCAL") == "1",
+                        help="run the backend in-process on a loopback port")
+    parser.add_argument("--query", help="search to run once the page has loaded")
+    args, qt_args = parser.parse_known_args()
+    
+    app = QApplication(sys.argv[:1] + qt_args)
     app.setApplicationName("Upsum")
     app.setOrganizationName("Oscyra Solutions")
     
-    window = UpsumBrowser()
+    window = UpsumBrowser(local=args.local, query=args.query)
+    app.aboutToQuit.connect(window.shutdown)
     window.show()
     
     sys.exit(app.exec())